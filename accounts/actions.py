@@ -0,0 +1,49 @@
+from collections import defaultdict
+import random
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import STANDARD_SNAKES, Badge, User
+
+import structlog
+logger = structlog.get_logger()
+
+
+def assign_badges_to_tickets():
+    '''Create a badge for each ticket that doesn't have one.'''
+
+    logger.info('assign_badges_to_tickets')
+    with transaction.atomic():
+        return Badge.objects.create_for_tickets_without_badges()
+
+
+def top_up_spare_badges(number_spare_badges):
+    '''Create spare badges, which aren't assigned to a ticket, until there are
+    number_spare_badges of them.'''
+
+    logger.info('top_up_spare_badges', number_spare_badges=number_spare_badges)
+    with transaction.atomic():
+        shortfall = number_spare_badges - Badge.objects.spare().count()
+        if shortfall <= 0:
+            return []
+        return Badge.objects.create_spare(shortfall)
+
+
+def assign_snakes_to_ticket_holders():
+    '''Give a randomly chosen snake to each ticket holder whose badge doesn't
+    have one.'''
+
+    logger.info('assign_snakes_to_ticket_holders')
+    with transaction.atomic():
+        users = User.objects.filter(ticket__isnull=False).filter(
+            Q(badge_snake_colour__isnull=True) | Q(badge_snake_colour='') |
+            Q(badge_snake_extras__isnull=True) | Q(badge_snake_extras='')
+        )
+
+        user_ids_by_snake = defaultdict(list)
+        for user_id in users.values_list('id', flat=True):
+            user_ids_by_snake[random.choice(STANDARD_SNAKES)].append(user_id)
+
+        for (colour, extra), user_ids in user_ids_by_snake.items():
+            User.objects.filter(id__in=user_ids).update(badge_snake_colour=colour, badge_snake_extras=extra)
@@ -0,0 +1,174 @@
+'''Export the data for printing badges, as CSV.
+
+There is a row for each claimed ticket, then for each children's ticket, then
+for each spare badge.  Each section is read with a single query, and rows are
+written as they're read, so the export can be streamed:
+
+    with open('badges.csv', 'w') as f:
+        badge_export.write_csv(f)
+
+    StreamingHttpResponse(badge_export.iter_csv_lines(), content_type='text/csv')
+
+Badges should be assigned to tickets and snakes to ticket holders (see
+accounts.actions) before exporting.
+'''
+
+import csv
+import random
+
+from django.db.models import OuterRef, Subquery
+
+from extras.models import ChildrenTicket, ExtraItem
+from ironcage import content_types
+from ironcage.utils import Echo
+from tickets.models import Ticket
+
+from .models import STANDARD_SNAKES, Badge
+
+
+FIELDNAMES = [
+    'name', 'last_bit_of_name', 'company', 'pronoun', 'twitter', 'snake',
+    'extra', 'background', 'sat', 'sun', 'mon', 'tue', 'wed', 'lunch',
+    'ticket_id', 'badge_id', 'ukpa', 'type'
+]
+
+LUNCH_OPTIONS = ['1300', '1330', '1400']
+
+
+def rows():
+    '''Yield a dict for each row of the export.
+
+    Lunch slots are given out in turn to claimed tickets and spare badges, but
+    not to children's tickets.
+    '''
+
+    sections = [claimed_ticket_rows(), childrens_ticket_rows(), spare_badge_rows()]
+
+    num_rows = 0
+    for section in sections:
+        for row in section:
+            if row['type'] != 'children':
+                row['lunch'] = LUNCH_OPTIONS[num_rows % 3]
+            num_rows += 1
+            yield row
+
+
+def claimed_ticket_rows():
+    tickets = Ticket.objects.filter(
+        owner__isnull=False
+    ).select_related(
+        'owner'
+    ).annotate(
+        badge_pk=Subquery(Badge.objects.filter(ticket=OuterRef('pk')).order_by('id').values('id')[:1])
+    ).order_by(
+        '-sat', '-sun', '-mon', '-tue', '-wed', 'id'
+    )
+
+    for ticket in tickets.iterator():
+        owner = ticket.owner
+
+        if owner.is_organiser:
+            background = 'red'
+        elif owner.is_contributor:
+            background = 'blue'
+        else:
+            background = 'yellow'
+
+        yield {
+            'name': owner.name,
+            'last_bit_of_name': owner.name.split(' ')[-1],
+            'company': owner.badge_company,
+            'pronoun': owner.badge_pronoun,
+            'twitter': owner.badge_twitter,
+            'snake': owner.badge_snake_colour,
+            'extra': owner.badge_snake_extras,
+            'background': background,
+            'sat': 1 if ticket.sat else 0,
+            'sun': 1 if ticket.sun else 0,
+            'mon': 1 if ticket.mon else 0,
+            'tue': 1 if ticket.tue else 0,
+            'wed': 1 if ticket.wed else 0,
+            'ticket_id': ticket.ticket_id,
+            'badge_id': Badge.id_scrambler.forward(ticket.badge_pk) if ticket.badge_pk else '',
+            'ukpa': 1 if owner.is_ukpa_member else 0,
+            'type': 'claimed',
+        }
+
+
+def childrens_ticket_rows():
+    extra_items = ExtraItem.objects.filter(
+        content_type=content_types.children_ticket()
+    ).annotate(
+        child_name=Subquery(ChildrenTicket.objects.filter(pk=OuterRef('object_id')).values('name')[:1])
+    ).order_by(
+        'child_name', 'id'
+    ).only('id')
+
+    for extra_item in extra_items.iterator():
+        colour, extra = random.choice(STANDARD_SNAKES)
+
+        yield {
+            'name': extra_item.child_name,
+            'company': '',
+            'pronoun': '',
+            'twitter': '',
+            'snake': colour,
+            'extra': extra,
+            'background': 'yellow',
+            'sat': 0,
+            'sun': 0,
+            'mon': 0,
+            'tue': 0,
+            'wed': 0,
+            'ticket_id': extra_item.item_id,
+            'badge_id': '',
+            'ukpa': 0,
+            'type': 'children',
+        }
+
+
+def spare_badge_rows():
+    spare_badges = Badge.objects.spare().order_by('id')
+
+    # The first twelfth of the spare badges get a blue background
+    num_blue = spare_badges.count() / 12
+
+    for ix, badge in enumerate(spare_badges.only('id').iterator()):
+        colour, extra = random.choice(STANDARD_SNAKES)
+
+        yield {
+            'name': '',
+            'company': '',
+            'pronoun': '',
+            'twitter': '',
+            'snake': colour,
+            'extra': extra,
+            'background': 'blue' if ix < num_blue else 'yellow',
+            'sat': 0,
+            'sun': 0,
+            'mon': 0,
+            'tue': 0,
+            'wed': 0,
+            'ticket_id': '',
+            'badge_id': badge.badge_id,
+            'ukpa': 0,
+            'type': 'spare',
+        }
+
+
+def write_csv(f):
+    '''Write the export to the file-like object f, a row at a time.'''
+
+    writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+    writer.writeheader()
+    for row in rows():
+        writer.writerow(row)
+
+
+def iter_csv_lines():
+    '''Yield the lines of the export, for a StreamingHttpResponse.'''
+
+    writer = csv.DictWriter(Echo(), fieldnames=FIELDNAMES)
+    yield writer.writerow(dict(zip(FIELDNAMES, FIELDNAMES)))
+    for row in rows():
+        yield writer.writerow(row)
@@ -1,15 +1,12 @@
-import re
-
 from django.conf import settings
-from django.core.management import BaseCommand
-from django.template.loader import get_template
 
 from accounts.models import User
-from ironcage.emails import send_mail
+from ironcage.bulk_mail import BulkMailCommand, invocation_run_name
+from ironcage.emails import MailTemplate
 from tickets.models import Ticket
 
 
-class Command(BaseCommand):
+class Command(BulkMailCommand):
 
     def handle(self, **kwargs):
 
@@ -25,18 +22,22 @@ class Command(BaseCommand):
 
         users_to_email = User.objects.filter(pk__in=all_emailees).all()
 
-        template = get_template('accounts/emails/slack.txt')
+        template = MailTemplate('accounts/emails/slack.txt')
 
-        for user in users_to_email:
+        def build_message(user):
             context = {
                 'user': user,
                 'slack_link': settings.SLACK_SIGNUP_LINK,
             }
-            body_raw = template.render(context)
-            body = re.sub('\n\n\n+', '\n\n', body_raw)
+            body = template.render(context)
 
-            send_mail(
+            return (
                 f'PyCon UK Slack Workspace information ({user.user_id})',
                 body,
                 user.email_addr,
             )
+
+        run = self.mail_run(invocation_run_name('email_slack_others'), kwargs)
+        run.send(users_to_email, build_message)
+
+        self.stdout.write(run.report())
@@ -29,6 +29,16 @@ with open(os.path.join(settings.BASE_DIR, 'accounts', 'data', 'nationalities.txt
 with open(os.path.join(settings.BASE_DIR, 'accounts', 'data', 'ethnicities.json')) as f:
     ETHNICITIES = json.load(f)
 
+# The (colour, extra) of each snake that can be printed on a badge
+STANDARD_SNAKES = [
+    ('blue', 'deerstalker'),
+    ('yellow', 'crown'),
+    ('red', 'glasses'),
+    ('green', 'dragon'),
+    ('purple', 'mortar'),
+    ('orange', 'astronaut'),
+]
+
 
 def get_ical_token():
     return get_random_string(length=24)
@@ -175,6 +185,16 @@ class Badge(models.Model):
             id = self.model.id_scrambler.backward(badge_id)
             return get_object_or_404(self.model, pk=id)
 
+        def create_for_tickets_without_badges(self):
+            tickets = Ticket.objects.filter(badge__isnull=True).order_by('id')
+            return self.bulk_create([self.model(ticket=ticket) for ticket in tickets.only('id')])
+
+        def create_spare(self, number):
+            return self.bulk_create([self.model() for _ in range(number)])
+
+        def spare(self):
+            return self.filter(ticket__isnull=True)
+
     objects = Manager()
 
     @property
@@ -0,0 +1,70 @@
+from django.test import TestCase
+
+from accounts import actions
+from accounts.models import STANDARD_SNAKES, Badge, User
+from tickets.tests import factories
+
+
+class AssignBadgesToTicketsTests(TestCase):
+    def test_assign_badges_to_tickets(self):
+        ticket1 = factories.create_ticket()
+        ticket2 = factories.create_ticket(factories.create_user('Bob'))
+        Badge.objects.create(ticket=ticket1)
+
+        badges = actions.assign_badges_to_tickets()
+
+        self.assertEqual([badge.ticket for badge in badges], [ticket2])
+        self.assertEqual(ticket1.badge.count(), 1)
+        self.assertEqual(ticket2.badge.count(), 1)
+
+    def test_number_of_queries_does_not_depend_on_number_of_tickets(self):
+        for ix in range(10):
+            factories.create_ticket(factories.create_user(f'User {ix}'))
+
+        with self.assertNumQueries(4):
+            # SAVEPOINT, SELECT, INSERT, RELEASE SAVEPOINT
+            actions.assign_badges_to_tickets()
+
+        self.assertEqual(Badge.objects.count(), 10)
+
+    def test_when_all_tickets_have_badges(self):
+        actions.assign_badges_to_tickets()
+
+        self.assertEqual(actions.assign_badges_to_tickets(), [])
+
+
+class TopUpSpareBadgesTests(TestCase):
+    def test_top_up_spare_badges(self):
+        ticket = factories.create_ticket()
+        Badge.objects.create(ticket=ticket)
+        Badge.objects.create()
+
+        badges = actions.top_up_spare_badges(5)
+
+        self.assertEqual(len(badges), 4)
+        self.assertEqual(Badge.objects.spare().count(), 5)
+
+    def test_when_there_are_enough_spare_badges(self):
+        Badge.objects.create_spare(5)
+
+        self.assertEqual(actions.top_up_spare_badges(5), [])
+        self.assertEqual(Badge.objects.count(), 5)
+
+
+class AssignSnakesToTicketHoldersTests(TestCase):
+    def test_assign_snakes_to_ticket_holders(self):
+        ticket = factories.create_ticket()
+        user_with_snake = factories.create_user('Bob', badge_snake_colour='red', badge_snake_extras='glasses')
+        factories.create_ticket(user_with_snake)
+        user_without_ticket = factories.create_user('Carol')
+
+        actions.assign_snakes_to_ticket_holders()
+
+        user = User.objects.get(pk=ticket.owner_id)
+        self.assertIn((user.badge_snake_colour, user.badge_snake_extras), STANDARD_SNAKES)
+
+        user_with_snake.refresh_from_db()
+        self.assertEqual((user_with_snake.badge_snake_colour, user_with_snake.badge_snake_extras), ('red', 'glasses'))
+
+        user_without_ticket.refresh_from_db()
+        self.assertIsNone(user_without_ticket.badge_snake_colour)
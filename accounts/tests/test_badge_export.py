@@ -0,0 +1,71 @@
+import csv
+import io
+
+from django.test import TestCase
+
+from accounts import badge_export
+from accounts.models import Badge
+from accounts.tests import factories as accounts_factories
+from extras.tests import factories as extras_factories
+from tickets.tests import factories as tickets_factories
+
+
+class BadgeExportTests(TestCase):
+    def test_rows(self):
+        alice = accounts_factories.create_user('Alice Apple', is_organiser=True)
+        bob = accounts_factories.create_user('Bob Banana', badge_company='Banana Co')
+        alice_ticket = tickets_factories.create_ticket(alice, num_days=1)
+        bob_ticket = tickets_factories.create_ticket(bob, num_days=3)
+        children_ticket = extras_factories.create_children_ticket()
+        Badge.objects.create_for_tickets_without_badges()
+        spare_badge, = Badge.objects.create_spare(1)
+
+        rows = list(badge_export.rows())
+
+        self.assertEqual([row['type'] for row in rows], ['claimed', 'claimed', 'children', 'spare'])
+
+        self.assertEqual([row['name'] for row in rows], ['Bob Banana', 'Alice Apple', 'Puff', ''])
+        self.assertEqual(rows[0]['last_bit_of_name'], 'Banana')
+        self.assertEqual(rows[0]['company'], 'Banana Co')
+        self.assertEqual([row['background'] for row in rows[:2]], ['yellow', 'red'])
+        self.assertEqual(rows[0]['ticket_id'], bob_ticket.ticket_id)
+        self.assertEqual(rows[0]['badge_id'], bob_ticket.badge.get().badge_id)
+        self.assertEqual(rows[1]['badge_id'], alice_ticket.badge.get().badge_id)
+
+        self.assertEqual(rows[2]['ticket_id'], children_ticket.item_id)
+        self.assertEqual(rows[3]['badge_id'], spare_badge.badge_id)
+
+        self.assertEqual([row.get('lunch') for row in rows], ['1300', '1330', None, '1300'])
+
+    def test_number_of_queries_does_not_depend_on_number_of_rows(self):
+        for ix in range(10):
+            tickets_factories.create_ticket(accounts_factories.create_user(f'User {ix}'))
+            extras_factories.create_children_ticket()
+        Badge.objects.create_for_tickets_without_badges()
+        Badge.objects.create_spare(10)
+
+        with self.assertNumQueries(4):
+            # Claimed tickets, children's tickets, count of spare badges, spare badges
+            rows = list(badge_export.rows())
+
+        self.assertEqual(len(rows), 30)
+
+    def test_write_csv(self):
+        tickets_factories.create_ticket()
+        Badge.objects.create_for_tickets_without_badges()
+
+        f = io.StringIO()
+        badge_export.write_csv(f)
+        f.seek(0)
+
+        rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['name'], 'Alice')
+
+    def test_iter_csv_lines(self):
+        tickets_factories.create_ticket()
+
+        lines = list(badge_export.iter_csv_lines())
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0], ','.join(badge_export.FIELDNAMES) + '\r\n')
@@ -9,18 +9,10 @@ from django.shortcuts import redirect, render
 from django.contrib.auth.decorators import permission_required
 
 from .forms import ProfileForm, RegisterForm
+from .models import STANDARD_SNAKES
 
 
 def assign_a_snake(user):
-    STANDARD_SNAKES = [
-        ('blue', 'deerstalker'),
-        ('yellow', 'crown'),
-        ('red', 'glasses'),
-        ('green', 'dragon'),
-        ('purple', 'mortar'),
-        ('orange', 'astronaut'),
-    ]
-
     colour, extra = random.choice(STANDARD_SNAKES)
 
     user.badge_snake_colour = colour
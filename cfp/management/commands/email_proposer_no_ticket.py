@@ -1,35 +1,36 @@
-import re
 from datetime import datetime
 
-from django.core.management import BaseCommand
-from django.template.loader import get_template
 
 from cfp.models import Proposal
-from ironcage.emails import send_mail
+from ironcage.bulk_mail import BulkMailCommand, invocation_run_name
+from ironcage.emails import MailTemplate
 
 
-class Command(BaseCommand):
+class Command(BulkMailCommand):
 
     def handle(self, *args, **kwargs):
 
-        accepted_proposals = Proposal.objects.filter(
-            state__in=['accept', 'confirm']
-        ).all()
-
-        for proposal in accepted_proposals:
-            if proposal.proposer.get_ticket() is None:
-                template = get_template('cfp/emails/not_got_ticket.txt')
-                context = {
-                    'proposal': proposal,
-                }
-                body_raw = template.render(context)
-                body = re.sub('\n\n\n+', '\n\n', body_raw)
-
-                send_mail(
-                    f'Your PyCon UK 2018 Proposal ({proposal.title})',
-                    body,
-                    proposal.proposer.email_addr,
-                )
-
-                proposal.replied_to = datetime.now()
-                proposal.save()
+        proposals = Proposal.objects.by_proposers_without_tickets(['accept', 'confirm'])
+
+        template = MailTemplate('cfp/emails/not_got_ticket.txt')
+
+        def build_message(proposal):
+            context = {
+                'proposal': proposal,
+            }
+            body = template.render(context)
+
+            return (
+                f'Your PyCon UK 2018 Proposal ({proposal.title})',
+                body,
+                proposal.proposer.email_addr,
+            )
+
+        def mark_as_replied_to(proposal):
+            proposal.replied_to = datetime.now()
+            proposal.save()
+
+        run = self.mail_run(invocation_run_name('email_proposer_no_ticket'), kwargs)
+        run.send(proposals, build_message, on_sent=mark_as_replied_to)
+
+        self.stdout.write(run.report())
@@ -1,14 +1,12 @@
-import re
 from datetime import datetime
 
-from django.core.management import BaseCommand
-from django.template.loader import get_template
 
 from cfp.models import Proposal
-from ironcage.emails import send_mail
+from ironcage.bulk_mail import BulkMailCommand, invocation_run_name
+from ironcage.emails import MailTemplate
 
 
-class Command(BaseCommand):
+class Command(BulkMailCommand):
 
     def handle(self, *args, **kwargs):
 
@@ -16,20 +14,26 @@ class Command(BaseCommand):
             state__in=['accept', 'confirm']
         ).all()
 
-        for proposal in accepted_proposals:
+        template = MailTemplate('cfp/emails/about_schedule.txt')
+
+        def build_message(proposal):
             if proposal.proposer.get_ticket() is None:
-                template = get_template('cfp/emails/about_schedule.txt')
                 context = {
                     'proposal': proposal,
                 }
-                body_raw = template.render(context)
-                body = re.sub('\n\n\n+', '\n\n', body_raw)
+                body = template.render(context)
 
-                send_mail(
+                return (
                     f'PyCon UK 2018 Contributor Information ({proposal.title})',
                     body,
                     proposal.proposer.email_addr,
                 )
 
-                proposal.replied_to = datetime.now()
-                proposal.save()
+        def mark_as_replied_to(proposal):
+            proposal.replied_to = datetime.now()
+            proposal.save()
+
+        run = self.mail_run(invocation_run_name('email_speaker_about_schedule'), kwargs)
+        run.send(accepted_proposals, build_message, on_sent=mark_as_replied_to)
+
+        self.stdout.write(run.report())
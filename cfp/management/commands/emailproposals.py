@@ -1,56 +1,58 @@
-import re
 from datetime import datetime
 
 from django.conf import settings
-from django.core.management import BaseCommand
-from django.template.loader import get_template
 from django.urls import reverse
 
 from cfp.models import Proposal
-from ironcage.emails import send_mail
+from ironcage.bulk_mail import BulkMailCommand, invocation_run_name
+from ironcage.emails import MailTemplate
 
 
-class Command(BaseCommand):
+class Command(BulkMailCommand):
 
     def handle(self, *args, **kwargs):
 
-        accepted_proposals = Proposal.objects.filter(state='accept', replied_to__isnull=True).all()
+        accept_template = MailTemplate('cfp/emails/proposal_accept.txt')
 
-        for proposal in accepted_proposals:
-            template = get_template('cfp/emails/proposal_accept.txt')
+        def build_accept_message(proposal):
             context = {
                 'proposal': proposal,
                 'proposal_url': settings.DOMAIN + reverse('cfp:proposal', args=[proposal.proposal_id]),
                 'user_proposal_count': Proposal.objects.filter(proposer=proposal.proposer).count()
             }
-            body_raw = template.render(context)
-            body = re.sub('\n\n\n+', '\n\n', body_raw)
+            body = accept_template.render(context)
 
-            send_mail(
+            return (
                 f'Your PyCon UK 2018 Proposal ({proposal.title})',
                 body,
                 proposal.proposer.email_addr,
             )
 
-            proposal.replied_to = datetime.now()
-            proposal.save()
-
-        rejected_proposals = Proposal.objects.filter(state='reject', replied_to__isnull=True).all()
+        reject_template = MailTemplate('cfp/emails/proposal_reject.txt')
 
-        for proposal in rejected_proposals:
-            template = get_template('cfp/emails/proposal_reject.txt')
+        def build_reject_message(proposal):
             context = {
                 'proposal': proposal,
                 'user_proposal_count': Proposal.objects.filter(proposer=proposal.proposer).count()
             }
-            body_raw = template.render(context)
-            body = re.sub('\n\n\n+', '\n\n', body_raw)
+            body = reject_template.render(context)
 
-            send_mail(
+            return (
                 f'Your PyCon UK 2018 Proposal ({proposal.title})',
                 body,
                 proposal.proposer.email_addr,
             )
 
+        def mark_as_replied_to(proposal):
             proposal.replied_to = datetime.now()
             proposal.save()
+
+        run = self.mail_run(invocation_run_name('emailproposals'), kwargs)
+
+        accepted_proposals = Proposal.objects.filter(state='accept', replied_to__isnull=True).all()
+        run.send(accepted_proposals, build_accept_message, on_sent=mark_as_replied_to)
+
+        rejected_proposals = Proposal.objects.filter(state='reject', replied_to__isnull=True).all()
+        run.send(rejected_proposals, build_reject_message, on_sent=mark_as_replied_to)
+
+        self.stdout.write(run.report())
@@ -2,11 +2,12 @@ from datetime import timedelta
 
 from django.conf import settings
 from django.db import models
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 
 from ironcage.utils import Scrambler
+from tickets.models import Ticket
 from cfp.validators import validate_max_300_words
 
 
@@ -93,6 +94,29 @@ class Proposal(models.Model):
         def get_random_unreviewed_by_user(self, user):
             return self.unreviewed_by_user(user).order_by('?').first()
 
+        def proposers_without_tickets(self, states):
+            '''Return the users who have made a proposal in one of the given
+            states, and who don't have a ticket, in one query.'''
+
+            User = self.model._meta.get_field('proposer').related_model
+
+            return User.objects.annotate(
+                has_proposal=Exists(self.filter(proposer=OuterRef('pk'), state__in=states)),
+                has_ticket=Exists(Ticket.objects.filter(owner=OuterRef('pk'))),
+            ).filter(
+                has_proposal=True,
+                has_ticket=False,
+            ).order_by('name', 'id')
+
+        def by_proposers_without_tickets(self, states):
+            '''Return the proposals in one of the given states whose proposers
+            don't have a ticket, with their proposers, in one query.'''
+
+            return self.filter(
+                state__in=states,
+                proposer__in=self.proposers_without_tickets(states),
+            ).select_related('proposer').order_by('id')
+
     objects = Manager()
 
     def __str__(self):
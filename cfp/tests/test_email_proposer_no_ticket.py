@@ -0,0 +1,29 @@
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from cfp.tests.factories import create_proposal
+from tickets.tests.factories import create_ticket, create_user
+
+
+class TestEmailProposerNoTicket(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = create_user(email_addr='alice@example.com')
+        cls.bob = create_user(email_addr='bob@example.com')
+        cls.proposal_1 = create_proposal(cls.alice, state='accept')
+        cls.proposal_2 = create_proposal(cls.bob, state='confirm')
+        create_ticket(cls.bob)
+
+    def test_proposers_without_tickets_get_email(self):
+        mail.outbox = []
+
+        call_command('email_proposer_no_ticket')
+
+        self.assertEqual(len(mail.outbox), 1)
+        email = mail.outbox[0]
+        self.assertEqual(email.to, ['alice@example.com'])
+        self.assertEqual(email.subject, f'Your PyCon UK 2018 Proposal ({self.proposal_1.title})')
+
+        self.proposal_1.refresh_from_db()
+        self.assertIsNotNone(self.proposal_1.replied_to)
@@ -65,3 +65,14 @@ class TestEmailProposals(TestCase):
         call_command('emailproposals')
 
         self.assertEqual(len(mail.outbox), 0)
+
+    def test_dry_run(self):
+        mail.outbox = []
+
+        call_command('emailproposals', dry_run=True)
+
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('emailproposals')
+
+        self.assertEqual(len(mail.outbox), 3)
@@ -0,0 +1,44 @@
+from django.test import TestCase
+
+from cfp.models import Proposal
+from cfp.tests.factories import create_proposal
+from tickets.tests.factories import create_ticket, create_user
+
+
+class ProposersWithoutTicketsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = create_user('Alice')
+        cls.bob = create_user('Bob')
+        cls.carol = create_user('Carol')
+        cls.dave = create_user('Dave')
+
+        # Alice has two accepted proposals, and no ticket
+        create_proposal(cls.alice, state='accept')
+        create_proposal(cls.alice, state='confirm')
+
+        # Bob has an accepted proposal, and a ticket
+        create_proposal(cls.bob, state='accept')
+        create_ticket(cls.bob)
+
+        # Carol has a rejected proposal, and no ticket
+        create_proposal(cls.carol, state='reject')
+
+        # Dave has a confirmed proposal, and no ticket
+        create_proposal(cls.dave, state='confirm')
+
+    def test_proposers_without_tickets(self):
+        with self.assertNumQueries(1):
+            users = list(Proposal.objects.proposers_without_tickets(['accept', 'confirm']))
+
+        self.assertEqual(users, [self.alice, self.dave])
+
+    def test_proposers_without_tickets_in_one_state(self):
+        self.assertEqual(list(Proposal.objects.proposers_without_tickets(['accept'])), [self.alice])
+
+    def test_by_proposers_without_tickets(self):
+        with self.assertNumQueries(1):
+            proposals = list(Proposal.objects.by_proposers_without_tickets(['accept', 'confirm']))
+            proposers = [proposal.proposer for proposal in proposals]
+
+        self.assertEqual(proposers, [self.alice, self.alice, self.dave])
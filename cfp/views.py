@@ -10,19 +10,12 @@ from django.contrib import messages
 from django.http import StreamingHttpResponse
 from django.shortcuts import redirect, render
 
+from ironcage.utils import Echo
+
 from .forms import ProposalForm
 from .models import Proposal
 
 
-class Echo:
-    """An object that implements just the write method of the file-like
-    interface.
-    """
-    def write(self, value):
-        """Write the value by returning it, instead of storing in a buffer."""
-        return value
-
-
 def _can_submit(request):
     if datetime.now(timezone.utc) <= settings.CFP_CLOSE_AT:
         return True
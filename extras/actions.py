@@ -1,11 +1,11 @@
 from datetime import datetime
 
 import structlog
-from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
 from django.db.models import Count
 
 from extras.models import DINNERS, DinnerTicket, ExtraItem
+from ironcage import content_types
 from orders.models import Order
 
 logger = structlog.get_logger()
@@ -14,9 +14,7 @@ logger = structlog.get_logger()
 def create_pending_children_ticket_order(purchaser, billing_details, unconfirmed_details):
     logger.info('create_pending_children_ticket_order', purchaser=purchaser.id)
 
-    children_ticket_content_type = ContentType.objects.get(
-        app_label="extras", model="childrenticket"
-    )
+    children_ticket_content_type = content_types.children_ticket()
 
     with transaction.atomic():
         return Order.objects.create_pending(
@@ -36,9 +34,7 @@ def update_pending_children_ticket_order(order, billing_details, unconfirmed_det
 def create_pending_dinner_ticket_order(purchaser, billing_details, unconfirmed_details):
     logger.info('create_pending_dinner_ticket_order', purchaser=purchaser.id)
 
-    dinner_ticket_content_type = ContentType.objects.get(
-        app_label="extras", model="dinnerticket"
-    )
+    dinner_ticket_content_type = content_types.dinner_ticket()
 
     with transaction.atomic():
         return Order.objects.create_pending(
@@ -67,14 +63,10 @@ def update_existing_dinner_ticket_order(item, details):
 
 def create_free_dinner_ticket_order(purchaser, details):
     assert purchaser.is_contributor
-    dinner_ticket_content_type = ContentType.objects.get(app_label="extras", model="dinnerticket")
+    dinner_ticket_content_type = content_types.dinner_ticket()
     assert purchaser.extras.filter(content_type=dinner_ticket_content_type).count() < 1
     logger.info('create_free_dinner_ticket_order', purchaser=purchaser.id)
 
-    dinner_ticket_content_type = ContentType.objects.get(
-        app_label="extras", model="dinnerticket"
-    )
-
     with transaction.atomic():
         extra_item = ExtraItem.objects.build(
             content_type=dinner_ticket_content_type,
@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import datetime
 
 from decimal import Decimal
@@ -45,6 +46,26 @@ class ExtraItem(models.Model):
 
             return extra_item
 
+        def bulk_create_with_items(self, extra_items):
+            '''Save unsaved extra items and the items they wrap, in one query
+            per type of wrapped item plus one.'''
+
+            # The wrapped items have to be read before they're saved, since
+            # afterwards the GenericForeignKey no longer matches them.
+            items = [extra_item.item for extra_item in extra_items]
+
+            items_by_class = defaultdict(list)
+            for item in items:
+                items_by_class[type(item)].append(item)
+
+            for item_class, items_of_class in items_by_class.items():
+                item_class.objects.bulk_create(items_of_class)
+
+            for extra_item, item in zip(extra_items, items):
+                extra_item.item = item
+
+            return self.bulk_create(extra_items)
+
     objects = Manager()
 
     @property
@@ -55,9 +76,10 @@ class ExtraItem(models.Model):
 
     @property
     def descr_for_order(self):
-        if self.content_type.model_class() is ChildrenTicket:
+        item_class = ContentType.objects.get_for_id(self.content_type_id).model_class()
+        if item_class is ChildrenTicket:
             return "Young Coders' day ticket"
-        elif self.content_type.model_class() is DinnerTicket:
+        elif item_class is DinnerTicket:
             return f'{self.item} dinner ticket'
         else:
             assert False
@@ -4,11 +4,11 @@ from decimal import Decimal
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.contrib.contenttypes.models import ContentType
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.utils.html import mark_safe
 
+from ironcage import content_types
 from orders.models import Order
 from tickets.forms import BillingDetailsForm
 
@@ -19,7 +19,7 @@ from .models import DINNER_LOCATIONS, DINNERS, ExtraItem
 
 
 def new_children_order(request):
-    children_ticket_content_type = ContentType.objects.get(app_label="extras", model="childrenticket")
+    children_ticket_content_type = content_types.children_ticket()
     tickets_sold = ExtraItem.objects.filter(
         content_type=children_ticket_content_type
     ).count()
@@ -84,7 +84,7 @@ def new_children_order(request):
 def children_order_edit(request, order_id):
     order = Order.objects.get_by_order_id_or_404(order_id)
 
-    children_ticket_content_type = ContentType.objects.get(app_label="extras", model="childrenticket")
+    children_ticket_content_type = content_types.children_ticket()
     tickets_sold = ExtraItem.objects.filter(
         content_type=children_ticket_content_type
     ).count()
@@ -100,6 +100,10 @@ def children_order_edit(request, order_id):
         messages.error(request, 'This order has already been paid')
         return redirect(order)
 
+    if order.charge_in_flight():
+        messages.error(request, 'This order cannot be changed while a payment for it is being processed')
+        return redirect(order)
+
     if request.method == 'POST':
         if not request.user.is_authenticated:
             return redirect(settings.LOGIN_URL)
@@ -153,7 +157,7 @@ def children_order_edit(request, order_id):
 
 @login_required
 def children_ticket(request):
-    children_ticket_content_type = ContentType.objects.get(app_label="extras", model="childrenticket")
+    children_ticket_content_type = content_types.children_ticket()
     tickets = ExtraItem.objects.filter(
         owner=request.user,
         content_type=children_ticket_content_type
@@ -180,7 +184,7 @@ def new_dinner_order(request, location_id):
 
     user_dinners = 0
     if request.user.is_authenticated:
-        dinner_ticket_content_type = ContentType.objects.get(app_label="extras", model="dinnerticket")
+        dinner_ticket_content_type = content_types.dinner_ticket()
         user_dinners = ExtraItem.objects.filter(
             owner=request.user,
             content_type=dinner_ticket_content_type
@@ -266,6 +270,10 @@ def dinner_order_edit(request, order_id):
         messages.error(request, 'This order has already been paid')
         return redirect(order)
 
+    if order.charge_in_flight():
+        messages.error(request, 'This order cannot be changed while a payment for it is being processed')
+        return redirect(order)
+
     if request.method == 'POST':
         location_id = DINNERS[request.POST['dinner']]['location']
         ticket_cost = Decimal(DINNER_LOCATIONS[location_id]['price']) * Decimal('1.2')
@@ -393,7 +401,7 @@ def dinner_ticket_edit(request, item_id):
 
 @login_required
 def dinner_ticket(request):
-    dinner_ticket_content_type = ContentType.objects.get(app_label="extras", model="dinnerticket")
+    dinner_ticket_content_type = content_types.dinner_ticket()
     tickets = ExtraItem.objects.filter(
         owner=request.user,
         content_type=dinner_ticket_content_type
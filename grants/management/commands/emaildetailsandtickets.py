@@ -1,15 +1,12 @@
-import re
-
-from django.core.management import BaseCommand
-from django.template.loader import get_template
 from django.db.models import Q
 
 from accounts.models import Application
-from ironcage.emails import send_mail
+from ironcage.bulk_mail import BulkMailCommand, invocation_run_name
+from ironcage.emails import MailTemplate
 from tickets.actions import create_free_ticket
 
 
-class Command(BaseCommand):
+class Command(BulkMailCommand):
 
     def handle(self, *args, **kwargs):
 
@@ -19,8 +16,10 @@ class Command(BaseCommand):
             Q(ticket_awarded=True) | Q(amount_awarded__isnull=False)
         ).all()
 
-        for application in accepted_applications:
-            if application.ticket_awarded:
+        template = MailTemplate('grants/emails/how-to-get-grant.txt')
+
+        def build_message(application):
+            if application.ticket_awarded and not kwargs['dry_run']:
                 create_free_ticket(
                     email_addr=application.applicant.email_addr,
                     free_reason='Financial Assistance',
@@ -28,15 +27,18 @@ class Command(BaseCommand):
                 )
 
             if application.amount_awarded:
-                template = get_template('grants/emails/how-to-get-grant.txt')
                 context = {
                     'application': application,
                 }
-                body_raw = template.render(context)
-                body = re.sub('\n\n\n+', '\n\n', body_raw)
+                body = template.render(context)
 
-                send_mail(
+                return (
                     f'Your PyCon UK 2018 Financial Assistance ({application.application_id})',
                     body,
                     application.applicant.email_addr,
                 )
+
+        run = self.mail_run(invocation_run_name('emaildetailsandtickets'), kwargs)
+        run.send(accepted_applications, build_message)
+
+        self.stdout.write(run.report())
@@ -1,15 +1,13 @@
-import re
 from datetime import datetime
 
-from django.core.management import BaseCommand
-from django.template.loader import get_template
 from django.db.models import Q
 
 from accounts.models import Application
-from ironcage.emails import send_mail
+from ironcage.bulk_mail import BulkMailCommand, invocation_run_name
+from ironcage.emails import MailTemplate
 
 
-class Command(BaseCommand):
+class Command(BulkMailCommand):
 
     def handle(self, *args, **kwargs):
 
@@ -19,19 +17,25 @@ class Command(BaseCommand):
             Q(application_declined=True) | Q(ticket_awarded=True) | Q(amount_awarded__isnull=False)
         ).all()
 
-        for application in ready_to_send_applications:
-            template = get_template('grants/emails/email.txt')
+        template = MailTemplate('grants/emails/email.txt')
+
+        def build_message(application):
             context = {
                 'application': application,
             }
-            body_raw = template.render(context)
-            body = re.sub('\n\n\n+', '\n\n', body_raw)
+            body = template.render(context)
 
-            send_mail(
+            return (
                 f'Your PyCon UK 2018 Financial Assistance',
                 body,
                 application.applicant.email_addr,
             )
 
+        def mark_as_replied_to(application):
             application.replied_to = datetime.now()
             application.save()
+
+        run = self.mail_run(invocation_run_name('emailgrants'), kwargs)
+        run.send(ready_to_send_applications, build_message, on_sent=mark_as_replied_to)
+
+        self.stdout.write(run.report())
@@ -4,6 +4,7 @@ from django.core import mail
 from django.core.management import call_command
 from django.test import TestCase
 
+from grants.models import Application
 from grants.tests.factories import create_application
 from tickets.tests.factories import create_user
 
@@ -128,3 +129,18 @@ class TestEmailGrants(TestCase):
         call_command('emailgrants')
 
         self.assertEqual(len(mail.outbox), 0)
+
+    def test_amended_decision_is_resent(self):
+        call_command('emailgrants')
+
+        # Staff amend Alice's award, and mark it as not replied to
+        application = Application.objects.get(id=self.proposal_1.id)
+        application.amount_awarded = 30
+        application.replied_to = None
+        application.save()
+
+        mail.outbox = []
+
+        call_command('emailgrants')
+
+        self.assertEqual([email.to for email in mail.outbox], [['alice@example.com']])
@@ -0,0 +1,230 @@
+'''Sending the same kind of message to many recipients, as the bulk email
+management commands do.
+
+A MailRun sends messages from a pool of threads, each with its own connection
+to the mail server, optionally no faster than a given number of messages per
+second.  Each message sent is recorded against the run's name, so if a run is
+interrupted, running it again only sends the messages that weren't sent.
+
+Since recipients who have been sent a message under a run's name are skipped
+by any later run with that name, a name must identify one mailing, such as one
+invocation of a command (see invocation_run_name()) or one message (see
+message_run_name()).
+'''
+
+from datetime import datetime
+import hashlib
+from queue import Empty, Queue
+import threading
+import time
+
+from django.core.management import BaseCommand
+from django.db import connection
+
+from .emails import BulkMailer
+from .models import SentMail
+
+import structlog
+logger = structlog.get_logger()
+
+
+def invocation_run_name(prefix):
+    '''Return a run name for this invocation of a command only.'''
+
+    return f'{prefix}:{datetime.now().isoformat()}'
+
+
+def message_run_name(prefix, template, subject):
+    '''Return a run name for sending the message with the given MailTemplate
+    and subject, so that a message is resumed if it's sent again, but a
+    different message is sent to everybody.'''
+
+    digest = hashlib.sha1(f'{template.template_name}\n{subject}\n{template.source}'.encode('utf-8')).hexdigest()
+    return f'{prefix}:{template.template_name}:{digest[:12]}'
+
+
+def default_key(recipient):
+    return f'{recipient._meta.label_lower}:{recipient.pk}'
+
+
+class MailRun:
+    '''
+        run = MailRun('emailproposals', num_threads=4, messages_per_second=10)
+        run.send(proposals, build_message, on_sent=mark_as_replied_to)
+        print(run.report())
+
+    build_message is called (in a worker thread) with each recipient, and
+    returns the arguments to BulkMailer.send_mail (subject, body, to_addr, and
+    optionally attachments), or None if there's nothing to send.  on_sent is
+    called with each recipient whose message has been sent.
+
+    Each recipient is identified within the run by key(recipient), which
+    defaults to its model and primary key.
+
+    With dry_run, messages are built but not sent, so that the report shows
+    how fast messages can be built.
+    '''
+
+    def __init__(self, name, num_threads=1, messages_per_second=None, dry_run=False):
+        self.name = name
+        self.num_threads = num_threads
+        self.rate_limiter = RateLimiter(messages_per_second)
+        self.dry_run = dry_run
+
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.mailers = []
+
+        self.num_sent = 0
+        self.num_already_sent = 0
+        self.failures = []
+        self.elapsed = 0
+
+    def send(self, recipients, build_message, key=default_key, on_sent=None):
+        already_sent = SentMail.objects.keys_for_run(self.name)
+
+        queue = Queue()
+        for recipient in recipients:
+            recipient_key = key(recipient)
+            if recipient_key in already_sent:
+                self.num_already_sent += 1
+            else:
+                queue.put((recipient_key, recipient))
+
+        start = time.monotonic()
+
+        if self.num_threads == 1:
+            self.work(queue, build_message, on_sent)
+        else:
+            threads = [
+                threading.Thread(target=self.work_in_thread, args=(queue, build_message, on_sent))
+                for _ in range(self.num_threads)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        for mailer in self.mailers:
+            mailer.close()
+        self.mailers = []
+
+        self.elapsed += time.monotonic() - start
+
+    def work_in_thread(self, queue, build_message, on_sent):
+        try:
+            self.work(queue, build_message, on_sent)
+        finally:
+            # Each thread has its own database connection
+            connection.close()
+
+    def work(self, queue, build_message, on_sent):
+        while True:
+            try:
+                key, recipient = queue.get_nowait()
+            except Empty:
+                return
+
+            try:
+                self.send_one(key, recipient, build_message, on_sent)
+            except Exception as e:
+                logger.exception('Failed to send mail', run_name=self.name, key=key)
+                self.record_failure(key, e)
+
+    def send_one(self, key, recipient, build_message, on_sent):
+        message = build_message(recipient)
+        if message is None:
+            return
+
+        if self.dry_run:
+            self.record_sent()
+            return
+
+        self.rate_limiter.wait()
+
+        mailer = self.get_mailer()
+        if not mailer.send_mail(*message):
+            _, _, e = mailer.failures[-1]
+            self.record_failure(key, e)
+            return
+
+        SentMail.objects.create(run_name=self.name, key=key, to_addr=message[2])
+        self.record_sent()
+
+        if on_sent is not None:
+            on_sent(recipient)
+
+    def get_mailer(self):
+        if not hasattr(self.local, 'mailer'):
+            self.local.mailer = BulkMailer()
+            with self.lock:
+                self.mailers.append(self.local.mailer)
+        return self.local.mailer
+
+    def record_sent(self):
+        with self.lock:
+            self.num_sent += 1
+
+    def record_failure(self, key, e):
+        with self.lock:
+            self.failures.append((key, e))
+
+    def report(self):
+        rate = self.num_sent / self.elapsed if self.elapsed else 0
+        verb = 'Built' if self.dry_run else 'Sent'
+        lines = [
+            f'{verb} {self.num_sent} messages in {self.elapsed:.1f}s ({rate:.1f} messages/s), '
+            f'{len(self.failures)} failed, {self.num_already_sent} already sent'
+        ]
+        if self.dry_run:
+            lines[0] = 'Dry run: ' + lines[0]
+        for key, e in self.failures:
+            lines.append(f'  {key}: {e!r}')
+        lines.append(f'Run name: {self.name}')
+        return '\n'.join(lines)
+
+
+class RateLimiter:
+    '''Spaces out calls to wait(), across all threads, so that they return no
+    more than per_second times a second.'''
+
+    def __init__(self, per_second=None):
+        self.interval = 1 / per_second if per_second else 0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            wait_until = max(now, self.next_at)
+            self.next_at = wait_until + self.interval
+
+        time.sleep(wait_until - now)
+
+
+class BulkMailCommand(BaseCommand):
+    '''Base class for management commands that send bulk mail.'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1, help='Number of threads to send from')
+        parser.add_argument('--rate', type=float, help='Maximum number of messages to send per second')
+        parser.add_argument('--dry-run', action='store_true', help='Build messages without sending them')
+        parser.add_argument(
+            '--run-name',
+            help='Name to record sent messages against (messages already sent under this name are not resent). '
+                 'Pass the run name from an interrupted run to resume it.',
+        )
+
+    def mail_run(self, default_name, options):
+        '''Return a MailRun, named by the --run-name option if it's given, or
+        else by default_name.'''
+
+        return MailRun(
+            options['run_name'] or default_name,
+            num_threads=options['threads'],
+            messages_per_second=options['rate'],
+            dry_run=options['dry_run'],
+        )
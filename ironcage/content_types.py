@@ -0,0 +1,49 @@
+'''Content types for the kinds of item that can be ordered, and for ExtraItem,
+which wraps some of these kinds of item.
+
+ContentType.objects.get() queries the database every time it's called,
+whereas these use ContentType's process-wide cache, which is filled by warm()
+when a worker starts.
+
+Compare an instance's content type with these via content_type_id, since
+accessing content_type on an instance queries the database.
+'''
+
+from django.contrib.contenttypes.models import ContentType
+
+
+# The natural key of each ContentType
+NATURAL_KEYS = {
+    'ticket': ('tickets', 'ticket'),
+    'extra_item': ('extras', 'extraitem'),
+    'children_ticket': ('extras', 'childrenticket'),
+    'dinner_ticket': ('extras', 'dinnerticket'),
+}
+
+
+def ticket():
+    return get('ticket')
+
+
+def extra_item():
+    return get('extra_item')
+
+
+def children_ticket():
+    return get('children_ticket')
+
+
+def dinner_ticket():
+    return get('dinner_ticket')
+
+
+def get(kind):
+    app_label, model = NATURAL_KEYS[kind]
+    return ContentType.objects.get_by_natural_key(app_label, model)
+
+
+def warm():
+    '''Load all the content types into ContentType's cache.'''
+
+    for kind in NATURAL_KEYS:
+        get(kind)
@@ -1,26 +1,70 @@
+import multiprocessing
+import re
+
 from django.conf import settings
 from django.core.mail import get_connection, EmailMultiAlternatives
+from django.template.loader import get_template
 
+import structlog
+logger = structlog.get_logger()
 
-def send_mail(subject, message, to_addr):
-    connection = get_connection()
 
-    mail = EmailMultiAlternatives(
-        subject,
-        message,
-        settings.EMAIL_FROM_ADDR,
-        [to_addr],
-        reply_to=[settings.EMAIL_REPLY_TO_ADDR],
-        connection=connection
-    )
+BLANK_LINES_RE = re.compile('\n\n\n+')
 
-    return mail.send()
 
+def collapse_blank_lines(text):
+    return BLANK_LINES_RE.sub('\n\n', text)
 
-def send_mail_with_attachment(subject, message, to_addr, attachments):
-    connection = get_connection()
 
-    mail = EmailMultiAlternatives(
+class MailTemplate:
+    '''The template for the body of a message, loaded once so that it can be
+    rendered for many recipients.
+
+    Runs of blank lines in the rendered body are collapsed, so that templates
+    can put blank lines around {% if %} and {% for %} tags.
+    '''
+
+    def __init__(self, template_name):
+        self.template_name = template_name
+        self.template = get_template(template_name)
+
+    @property
+    def source(self):
+        return self.template.template.source
+
+    def render(self, context):
+        return collapse_blank_lines(self.template.render(context))
+
+    def render_many(self, contexts, num_processes=1, chunksize=100):
+        '''Render each of contexts, optionally across a pool of processes.
+
+        When rendering across processes, each context must be picklable, and
+        rendering must not query the database, since the processes share the
+        parent's connection.
+        '''
+
+        if num_processes == 1:
+            return [self.render(context) for context in contexts]
+
+        with multiprocessing.Pool(num_processes, _init_render_worker, [self.template_name]) as pool:
+            return pool.map(_render_in_worker, contexts, chunksize)
+
+
+# The MailTemplate used by each process in MailTemplate.render_many's pool
+_worker_template = None
+
+
+def _init_render_worker(template_name):
+    global _worker_template
+    _worker_template = MailTemplate(template_name)
+
+
+def _render_in_worker(context):
+    return _worker_template.render(context)
+
+
+def build_mail(subject, message, to_addr, attachments=None, connection=None):
+    return EmailMultiAlternatives(
         subject,
         message,
         settings.EMAIL_FROM_ADDR,
@@ -30,4 +74,90 @@ def send_mail_with_attachment(subject, message, to_addr, attachments):
         attachments=attachments,
     )
 
+
+def send_mail(subject, message, to_addr):
+    connection = get_connection()
+    mail = build_mail(subject, message, to_addr, connection=connection)
     return mail.send()
+
+
+def send_mail_with_attachment(subject, message, to_addr, attachments):
+    connection = get_connection()
+    mail = build_mail(subject, message, to_addr, attachments, connection=connection)
+    return mail.send()
+
+
+class BulkMailer:
+    '''Sends many messages over one connection to the mail server, rather than
+    opening a new connection for each message.
+
+        with BulkMailer() as mailer:
+            for user in users:
+                mailer.send_mail(subject, body, user.email_addr)
+
+        self.stdout.write(mailer.report())
+
+    The connection is replaced after every messages_per_connection messages,
+    since mail servers limit how many messages they'll accept over one
+    connection, and after any failure, since the connection may then be
+    unusable.
+
+    A message that can't be sent is recorded in failures, and doesn't stop
+    the remaining messages from being sent.
+    '''
+
+    def __init__(self, messages_per_connection=100):
+        self.messages_per_connection = messages_per_connection
+        self.connection = None
+        self.num_sent_on_connection = 0
+        self.num_sent = 0
+        self.failures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def open(self):
+        self.connection = get_connection()
+        self.connection.open()
+        self.num_sent_on_connection = 0
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                logger.exception('Failed to close mail connection')
+            self.connection = None
+
+    def send_mail(self, subject, message, to_addr, attachments=None):
+        '''Send a message, returning whether it was sent.'''
+
+        try:
+            if self.num_sent_on_connection >= self.messages_per_connection:
+                self.close()
+            if self.connection is None:
+                self.open()
+
+            mail = build_mail(subject, message, to_addr, attachments, connection=self.connection)
+            mail.send()
+        except Exception as e:
+            logger.exception('Failed to send mail', to_addr=to_addr, subject=subject)
+            self.failures.append((to_addr, subject, e))
+            self.close()
+            return False
+
+        self.num_sent_on_connection += 1
+        self.num_sent += 1
+        return True
+
+    def send_mail_with_attachment(self, subject, message, to_addr, attachments):
+        return self.send_mail(subject, message, to_addr, attachments)
+
+    def report(self):
+        lines = [f'Sent {self.num_sent} messages, {len(self.failures)} failed']
+        for to_addr, subject, e in self.failures:
+            lines.append(f'  {to_addr} ({subject}): {e!r}')
+        return '\n'.join(lines)
@@ -0,0 +1,79 @@
+import os
+import re
+import time
+
+from django.core.management import BaseCommand
+from django.template.loader import get_template
+
+from ironcage.emails import MailTemplate
+
+
+def order_confirmation_context(ix):
+    return {
+        'purchaser_name': f'Purchaser {ix}',
+        'num_tickets': 3,
+        'num_items': 3,
+        'order_rows_summary': [
+            {'item_descr': '3-day individual-rate ticket', 'quantity': 1, 'total_cost_incl_vat': 150},
+            {'item_descr': '1-day individual-rate ticket', 'quantity': 2, 'total_cost_incl_vat': 120},
+        ],
+        'tickets_for_others': [
+            {'invitation': {'email_addr': f'friend-{ix}-1@example.com'}},
+            {'invitation': {'email_addr': f'friend-{ix}-2@example.com'}},
+        ],
+        'ticket_for_self': ix % 2 == 0,
+        'receipt_url': f'https://hq.pyconuk.org/orders/{ix:04X}/receipt/',
+    }
+
+
+def unclaimed_context(ix):
+    return {
+        'invite': {'ticket': {'free_reason': 'Financial Assistance' if ix % 10 == 0 else ''}},
+        'url': f'https://hq.pyconuk.org/tickets/invitations/{ix:024d}/',
+    }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rendering the bodies of bulk mail'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Number of messages to render')
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Size of process pool')
+
+    def handle(self, *args, count, processes, **kwargs):
+        benchmarks = [
+            ('orders/emails/order-confirmation.txt', order_confirmation_context),
+            ('tickets/emails/unclaimed.txt', unclaimed_context),
+        ]
+
+        for template_name, build_context in benchmarks:
+            contexts = [build_context(ix) for ix in range(count)]
+            self.stdout.write(f'{template_name} ({count} messages)')
+
+            def load_per_message():
+                bodies = []
+                for context in contexts:
+                    template = get_template(template_name)
+                    body_raw = template.render(context)
+                    bodies.append(re.sub('\n\n\n+', '\n\n', body_raw))
+                return bodies
+
+            expected = self.time('get_template and re.sub per message', load_per_message)
+
+            template = MailTemplate(template_name)
+            bodies = self.time('MailTemplate.render_many', lambda: template.render_many(contexts))
+            assert bodies == expected
+
+            if processes > 1:
+                bodies = self.time(
+                    f'MailTemplate.render_many with {processes} processes',
+                    lambda: template.render_many(contexts, num_processes=processes),
+                )
+                assert bodies == expected
+
+    def time(self, descr, fn):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'  {descr}: {elapsed:.3f}s ({len(result) / elapsed:.0f} messages/s)')
+        return result
@@ -1,20 +1,19 @@
-import re
-
-from django.core.management import BaseCommand
 from django.db.models import Q
-from django.template.loader import get_template
 
 from accounts.models import User
 from cfp.models import Proposal
 from grants.models import Application
-from ironcage.emails import send_mail
+from ironcage.bulk_mail import BulkMailCommand, message_run_name
+from ironcage.emails import MailTemplate
 from orders.models import Order
 from tickets.models import Ticket
 
 
-class Command(BaseCommand):
+class Command(BulkMailCommand):
 
     def add_arguments(self, parser):
+        super().add_arguments(parser)
+
         # Positional arguments
         parser.add_argument('template', nargs=1, type=str)
         parser.add_argument('subject', nargs=1, type=str)
@@ -31,17 +30,21 @@ class Command(BaseCommand):
 
         users_to_email = User.objects.filter(pk__in=all_emailees).all()
 
-        template = get_template(f'emails/{template[0]}.txt')
+        template = MailTemplate(f'emails/{template[0]}.txt')
+        run = self.mail_run(message_run_name('sendemailtofinaid', template, subject[0]), kwargs)
 
-        for user in users_to_email:
+        def build_message(user):
             context = {
                 'user': user
             }
-            body_raw = template.render(context)
-            body = re.sub('\n\n\n+', '\n\n', body_raw)
+            body = template.render(context)
 
-            send_mail(
+            return (
                 f'{subject[0]} ({user.user_id})',
                 body,
                 user.email_addr,
             )
+
+        run.send(users_to_email, build_message)
+
+        self.stdout.write(run.report())
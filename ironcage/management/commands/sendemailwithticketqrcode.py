@@ -1,22 +1,34 @@
-import re
-import io
-
-import pyqrcode
-from django.core.management import BaseCommand
-from django.template.loader import get_template
+import os
 
 from accounts.models import User
-from ironcage.emails import send_mail_with_attachment
+from ironcage.bulk_mail import BulkMailCommand, message_run_name
+from ironcage.emails import MailTemplate
+from tickets import qr_codes
 from tickets.models import Ticket
 
 
-class Command(BaseCommand):
+class Command(BulkMailCommand):
 
     def add_arguments(self, parser):
+        super().add_arguments(parser)
+
         # Positional arguments
         parser.add_argument('template', nargs=1, type=str)
         parser.add_argument('subject', nargs=1, type=str)
 
+        parser.add_argument(
+            '--qr-processes',
+            type=int,
+            default=os.cpu_count(),
+            help='Size of process pool for rendering QR codes that are not cached',
+        )
+        parser.add_argument(
+            '--render-processes',
+            type=int,
+            default=os.cpu_count(),
+            help='Size of process pool for rendering message bodies',
+        )
+
     def handle(self, template, subject, **kwargs):
 
         # All ticket holders
@@ -26,25 +38,34 @@ class Command(BaseCommand):
 
         all_emailees = set(list(ticket_holders))
 
-        users_to_email = User.objects.filter(pk__in=all_emailees).all()
+        users_to_email = list(User.objects.filter(pk__in=all_emailees).select_related('ticket'))
 
-        template = get_template(f'emails/{template[0]}.txt')
+        codes = qr_codes.get_many(
+            [user.ticket.ticket_id for user in users_to_email],
+            'png',
+            5,
+            num_processes=kwargs['qr_processes'],
+        )
 
-        for user in users_to_email:
-            context = {
-                'user': user
-            }
-            body_raw = template.render(context)
-            body = re.sub('\n\n\n+', '\n\n', body_raw)
+        template = MailTemplate(f'emails/{template[0]}.txt')
+        run = self.mail_run(message_run_name('sendemailwithticketqrcode', template, subject[0]), kwargs)
 
-            code = pyqrcode.create(user.ticket.ticket_id)
-            buffer = io.BytesIO()
-            code.png(buffer, scale=5)
-            buffer.seek(0)
+        # The templates only use fields of the user, so the bodies can be
+        # rendered across processes up front.
+        bodies = template.render_many(
+            [{'user': user} for user in users_to_email],
+            num_processes=kwargs['render_processes'],
+        )
+        bodies_by_user_id = {user.id: body for user, body in zip(users_to_email, bodies)}
 
-            send_mail_with_attachment(
+        def build_message(user):
+            return (
                 f'{subject[0]} ({user.user_id})',
-                body,
+                bodies_by_user_id[user.id],
                 user.email_addr,
-                [('ticket.png', buffer.read(), 'image/png')]
+                [('ticket.png', codes[user.ticket.ticket_id], 'image/png')]
             )
+
+        run.send(users_to_email, build_message)
+
+        self.stdout.write(run.report())
@@ -1,5 +1,15 @@
+from contextlib import ExitStack
+import random
+
+from django.conf import settings
+from django.db import connections
 from django.http import HttpResponse
 
+from ironcage import request_metrics
+
+import structlog
+logger = structlog.get_logger()
+
 
 def http_trace_middleware(get_response):
     '''This middleware returns 405 (method not allowed) in reponse to an HTTP
@@ -12,3 +22,41 @@ def http_trace_middleware(get_response):
         return get_response(request)
 
     return middleware
+
+
+def request_metrics_middleware(get_response):
+    '''This middleware records the wall time, number of database queries,
+    database time, template render time, and response size of each request.
+
+    See ironcage.request_metrics.
+    '''
+
+    def middleware(request):
+        metrics = request_metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.record_query))
+                response = get_response(request)
+        finally:
+            request_metrics.stop()
+
+        match = request.resolver_match
+        url_name = match.view_name if match else None
+        metrics.finish(url_name, response)
+
+        request_metrics.record(metrics, settings.REQUEST_METRICS_BUFFER_SIZE)
+
+        if random.random() < settings.REQUEST_METRICS_SAMPLE_RATE:
+            # The path isn't logged, since some paths (such as those of iCal
+            # feeds) contain secret tokens.  The URL name is logged instead.
+            logger.info(
+                'request_metrics',
+                method=request.method,
+                status=response.status_code,
+                **metrics.as_log_fields()
+            )
+
+        return response
+
+    return middleware
@@ -0,0 +1,28 @@
+# Generated by Django 2.0.3 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentMail',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_name', models.CharField(max_length=200)),
+                ('key', models.CharField(max_length=200)),
+                ('to_addr', models.CharField(max_length=254)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='sentmail',
+            unique_together={('run_name', 'key')},
+        ),
+    ]
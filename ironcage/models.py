@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class SentMail(models.Model):
+    '''A record that a message in a bulk mail run has been sent, so that the
+    run can be resumed without mailing anyone twice if it is interrupted.'''
+
+    run_name = models.CharField(max_length=200)
+    key = models.CharField(max_length=200)
+    to_addr = models.CharField(max_length=254)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('run_name', 'key')
+
+    class Manager(models.Manager):
+        def keys_for_run(self, run_name):
+            return set(self.filter(run_name=run_name).values_list('key', flat=True))
+
+    objects = Manager()
+
+    def __str__(self):
+        return f'{self.run_name}: {self.key}'
@@ -0,0 +1,180 @@
+'''Timings and database query counts for each request, so that we can see
+which views are slow or make too many queries.
+
+request_metrics_middleware (in ironcage.middleware) measures each request, and:
+
+    * logs a request_metrics event for a sample of requests (see
+      REQUEST_METRICS_SAMPLE_RATE)
+    * records the request's metrics in a ring buffer for its view (see
+      REQUEST_METRICS_BUFFER_SIZE), which summarise() reports percentiles from
+
+Template render time is measured by TimedDjangoTemplates, which must be the
+template backend for it to be recorded.
+
+The ring buffers are held in memory, so each worker process reports on the
+requests that it has handled since it started.
+'''
+
+from collections import deque
+import threading
+import time
+
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template import TemplateDoesNotExist
+
+
+# The metrics of the request being handled by each thread
+_local = threading.local()
+
+# A ring buffer of recent RequestMetrics for each view, keyed by URL name
+_buffers = {}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.url_name = None
+        self.wall_time = None
+        self.num_queries = 0
+        self.db_time = 0
+        self.template_time = 0
+        self.template_depth = 0
+        self.response_size = None
+
+    def record_query(self, execute, sql, params, many, context):
+        '''Execute a query, recording its time.  This is a database execute
+        wrapper.'''
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.num_queries += 1
+
+    def finish(self, url_name, response):
+        self.wall_time = time.perf_counter() - self.start
+        self.url_name = url_name
+        if not response.streaming:
+            self.response_size = len(response.content)
+
+    def as_log_fields(self):
+        return {
+            'url_name': self.url_name,
+            'wall_ms': ms(self.wall_time),
+            'num_queries': self.num_queries,
+            'db_ms': ms(self.db_time),
+            'template_ms': ms(self.template_time),
+            'response_bytes': self.response_size,
+        }
+
+
+def start():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def stop():
+    _local.metrics = None
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+def record(metrics, buffer_size):
+    buffer = _buffers.get(metrics.url_name)
+    if buffer is None or buffer.maxlen != buffer_size:
+        # If the buffer size has changed, keep as many of the most recent
+        # requests as still fit
+        buffer = deque(buffer or [], maxlen=buffer_size)
+        _buffers[metrics.url_name] = buffer
+    buffer.append(metrics)
+
+
+def clear():
+    _buffers.clear()
+
+
+# The measures reported by summarise(), and how to get each from a RequestMetrics
+MEASURES = [
+    ('Wall time (ms)', lambda metrics: ms(metrics.wall_time)),
+    ('Queries', lambda metrics: metrics.num_queries),
+    ('DB time (ms)', lambda metrics: ms(metrics.db_time)),
+    ('Template time (ms)', lambda metrics: ms(metrics.template_time)),
+    ('Response size (bytes)', lambda metrics: metrics.response_size or 0),
+]
+
+PERCENTILES = [50, 95, 99]
+
+
+def summarise():
+    '''Return a dict for each view with recorded requests, with the number of
+    requests and, for each of MEASURES, the value at each of PERCENTILES.
+
+    Views are ordered with the slowest (by p95 wall time) first.
+    '''
+
+    summaries = []
+
+    for url_name, buffer in list(_buffers.items()):
+        requests = list(buffer)
+        if not requests:
+            continue
+
+        measures = []
+        for descr, measure in MEASURES:
+            values = sorted(measure(metrics) for metrics in requests)
+            measures.append((descr, [percentile(values, p) for p in PERCENTILES]))
+
+        summaries.append({
+            'url_name': url_name,
+            'num_requests': len(requests),
+            'measures': measures,
+        })
+
+    return sorted(summaries, key=lambda summary: summary['measures'][0][1][1], reverse=True)
+
+
+def percentile(sorted_values, p):
+    '''Return the p-th percentile of sorted_values, by the nearest-rank
+    method.'''
+
+    rank = max(1, -(-p * len(sorted_values) // 100))
+    return sorted_values[rank - 1]
+
+
+def ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return super().render(context, request)
+
+        # Templates rendered while rendering another template (for instance,
+        # by a template tag) are already being timed.
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if metrics.template_depth == 0:
+                metrics.template_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    '''The Django template backend, recording how long templates take to
+    render in the current request's metrics.'''
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
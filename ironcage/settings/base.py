@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     'ironcage',
     'schedule',
     'extras',
+    'jobs',
 
     'bootstrap4',
     'django_slack',
@@ -70,6 +71,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'ironcage.middleware.http_trace_middleware',
+    'ironcage.middleware.request_metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,7 +86,8 @@ ROOT_URLCONF = 'ironcage.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, timing how long templates take to render
+        'BACKEND': 'ironcage.request_metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -109,6 +112,22 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+
+# The cache is kept in the database, so that it is shared between processes
+# without needing another service.  Its table is created by createcachetable.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'ironcage_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
 
@@ -212,6 +231,10 @@ LOGGING = {
 STRIPE_API_KEY_PUBLISHABLE = os.environ.get('STRIPE_API_KEY_PUBLISHABLE', ENVVAR_SENTINAL)
 STRIPE_API_KEY_SECRET = os.environ.get('STRIPE_API_KEY_SECRET', ENVVAR_SENTINAL)
 
+# Point this at a stand-in for Stripe's API (see ironcage/tests/fake_stripe.py)
+# to make charges without talking to Stripe
+STRIPE_API_BASE = os.environ.get('STRIPE_API_BASE', 'https://api.stripe.com')
+
 
 # Mailgun
 
@@ -229,6 +252,21 @@ SLACK_CHANNEL = '#ironcage-logs'
 SLACK_USERNAME = 'ironcage-log-bot'
 SLACK_SIGNUP_LINK = os.environ.get('SLACK_SIGNUP_LINK', ENVVAR_SENTINAL)
 
+
+# Request metrics (see ironcage/request_metrics.py)
+
+# The proportion of requests whose metrics are logged
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', '0.1'))
+
+# The number of recent requests to each view whose metrics are kept
+REQUEST_METRICS_BUFFER_SIZE = 1000
+
+
+# Jobs
+
+# When set, jobs are run as soon as they are enqueued, rather than by a worker
+RUN_JOBS_IMMEDIATELY = False
+
 # Admins for mailing errors to
 
 ADMINS = [['-', email_addr] for email_addr in os.environ.get('ADMINS', '').split(',')]
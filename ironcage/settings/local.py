@@ -16,6 +16,9 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # Write Slack messages to the console
 SLACK_BACKEND = 'django_slack.backends.ConsoleBackend'
 
+# Run jobs as soon as they are enqueued, so that we don't need to run a worker
+RUN_JOBS_IMMEDIATELY = True
+
 # Don't log Slack error reports to the console
 LOGGING['loggers']['django']['handlers'].remove('slack')
 
@@ -6,6 +6,9 @@ DOMAIN = 'http://testserver'
 # Disable sending Slack messaages in tests
 SLACK_BACKEND = 'django_slack.backends.TestBackend'
 
+# Run jobs synchronously, so that tests can see their effects
+RUN_JOBS_IMMEDIATELY = True
+
 # Admins for mailing errors to
 ADMINS = ['admin@example.com']
 
@@ -3,38 +3,43 @@ import stripe
 from django.conf import settings
 
 
-def set_stripe_api_key():
+def configure_stripe():
     stripe.api_key = settings.STRIPE_API_KEY_SECRET
+    stripe.api_base = settings.STRIPE_API_BASE
 
 
-def create_charge(amount_pence, description, statement_descriptor, token):
+def create_charge(amount_pence, description, statement_descriptor, token, idempotency_key=None):
     assert len(statement_descriptor) <= 22
-    set_stripe_api_key()
+    configure_stripe()
     return stripe.Charge.create(
         amount=amount_pence,
         currency='gbp',
         description=description,
         statement_descriptor=statement_descriptor,
         source=token,
+        idempotency_key=idempotency_key,
     )
 
 
-def create_charge_for_order(order, token):
+def create_charge_for_order(order, token, idempotency_key=None):
     assert order.payment_required()
     return create_charge(
         order.cost_pence_incl_vat,
         f'PyCon UK order {order.order_id}',
         f'PyCon UK {order.order_id}',
         token,
+        idempotency_key,
     )
 
 
-def refund_charge(charge_id, amount_pence=None):
-    set_stripe_api_key()
+def refund_charge(charge_id, amount_pence=None, idempotency_key=None):
+    configure_stripe()
+    kwargs = {'charge': charge_id}
     if amount_pence is not None:
-        return stripe.Refund.create(charge=charge_id, amount=amount_pence)
-    else:
-        return stripe.Refund.create(charge=charge_id)
+        kwargs['amount'] = amount_pence
+    if idempotency_key is not None:
+        kwargs['idempotency_key'] = idempotency_key
+    return stripe.Refund.create(**kwargs)
 
 
 def refund_item(item):
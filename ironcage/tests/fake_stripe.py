@@ -0,0 +1,200 @@
+'''A stand-in for the parts of Stripe's API that we use, so that paying for
+orders can be tested, and load tested, without talking to Stripe.
+
+In tests:
+
+    with FakeStripe() as fake_stripe, self.settings(STRIPE_API_BASE=fake_stripe.api_base):
+        # Charges and refunds are made against fake_stripe
+        ...
+
+To run a server for load testing, set STRIPE_API_BASE to http://localhost:12111
+and run:
+
+    python -m ironcage.tests.fake_stripe --port 12111 --latency 0.5
+
+Like Stripe, a request with an Idempotency-Key header that has already been
+seen gets the response to the original request, and a request with a key whose
+original request is still being handled gets a 409.  Charges made with a token
+beginning tok_chargeDeclined are declined.
+'''
+
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+from socketserver import ThreadingMixIn
+import threading
+import time
+from urllib.parse import parse_qs
+import uuid
+
+
+class FakeStripe:
+    def __init__(self, port=0, latency=0):
+        self.latency = latency
+        self.charges = {}
+        self.refunds = {}
+        self.lock = threading.Lock()
+        self.responses_by_idempotency_key = {}
+
+        fake_stripe = self
+
+        class Handler(RequestHandler):
+            stripe = fake_stripe
+
+        self.server = ThreadingHTTPServer(('localhost', port), Handler)
+        self.thread = None
+
+    @property
+    def api_base(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def handle(self, path, params, idempotency_key):
+        '''Return (status, body) for a POST request.'''
+
+        if idempotency_key is None:
+            return self.dispatch(path, params)
+
+        with self.lock:
+            if idempotency_key in self.responses_by_idempotency_key:
+                response = self.responses_by_idempotency_key[idempotency_key]
+                if response is None:
+                    return 409, error_body(
+                        'idempotency_error',
+                        'There is currently another in-progress request using this Idempotent Key.',
+                    )
+                return response
+            self.responses_by_idempotency_key[idempotency_key] = None
+
+        response = self.dispatch(path, params)
+
+        with self.lock:
+            self.responses_by_idempotency_key[idempotency_key] = response
+
+        return response
+
+    def dispatch(self, path, params):
+        time.sleep(self.latency)
+
+        if path == '/v1/charges':
+            return self.create_charge(params)
+        elif path == '/v1/refunds':
+            return self.create_refund(params)
+        else:
+            return 404, error_body('invalid_request_error', f'Unrecognized request URL (POST: {path})')
+
+    def create_charge(self, params):
+        if params['source'].startswith('tok_chargeDeclined'):
+            return 402, error_body('card_error', 'Your card was declined.', code='card_declined')
+
+        charge = {
+            'id': new_id('ch'),
+            'object': 'charge',
+            'amount': int(params['amount']),
+            'amount_refunded': 0,
+            'created': int(time.time()),
+            'currency': params['currency'],
+            'description': params.get('description'),
+            'statement_descriptor': params.get('statement_descriptor'),
+            'metadata': {},
+            'paid': True,
+            'refunded': False,
+            'status': 'succeeded',
+        }
+
+        with self.lock:
+            self.charges[charge['id']] = charge
+
+        return 200, charge
+
+    def create_refund(self, params):
+        with self.lock:
+            charge = self.charges.get(params['charge'])
+            if charge is None:
+                return 404, error_body('invalid_request_error', f'No such charge: {params["charge"]}')
+
+            amount = int(params.get('amount', charge['amount'] - charge['amount_refunded']))
+            if amount > charge['amount'] - charge['amount_refunded']:
+                return 400, error_body(
+                    'invalid_request_error',
+                    f'Charge {charge["id"]} has already been refunded.',
+                    code='charge_already_refunded',
+                )
+
+            charge['amount_refunded'] += amount
+            charge['refunded'] = charge['amount_refunded'] == charge['amount']
+
+            refund = {
+                'id': new_id('re'),
+                'object': 'refund',
+                'amount': amount,
+                'charge': charge['id'],
+                'created': int(time.time()),
+                'currency': charge['currency'],
+                'metadata': {},
+                'status': 'succeeded',
+            }
+            self.refunds[refund['id']] = refund
+
+        return 200, refund
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    stripe = None
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf8')
+        params = {k: v[0] for k, v in parse_qs(body).items()}
+
+        status, response_body = self.stripe.handle(self.path, params, self.headers.get('Idempotency-Key'))
+
+        data = json.dumps(response_body).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Request-Id', new_id('req'))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def error_body(type, message, code=None):
+    return {'error': {'type': type, 'message': message, 'code': code}}
+
+
+def new_id(prefix):
+    return f'{prefix}_{uuid.uuid4().hex[:24]}'
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Run a stand-in for Stripe\'s API')
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency', type=float, default=0, help='Seconds to take to handle each request')
+    args = parser.parse_args()
+
+    fake_stripe = FakeStripe(port=args.port, latency=args.latency)
+    print(f'Serving at {fake_stripe.api_base}')
+    fake_stripe.server.serve_forever()
@@ -0,0 +1,56 @@
+import csv
+import io
+import os
+import tempfile
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from accounts.models import Badge
+from tickets.tests.factories import create_ticket, create_user
+
+
+class TestBadgeDump(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = create_user('Alice', email_addr='alice@example.com')
+        cls.ticket = create_ticket(cls.alice)
+
+    def test_email(self):
+        mail.outbox = []
+
+        call_command('badgedump', email='alice@example.com', spare_badges=2)
+
+        self.assertEqual(len(mail.outbox), 1)
+        email = mail.outbox[0]
+        self.assertEqual(email.to, ['alice@example.com'])
+        filename, data, _ = email.attachments[0]
+        self.assertEqual(filename, 'badges.csv')
+
+        rows = list(csv.DictReader(io.StringIO(data)))
+        self.assertEqual([row['type'] for row in rows], ['claimed', 'spare', 'spare'])
+        self.assertEqual(rows[0]['badge_id'], self.ticket.badge.get().badge_id)
+        self.assertNotEqual(rows[0]['snake'], '')
+        self.assertEqual(Badge.objects.spare().count(), 2)
+
+    def test_output_to_file(self):
+        mail.outbox = []
+
+        with tempfile.TemporaryDirectory() as dir_path:
+            path = os.path.join(dir_path, 'badges.csv')
+            call_command('badgedump', output=path, spare_badges=0)
+            with open(path) as f:
+                rows = list(csv.DictReader(f))
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual([row['name'] for row in rows], ['Alice'])
+
+    def test_output_to_stdout_and_email(self):
+        mail.outbox = []
+        out = io.StringIO()
+
+        call_command('badgedump', output='-', email='badges@example.com', spare_badges=0, stdout=out)
+
+        self.assertEqual(mail.outbox[0].to, ['badges@example.com'])
+        self.assertEqual(out.getvalue(), mail.outbox[0].attachments[0][1])
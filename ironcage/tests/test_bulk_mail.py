@@ -0,0 +1,163 @@
+import io
+import time
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from accounts.tests.factories import create_user
+from ironcage.bulk_mail import MailRun, RateLimiter, invocation_run_name, message_run_name
+from ironcage.emails import MailTemplate
+from ironcage.models import SentMail
+from tickets.tests.factories import create_ticket
+
+
+def build_message(user):
+    return ('Subject', f'Hello {user.name}', user.email_addr)
+
+
+@override_settings(EMAIL_BACKEND='ironcage.tests.test_emails.RecordingBackend')
+class MailRunTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = create_user(name='Alice', email_addr='alice@example.com')
+        cls.bob = create_user(name='Bob', email_addr='bob@example.org')
+        cls.clara = create_user(name='Clara', email_addr='clara@example.com')
+
+    def test_send(self):
+        sent_to = []
+
+        run = MailRun('test')
+        run.send([self.alice, self.clara], build_message, on_sent=sent_to.append)
+
+        self.assertEqual([m.to for m in mail.outbox], [['alice@example.com'], ['clara@example.com']])
+        self.assertEqual(mail.outbox[0].body, 'Hello Alice')
+        self.assertEqual(sent_to, [self.alice, self.clara])
+        self.assertEqual(
+            SentMail.objects.keys_for_run('test'),
+            {f'accounts.user:{self.alice.pk}', f'accounts.user:{self.clara.pk}'}
+        )
+        self.assertEqual(run.num_sent, 2)
+
+    def test_send_skips_recipients_without_message(self):
+        run = MailRun('test')
+        run.send([self.alice, self.clara], lambda user: build_message(user) if user.name == 'Clara' else None)
+
+        self.assertEqual([m.to for m in mail.outbox], [['clara@example.com']])
+
+    def test_resume(self):
+        MailRun('test').send([self.alice], build_message)
+        mail.outbox = []
+
+        run = MailRun('test')
+        run.send([self.alice, self.clara], build_message)
+
+        self.assertEqual([m.to for m in mail.outbox], [['clara@example.com']])
+        self.assertEqual(run.num_already_sent, 1)
+
+    def test_failures_are_not_recorded_as_sent(self):
+        sent_to = []
+
+        run = MailRun('test')
+        run.send([self.alice, self.bob, self.clara], build_message, on_sent=sent_to.append)
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(sent_to, [self.alice, self.clara])
+        [(key, e)] = run.failures
+        self.assertEqual(key, f'accounts.user:{self.bob.pk}')
+        self.assertNotIn(key, SentMail.objects.keys_for_run('test'))
+
+    def test_failures_building_messages(self):
+        def build_message_or_fail(user):
+            if user.name == 'Alice':
+                raise ValueError('Oops')
+            return build_message(user)
+
+        run = MailRun('test')
+        run.send([self.alice, self.clara], build_message_or_fail)
+
+        self.assertEqual([m.to for m in mail.outbox], [['clara@example.com']])
+        self.assertEqual(len(run.failures), 1)
+
+    def test_dry_run(self):
+        run = MailRun('test', dry_run=True)
+        run.send([self.alice, self.clara], build_message)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(SentMail.objects.count(), 0)
+        self.assertTrue(run.report().startswith('Dry run: Built 2 messages in '))
+
+
+class ThreadedMailRunTests(TransactionTestCase):
+    def test_send_from_several_threads(self):
+        users = [create_user(email_addr=f'user{ix}@example.com') for ix in range(20)]
+
+        run = MailRun('test', num_threads=4)
+        run.send(users, build_message)
+
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(user.email_addr for user in users))
+        self.assertEqual(SentMail.objects.count(), 20)
+        self.assertEqual(run.failures, [])
+
+
+class RateLimiterTests(TestCase):
+    def test_wait(self):
+        rate_limiter = RateLimiter(50)
+
+        start = time.monotonic()
+        for _ in range(6):
+            rate_limiter.wait()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+
+class RunNameTests(TestCase):
+    def test_invocation_run_name(self):
+        name_1 = invocation_run_name('emailgrants')
+        time.sleep(0.001)
+        name_2 = invocation_run_name('emailgrants')
+
+        self.assertTrue(name_1.startswith('emailgrants:'))
+        self.assertNotEqual(name_1, name_2)
+
+    def test_message_run_name(self):
+        template = MailTemplate('emails/feedback.txt')
+
+        self.assertEqual(
+            message_run_name('sendemail', template, 'Feedback'),
+            message_run_name('sendemail', template, 'Feedback'),
+        )
+        self.assertNotEqual(
+            message_run_name('sendemail', template, 'Feedback'),
+            message_run_name('sendemail', template, 'More feedback'),
+        )
+        self.assertNotEqual(
+            message_run_name('sendemail', template, 'Feedback'),
+            message_run_name('sendemail', MailTemplate('emails/profile.txt'), 'Feedback'),
+        )
+
+
+@override_settings(EMAIL_BACKEND='ironcage.tests.test_emails.RecordingBackend')
+class SendEmailWithTicketQRCodeTests(TestCase):
+    def test_send(self):
+        alice = create_user(name='Alice', email_addr='alice@example.com')
+        bob = create_user(name='Bob', email_addr='bob@example.com')
+        create_ticket(alice)
+        create_ticket(bob)
+        mail.outbox = []
+
+        call_command(
+            'sendemailwithticketqrcode',
+            'mrspotts',
+            'Your ticket',
+            qr_processes=1,
+            render_processes=2,
+            stdout=io.StringIO(),
+        )
+
+        messages = sorted(mail.outbox, key=lambda m: m.to)
+        self.assertEqual([m.to for m in messages], [['alice@example.com'], ['bob@example.com']])
+        self.assertEqual(messages[0].subject, f'Your ticket ({alice.user_id})')
+        self.assertIn('Alice', messages[0].body)
+        self.assertIn('Bob', messages[1].body)
+        self.assertEqual(messages[0].attachments[0][0], 'ticket.png')
@@ -0,0 +1,25 @@
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from extras.models import ChildrenTicket, DinnerTicket, ExtraItem
+from tickets.models import Ticket
+
+from .. import content_types
+
+
+class ContentTypesTests(TestCase):
+    def test_content_types(self):
+        self.assertEqual(content_types.ticket(), ContentType.objects.get_for_model(Ticket))
+        self.assertEqual(content_types.extra_item(), ContentType.objects.get_for_model(ExtraItem))
+        self.assertEqual(content_types.children_ticket(), ContentType.objects.get_for_model(ChildrenTicket))
+        self.assertEqual(content_types.dinner_ticket(), ContentType.objects.get_for_model(DinnerTicket))
+
+    def test_no_queries_after_warm(self):
+        ContentType.objects.clear_cache()
+        content_types.warm()
+
+        with self.assertNumQueries(0):
+            content_types.ticket()
+            content_types.extra_item()
+            content_types.children_ticket()
+            content_types.dinner_ticket()
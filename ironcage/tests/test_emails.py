@@ -0,0 +1,103 @@
+from smtplib import SMTPRecipientsRefused
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.test import TestCase, override_settings
+
+from ironcage.emails import BulkMailer, MailTemplate, collapse_blank_lines
+
+
+class RecordingBackend(locmem.EmailBackend):
+    '''Records how many connections are opened, and refuses to send to
+    addresses at example.org.'''
+
+    num_opened = 0
+
+    def open(self):
+        RecordingBackend.num_opened += 1
+        return True
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0].endswith('@example.org'):
+                raise SMTPRecipientsRefused({message.to[0]: (550, b'No such user')})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='ironcage.tests.test_emails.RecordingBackend')
+class BulkMailerTests(TestCase):
+    def setUp(self):
+        RecordingBackend.num_opened = 0
+
+    def test_send_mail(self):
+        with BulkMailer() as mailer:
+            for ix in range(5):
+                self.assertTrue(mailer.send_mail('Subject', 'Body', f'user{ix}@example.com'))
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].to, ['user0@example.com'])
+        self.assertEqual(mail.outbox[0].from_email, 'PyCon UK 2018 <noreply@pyconuk.org>')
+        self.assertEqual(RecordingBackend.num_opened, 1)
+        self.assertEqual(mailer.report(), 'Sent 5 messages, 0 failed')
+
+    def test_send_mail_with_attachment(self):
+        with BulkMailer() as mailer:
+            mailer.send_mail_with_attachment('Subject', 'Body', 'user@example.com', [('ticket.png', b'PNG', 'image/png')])
+
+        self.assertEqual(mail.outbox[0].attachments, [('ticket.png', b'PNG', 'image/png')])
+
+    def test_connection_is_replaced_after_messages_per_connection(self):
+        with BulkMailer(messages_per_connection=2) as mailer:
+            for ix in range(5):
+                mailer.send_mail('Subject', 'Body', f'user{ix}@example.com')
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(RecordingBackend.num_opened, 3)
+
+    def test_failures_are_reported(self):
+        with BulkMailer() as mailer:
+            self.assertTrue(mailer.send_mail('Subject', 'Body', 'alice@example.com'))
+            self.assertFalse(mailer.send_mail('Subject', 'Body', 'bob@example.org'))
+            self.assertTrue(mailer.send_mail('Subject', 'Body', 'clara@example.com'))
+
+        self.assertEqual([m.to for m in mail.outbox], [['alice@example.com'], ['clara@example.com']])
+        [(to_addr, subject, e)] = mailer.failures
+        self.assertEqual(to_addr, 'bob@example.org')
+        self.assertIsInstance(e, SMTPRecipientsRefused)
+        self.assertTrue(mailer.report().startswith('Sent 2 messages, 1 failed\n  bob@example.org (Subject): '))
+
+
+class MailTemplateTests(TestCase):
+    def setUp(self):
+        self.template = MailTemplate('tickets/emails/unclaimed.txt')
+
+    def test_render(self):
+        body = self.template.render({'invite': {'ticket': {'free_reason': ''}}, 'url': 'http://testserver/'})
+
+        self.assertIn('allocated to you http://testserver/.', body)
+        self.assertNotIn('\n\n\n', body)
+
+    def test_render_many(self):
+        contexts = [
+            {'invite': {'ticket': {'free_reason': 'Financial Assistance'}}, 'url': f'http://testserver/{ix}/'}
+            for ix in range(5)
+        ]
+
+        bodies = self.template.render_many(contexts)
+
+        self.assertEqual(bodies, [self.template.render(context) for context in contexts])
+
+    def test_render_many_with_processes(self):
+        contexts = [
+            {'invite': {'ticket': {'free_reason': ''}}, 'url': f'http://testserver/{ix}/'}
+            for ix in range(5)
+        ]
+
+        bodies = self.template.render_many(contexts, num_processes=2, chunksize=2)
+
+        self.assertEqual(bodies, [self.template.render(context) for context in contexts])
+
+
+class CollapseBlankLinesTests(TestCase):
+    def test_collapse_blank_lines(self):
+        self.assertEqual(collapse_blank_lines('a\n\n\n\nb\n\nc\nd'), 'a\n\nb\n\nc\nd')
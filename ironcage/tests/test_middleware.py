@@ -1,7 +1,108 @@
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts.tests.factories import create_staff_user
+
+from ironcage import request_metrics
 
 
 class MiddlewareTests(TestCase):
     def test_trace(self):
         rsp = self.client.trace('/')
         self.assertEqual(rsp.status_code, 405)
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        request_metrics.clear()
+
+    def tearDown(self):
+        request_metrics.clear()
+
+    def test_records_metrics(self):
+        self.client.get('/accounts/login/')
+        self.client.get('/accounts/login/')
+
+        [summary] = request_metrics.summarise()
+        self.assertEqual(summary['url_name'], 'login')
+        self.assertEqual(summary['num_requests'], 2)
+
+        [metrics, _] = request_metrics._buffers['login']
+        self.assertGreater(metrics.wall_time, 0)
+        self.assertGreater(metrics.template_time, 0)
+        self.assertLessEqual(metrics.template_time, metrics.wall_time)
+        self.assertGreater(metrics.response_size, 0)
+
+    def test_counts_queries(self):
+        self.client.force_login(create_staff_user())
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/reports/')
+
+        metrics, = request_metrics._buffers['reports:index']
+        self.assertGreater(metrics.num_queries, 0)
+        self.assertEqual(metrics.num_queries, len(queries))
+        self.assertGreater(metrics.db_time, 0)
+
+    @override_settings(REQUEST_METRICS_BUFFER_SIZE=3)
+    def test_buffer_is_bounded(self):
+        for _ in range(5):
+            self.client.get('/accounts/login/')
+
+        self.assertEqual(len(request_metrics._buffers['login']), 3)
+
+    def test_buffer_is_resized(self):
+        with self.settings(REQUEST_METRICS_BUFFER_SIZE=3):
+            for _ in range(3):
+                self.client.get('/accounts/login/')
+
+        with self.settings(REQUEST_METRICS_BUFFER_SIZE=2):
+            self.client.get('/accounts/login/')
+
+        self.assertEqual(request_metrics._buffers['login'].maxlen, 2)
+        self.assertEqual(len(request_metrics._buffers['login']), 2)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1)
+    def test_logs_sampled_requests(self):
+        with patch('ironcage.middleware.logger') as logger:
+            self.client.get('/accounts/login/')
+
+        logger.info.assert_called_once()
+        args, kwargs = logger.info.call_args
+        self.assertEqual(args, ('request_metrics',))
+        self.assertEqual(kwargs['url_name'], 'login')
+        self.assertEqual(kwargs['status'], 200)
+        self.assertEqual(
+            sorted(kwargs),
+            sorted(['method', 'status', 'url_name', 'wall_ms', 'num_queries', 'db_ms',
+                    'template_ms', 'response_bytes']),
+        )
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=1)
+    def test_does_not_log_secret_tokens(self):
+        with patch('ironcage.middleware.logger') as logger:
+            self.client.get('/schedule/ical/abcdefghijklmnop/')
+
+        args, kwargs = logger.info.call_args
+        self.assertEqual(kwargs['url_name'], 'schedule:ical')
+        self.assertNotIn('abcdefghijklmnop', repr(kwargs))
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_does_not_log_unsampled_requests(self):
+        with patch('ironcage.middleware.logger') as logger:
+            self.client.get('/accounts/login/')
+
+        logger.info.assert_not_called()
+
+
+class PercentileTests(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(request_metrics.percentile(values, 50), 50)
+        self.assertEqual(request_metrics.percentile(values, 95), 95)
+        self.assertEqual(request_metrics.percentile(values, 99), 99)
+        self.assertEqual(request_metrics.percentile([7], 99), 7)
+        self.assertEqual(request_metrics.percentile([1, 2], 50), 1)
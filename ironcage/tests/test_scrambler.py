@@ -1,3 +1,4 @@
+from django.http import Http404
 from django.test import TestCase
 
 from ironcage.utils import Scrambler
@@ -13,3 +14,41 @@ class ScramblerTests(TestCase):
                 outputs.add(o)
                 self.assertEqual(scrambler.backward(o), i)
             self.assertEqual(len(outputs), 2 ** 16)
+
+    def test_scrambler_matches_original_table(self):
+        n = 16
+        N = 2 ** n
+        m = sum(2 ** i for i in range(n) if i % 3 == 0)
+
+        for offset in [1000, 2000, 3000, 4000, 5000, 6000, 7000, 8000]:
+            scrambler = Scrambler(offset)
+            for i in range(N):
+                o = format((m * i + offset) % N, '0>4x').upper()
+                self.assertEqual(scrambler.forward(i), o)
+                self.assertEqual(scrambler.backward(o), i)
+
+    def test_scrambler_beyond_2_16(self):
+        scrambler = Scrambler(1000)
+        outputs = set()
+        for i in list(range(2 ** 16, 2 ** 16 + 1000)) + [2 ** 31 - 1, 2 ** 32 - 1]:
+            o = scrambler.forward(i)
+            self.assertEqual(len(o), 8)
+            outputs.add(o)
+            self.assertEqual(scrambler.backward(o), i)
+        self.assertEqual(len(outputs), 1002)
+
+    def test_scrambler_out_of_range(self):
+        scrambler = Scrambler(1000)
+        with self.assertRaises(KeyError):
+            scrambler.forward(-1)
+        with self.assertRaises(KeyError):
+            scrambler.forward(2 ** 32)
+
+    def test_scrambler_rejects_invalid_ids(self):
+        scrambler = Scrambler(1000)
+        # This is what 1 would map to if it weren't mapped to four digits
+        m = sum(2 ** i for i in range(32) if i % 3 == 0)
+        narrow = format((m * 1 + 1000) % 2 ** 32, '0>8x').upper()
+        for outp in ['', 'ABC', 'ABCDE', 'abcd', 'GHIJ', ' ABC', '+ABC', 'A_BC', narrow]:
+            with self.assertRaises(Http404):
+                scrambler.backward(outp)
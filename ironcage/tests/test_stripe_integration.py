@@ -22,6 +22,12 @@ class StripeIntegrationTests(TestCase):
             charge = stripe_integration.create_charge_for_order(self.order, token)
         self.assertEqual(charge.id, 'ch_abcdefghijklmnopqurstuvw')
 
+    def test_create_charge_for_order_with_idempotency_key(self):
+        token = 'tok_abcdefghijklmnopqurstuvwx'
+        with utils.patched_charge_creation_success() as mock:
+            stripe_integration.create_charge_for_order(self.order, token, 'order-1-attempt-1')
+        self.assertEqual(mock.call_args[1]['idempotency_key'], 'order-1-attempt-1')
+
     def test_create_charge_for_order_with_unsuccessful_charge(self):
         token = 'tok_abcdefghijklmnopqurstuvwx'
         with self.assertRaises(stripe.error.CardError):
@@ -33,6 +39,11 @@ class StripeIntegrationTests(TestCase):
             stripe_integration.refund_charge('ch_abcdefghijklmnopqurstuvw')
         mock.assert_called_with(charge='ch_abcdefghijklmnopqurstuvw')
 
+    def test_refund_charge_with_idempotency_key(self):
+        with utils.patched_refund_creation() as mock:
+            stripe_integration.refund_charge('ch_abcdefghijklmnopqurstuvw', idempotency_key='refund-1')
+        mock.assert_called_with(charge='ch_abcdefghijklmnopqurstuvw', idempotency_key='refund-1')
+
     def test_refund_item(self):
         factories.confirm_order(self.order)
         with utils.patched_refund_creation() as mock:
@@ -1,8 +1,13 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from accounts.tests import factories as account_factories
+from extras.tests import factories as extras_factories
 from tickets.tests import factories as ticket_factories
 
+from .. import content_types
+
 
 class IndexTests(TestCase):
     @classmethod
@@ -19,6 +24,18 @@ class IndexTests(TestCase):
         self.assertContains(rsp, '<a href="/tickets/orders/new/">Order conference tickets</a>', html=True)
         self.assertNotContains(rsp, '<a href="/profile/">Update your profile</a>', html=True)
 
+    def test_no_content_type_queries(self):
+        ticket_factories.create_confirmed_order_for_self(self.alice)
+        extras_factories.create_pending_children_ticket_order(self.alice)
+        content_types.warm()
+
+        with CaptureQueriesContext(connection) as ctx:
+            rsp = self.client.get('/')
+
+        self.assertEqual(rsp.status_code, 200)
+        for query in ctx.captured_queries:
+            self.assertNotIn('FROM "django_content_type"', query['sql'])
+
     def test_when_has_ticket(self):
         ticket = ticket_factories.create_ticket(self.alice)
 
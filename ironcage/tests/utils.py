@@ -16,7 +16,7 @@ def patched_charge_creation_success():
     charge = stripe.Charge.construct_from(charge_data, settings.STRIPE_API_KEY_PUBLISHABLE)
     with patch('stripe.Charge.create') as mock:
         mock.return_value = charge
-        yield
+        yield mock
     mock.assert_called()
 
 
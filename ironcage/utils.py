@@ -1,6 +1,9 @@
 from django.http import Http404
 
 
+HEX_DIGITS = frozenset('0123456789ABCDEF')
+
+
 class Scrambler:
     '''This class provides a reversible bijective mapping between the numbers
     in range(2**16) and strings representing hex values of the numbers in the
@@ -13,31 +16,80 @@ class Scrambler:
     '92AD'
     >>> scrambler.backward('92AD')
     1
+
+    Numbers in range(2**16, 2**32) are mapped in the same way onto strings of
+    eight hex digits.  This means that IDs that have already been given out
+    never change when a table grows beyond 2**16 rows.
+
+    >>> scrambler.forward(2**16)
+    '92490064'
+    >>> scrambler.backward('92490064')
+    65536
+
+    Nothing is tabulated: forward computes (m * inp + offset) % N, and
+    backward undoes this with the inverse of m modulo N.
     '''
-    def __init__(self, offset):
-        n = 16
-        N = 2 ** n
-        m = sum(2 ** i for i in range(n) if i % 3 == 0)
-        s = (n - 1) // 4 + 1
 
-        assert N % m != 0
+    # (number of bits, number of hex digits), narrowest first
+    widths = [(16, 4), (32, 8)]
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.params = []
 
-        self.inp_to_outp = {}
-        self.outp_to_inp = {}
+        for n, s in self.widths:
+            N = 2 ** n
+            m = sum(2 ** i for i in range(n) if i % 3 == 0)
 
-        for inp in range(N):
-            outp = format((m * inp + offset) % N, f'0>{s}x').upper()
-            self.inp_to_outp[inp] = outp
-            self.outp_to_inp[outp] = inp
+            assert N % m != 0
 
-        assert len(self.inp_to_outp) == N
-        assert len(self.outp_to_inp) == N
+            self.params.append((N, s, m, modular_inverse(m, N)))
 
     def forward(self, inp):
-        return self.inp_to_outp[inp]
+        if inp >= 0:
+            for N, s, m, _ in self.params:
+                if inp < N:
+                    return format((m * inp + self.offset) % N, f'0>{s}x').upper()
+
+        raise KeyError(inp)
 
     def backward(self, outp):
-        try:
-            return self.outp_to_inp[outp]
-        except KeyError:
+        if not set(outp) <= HEX_DIGITS:
             raise Http404
+
+        lower = 0
+        for N, s, _, m_inv in self.params:
+            if len(outp) == s:
+                inp = ((int(outp, 16) - self.offset) * m_inv) % N
+                if inp < lower:
+                    # Numbers below lower are mapped onto a narrower string,
+                    # so this string is never produced by forward.
+                    raise Http404
+                return inp
+            lower = N
+
+        raise Http404
+
+
+class Echo:
+    """An object that implements just the write method of the file-like
+    interface.
+
+    This lets csv.writer produce lines for a StreamingHttpResponse.
+    """
+    def write(self, value):
+        """Write the value by returning it, instead of storing in a buffer."""
+        return value
+
+
+def modular_inverse(m, N):
+    '''Return the inverse of m modulo N, where N is a power of two and m is
+    odd.'''
+
+    assert m % 2 == 1
+
+    # Each step of Newton's iteration doubles the number of correct low bits.
+    inv = 1
+    while (m * inv) % N != 1:
+        inv = (inv * (2 - m * inv)) % N
+    return inv
@@ -4,11 +4,12 @@ import structlog
 
 from django.conf import settings
 from django.contrib import messages
-from django.contrib.contenttypes.models import ContentType
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.utils.html import mark_safe
 
+from . import content_types
+
 logger = structlog.get_logger()
 
 
@@ -16,9 +17,9 @@ def index(request):
     user = request.user
 
     if user.is_authenticated:
-        ticket_content_type = ContentType.objects.get(app_label="tickets", model="ticket")
-        children_ticket_content_type = ContentType.objects.get(app_label="extras", model="childrenticket")
-        dinner_ticket_content_type = ContentType.objects.get(app_label="extras", model="dinnerticket")
+        ticket_content_type = content_types.ticket()
+        children_ticket_content_type = content_types.children_ticket()
+        dinner_ticket_content_type = content_types.dinner_ticket()
 
         if user.get_ticket() is not None and not user.profile_complete():
             messages.warning(
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ironcage.settings")
 
 application = get_wsgi_application()
+
+# This has to be imported after Django has been set up.
+from ironcage import content_types  # noqa: E402
+
+content_types.warm()
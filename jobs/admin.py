@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+
+    readonly_fields = fields = ['task', 'kwargs', 'key', 'status', 'attempts',
+                                'run_after', 'locked_until', 'last_error', 'created_at', 'updated_at']
+
+    list_display = ['key', 'task', 'status', 'attempts', 'run_after']
+    list_filter = ['status', 'task']
+    search_fields = ['key']
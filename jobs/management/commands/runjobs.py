@@ -0,0 +1,27 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Run jobs as they become due'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when no more jobs are due')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when no jobs are due')
+
+    def handle(self, *args, **kwargs):
+        while True:
+            job = Job.objects.run_next()
+
+            if job is None:
+                if kwargs['once']:
+                    return
+                time.sleep(kwargs['poll_interval'])
+
+                # Like Django does at the end of a request, so that the
+                # worker recovers if its connection is dropped.
+                close_old_connections()
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta, timezone
+import traceback
+
+from django.conf import settings
+from django.contrib.postgres.fields import JSONField
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+import structlog
+logger = structlog.get_logger()
+
+
+class Job(models.Model):
+    '''A call to a function that is made by a worker (see the runjobs
+    management command) rather than during a request.
+
+    A job is enqueued in the same transaction as the change that it follows
+    on from, so a worker only sees it once that change is committed, and it is
+    discarded if the change is rolled back.
+
+    Each job has a key, and enqueuing a job with the same key as an existing
+    job does nothing, so that a job is never run twice for the same thing.
+
+    A job that raises an exception is retried, with exponential backoff, up to
+    MAX_ATTEMPTS times.
+
+    A worker claims a job by setting its locked_until, and runs it outside of
+    any transaction, so that no row is locked while a job talks to Stripe or
+    sends email.  If the worker dies, the job is run again once its claim
+    expires.
+    '''
+
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY = timedelta(seconds=30)
+    LOCK_TIMEOUT = timedelta(minutes=10)
+
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+
+    task = models.CharField(max_length=200)
+    kwargs = JSONField(default=dict)
+    key = models.CharField(max_length=200, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    run_after = models.DateTimeField()
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Manager(models.Manager):
+        def enqueue(self, task, key, **kwargs):
+            '''Enqueue a call to the function at dotted path task, unless a job
+            with the given key already exists.
+
+            kwargs must be serialisable as JSON.
+
+            When settings.RUN_JOBS_IMMEDIATELY is set, the function is called
+            straight away, and any exception is propagated to the caller.
+            '''
+
+            job, created = self.get_or_create(
+                key=key,
+                defaults={
+                    'task': task,
+                    'kwargs': kwargs,
+                    'run_after': datetime.now(timezone.utc),
+                }
+            )
+
+            if created:
+                logger.info('enqueue job', job=job.id, key=key, task=task)
+                if settings.RUN_JOBS_IMMEDIATELY:
+                    job.run_immediately()
+
+            return job
+
+        def due(self):
+            now = datetime.now(timezone.utc)
+            return self.filter(
+                Q(locked_until__isnull=True) | Q(locked_until__lte=now),
+                status='pending',
+                run_after__lte=now,
+            ).order_by('run_after', 'id')
+
+        def claim_next(self):
+            '''Claim the next job that is due, and return it, or return None if
+            no job is due.
+
+            Rows locked by other workers that are claiming a job are skipped, so
+            several workers can run at once.
+            '''
+
+            with transaction.atomic():
+                job = self.due().select_for_update(skip_locked=True).first()
+                if job is None:
+                    return None
+                job.claim()
+            return job
+
+        def run_next(self):
+            '''Run the next job that is due, and return it, or return None if
+            no job is due.
+            '''
+
+            job = self.claim_next()
+            if job is None:
+                return None
+            job.run()
+            return job
+
+    objects = Manager()
+
+    def __str__(self):
+        return self.key
+
+    def get_function(self):
+        return import_string(self.task)
+
+    def claim(self):
+        self.attempts += 1
+        self.locked_until = datetime.now(timezone.utc) + self.LOCK_TIMEOUT
+        self.save()
+
+    def run(self):
+        logger.info('run job', job=self.id, key=self.key, attempt=self.attempts)
+
+        try:
+            self.get_function()(**self.kwargs)
+        except Exception:
+            self.last_error = traceback.format_exc()
+            if self.attempts < self.MAX_ATTEMPTS:
+                self.run_after = datetime.now(timezone.utc) + self.RETRY_DELAY * 2 ** (self.attempts - 1)
+            else:
+                self.status = 'failed'
+            logger.exception('job failed', job=self.id, key=self.key, attempts=self.attempts, status=self.status)
+        else:
+            self.status = 'succeeded'
+            self.last_error = ''
+
+        self.locked_until = None
+
+        with transaction.atomic():
+            claimed_attempts = Job.objects.select_for_update().values_list('attempts', flat=True).get(pk=self.pk)
+            if claimed_attempts != self.attempts:
+                # The claim expired, and another worker has claimed the job,
+                # so the outcome is left for that worker to record.
+                logger.warning('job claim expired', job=self.id, key=self.key, attempt=self.attempts)
+                return
+            self.save()
+
+    def run_immediately(self):
+        self.attempts += 1
+        self.get_function()(**self.kwargs)
+        self.status = 'succeeded'
+        self.save()
@@ -0,0 +1,144 @@
+from datetime import datetime, timedelta, timezone
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from jobs.models import Job
+
+
+calls = []
+
+
+def record_call(**kwargs):
+    calls.append(kwargs)
+
+
+def record_claim(**kwargs):
+    job = Job.objects.get(key=kwargs['job_key'])
+    calls.append({'locked_until': job.locked_until, 'attempts': job.attempts})
+
+
+def fail(**kwargs):
+    calls.append(kwargs)
+    raise ValueError('Oops')
+
+
+@override_settings(RUN_JOBS_IMMEDIATELY=False)
+class JobTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue(self):
+        job = Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:1', x=1)
+
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(job.kwargs, {'x': 1})
+        self.assertEqual(calls, [])
+
+    def test_enqueue_with_existing_key(self):
+        job1 = Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:1', x=1)
+        job2 = Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:1', x=2)
+
+        self.assertEqual(job1, job2)
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(job2.kwargs, {'x': 1})
+
+    @override_settings(RUN_JOBS_IMMEDIATELY=True)
+    def test_enqueue_when_running_jobs_immediately(self):
+        job = Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:1', x=1)
+
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(calls, [{'x': 1}])
+
+    def test_run_next(self):
+        Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:1', x=1)
+        Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:2', x=2)
+
+        job = Job.objects.run_next()
+
+        self.assertEqual(job.key, 'key:1')
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(calls, [{'x': 1}])
+
+    def test_run_next_when_no_jobs_are_due(self):
+        Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:1', x=1)
+        Job.objects.run_next()
+
+        self.assertIsNone(Job.objects.run_next())
+
+    def test_run_next_claims_job_while_it_runs(self):
+        Job.objects.enqueue('jobs.tests.test_models.record_claim', 'key:1', job_key='key:1')
+
+        job = Job.objects.run_next()
+
+        [call] = calls
+        self.assertGreater(call['locked_until'], datetime.now(timezone.utc))
+        self.assertEqual(call['attempts'], 1)
+        self.assertIsNone(job.locked_until)
+
+    def test_claimed_job_is_not_due(self):
+        Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:1', x=1)
+
+        job = Job.objects.claim_next()
+
+        self.assertEqual(job.key, 'key:1')
+        self.assertIsNone(Job.objects.run_next())
+        self.assertEqual(calls, [])
+
+    def test_job_with_expired_claim_is_run_again(self):
+        Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:1', x=1)
+        job = Job.objects.claim_next()
+        Job.objects.filter(pk=job.pk).update(locked_until=datetime.now(timezone.utc) - timedelta(seconds=1))
+
+        job = Job.objects.run_next()
+
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(calls, [{'x': 1}])
+
+    def test_outcome_not_recorded_after_claim_expires(self):
+        Job.objects.enqueue('jobs.tests.test_models.fail', 'key:1', x=1)
+        job = Job.objects.claim_next()
+        # Another worker claims the job once the first worker's claim expires
+        Job.objects.filter(pk=job.pk).update(attempts=2)
+
+        job.run()
+
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.last_error, '')
+        self.assertIsNotNone(job.locked_until)
+
+    def test_run_failing_job(self):
+        Job.objects.enqueue('jobs.tests.test_models.fail', 'key:1', x=1)
+
+        job = Job.objects.run_next()
+
+        self.assertEqual(job.status, 'pending')
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('ValueError: Oops', job.last_error)
+        self.assertGreater(job.run_after, datetime.now(timezone.utc))
+        self.assertIsNone(Job.objects.run_next())
+
+    def test_run_failing_job_too_many_times(self):
+        job = Job.objects.enqueue('jobs.tests.test_models.fail', 'key:1', x=1)
+
+        for _ in range(Job.MAX_ATTEMPTS):
+            Job.objects.filter(pk=job.pk).update(run_after=datetime.now(timezone.utc) - timedelta(seconds=1))
+            Job.objects.run_next()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, Job.MAX_ATTEMPTS)
+        self.assertEqual(len(calls), Job.MAX_ATTEMPTS)
+
+    def test_runjobs_once(self):
+        Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:1', x=1)
+        Job.objects.enqueue('jobs.tests.test_models.fail', 'key:2', x=2)
+        Job.objects.enqueue('jobs.tests.test_models.record_call', 'key:3', x=3)
+
+        call_command('runjobs', once=True)
+
+        self.assertEqual(calls, [{'x': 1}, {'x': 2}, {'x': 3}])
+        self.assertEqual(Job.objects.filter(status='succeeded').count(), 2)
@@ -1,14 +1,16 @@
-from django_slack import slack_message
 import stripe
 
 from django.db import transaction
 from django.db.utils import IntegrityError
 
 from ironcage import stripe_integration
+from jobs.models import Job
+from reports.models import SalesCounter
 from tickets import actions as ticket_actions
+from tickets.models import Ticket
 
 from .mailer import send_order_confirmation_mail
-from .models import Refund
+from .models import ChargeAttempt, Order, Refund
 
 import structlog
 logger = structlog.get_logger()
@@ -17,31 +19,95 @@ logger = structlog.get_logger()
 def process_stripe_charge(order, token):
     logger.info('process_stripe_charge', order=order.order_id, token=token)
     assert order.payment_required()
+
+    with transaction.atomic():
+        attempt = ChargeAttempt.objects.start_or_resume(order, token)
+
+    if attempt is None:
+        # A concurrent request has paid for the order
+        order.refresh_from_db()
+        return
+
+    if attempt.token != token:
+        logger.info('resume_charge_attempt', order=order.order_id, attempt=attempt.attempt)
+
     try:
-        charge = stripe_integration.create_charge_for_order(order, token)
-        confirm_order(order, charge.id, charge.created)
+        charge = stripe_integration.create_charge_for_order(order, attempt.token, attempt.idempotency_key)
     except stripe.error.CardError as e:
-        mark_order_as_failed(order, e._message)
-    except IntegrityError:
-        stripe_integration.refund_charge(charge.id)
-        mark_order_as_errored_after_charge(order, charge.id)
-        logger.exception('An order faced an integrity error')
+        with transaction.atomic():
+            attempt.mark_as_failed(e._message)
+            mark_order_as_failed(order, e._message)
+        return
+    except stripe.error.StripeError as e:
+        if e.http_status == 409:
+            # A concurrent request is making the same attempt, and will deal
+            # with its outcome
+            logger.info('charge_attempt_in_progress', order=order.order_id, attempt=attempt.attempt)
+            return
+        if e.http_status is not None and e.http_status < 500:
+            # Stripe would return the same error if the attempt were resumed,
+            # so the next attempt must start afresh.  Connection errors and
+            # 5xx errors leave the attempt in flight, since the charge may
+            # have been made.
+            with transaction.atomic():
+                attempt.mark_as_failed(e._message or str(e))
+        raise
+
+    with transaction.atomic():
+        attempt = ChargeAttempt.objects.select_for_update().get(pk=attempt.pk)
+        if attempt.status != 'in_flight':
+            # A concurrent request has dealt with the outcome of this attempt
+            order.refresh_from_db()
+            return
+
+        attempt.mark_as_succeeded(charge.id)
+
+        try:
+            confirm_order(order, charge.id, charge.created)
+        except IntegrityError:
+            logger.exception('An order faced an integrity error')
+            mark_order_as_errored_after_charge(order, charge.id)
+            Job.objects.enqueue(
+                'orders.tasks.refund_charge',
+                f'refund_charge:{charge.id}',
+                charge_id=charge.id,
+            )
 
 
 def confirm_order(order, charge_id, charge_created):
     logger.info('confirm_order', order=order.order_id, charge_id=charge_id)
     with transaction.atomic():
         order.confirm(charge_id, charge_created)
-    send_receipt(order)
-    ticket_actions.send_ticket_invitations(order)
-    slack_message('orders/order_created.slack', {'order': order})
+        record_tickets_created(order)
+        Job.objects.enqueue(
+            'orders.tasks.send_receipt',
+            f'send_receipt:{order.id}',
+            order_id=order.id,
+        )
+        ticket_actions.send_ticket_invitations(order)
+        Job.objects.enqueue(
+            'orders.tasks.send_order_created_slack_message',
+            f'send_order_created_slack_message:{order.id}',
+            order_id=order.id,
+        )
+
+
+def record_tickets_created(order):
+    Order.objects.prefetch_order_rows([order])
+    SalesCounter.objects.record_tickets_created(
+        (row.item, row.cost_excl_vat)
+        for row in order.all_order_rows()
+        if isinstance(row.item, Ticket)
+    )
 
 
 def refund_item(item, reason):
     logger.info('refund_item', item=item.ticket_id)
     stripe_refund = stripe_integration.refund_item(item)
     with transaction.atomic():
+        cost_excl_vat = item.cost_excl_vat
         Refund.objects.create_for_item(item, reason, stripe_refund.id, stripe_refund.created)
+        SalesCounter.objects.record_ticket_deleted(item, cost_excl_vat)
 
 
 def mark_order_as_failed(order, charge_failure_reason):
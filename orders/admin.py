@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Prefetch
 from django.urls import reverse
 from django.utils.html import format_html
 
@@ -23,13 +25,17 @@ class OrderRowInline(OurActionsOnlyMixin, admin.TabularInline):
     def get_readonly_fields(self, request, obj=None):
         return self.get_fields(request, obj)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('item')
+
     def link_to_item(self, obj):
+        content_type = ContentType.objects.get_for_id(obj.content_type_id)
         url = reverse(
-            f'admin:{obj.content_type.app_label}_{obj.content_type}_change',
+            f'admin:{content_type.app_label}_{content_type}_change',
             args=[obj.object_id]
         )
         return format_html("<a href='{}'>{}: {}</a>", url,
-                           str(obj.content_type).capitalize(), obj.item)
+                           str(content_type).capitalize(), obj.item)
     link_to_item.admin_order_field = 'item'
     link_to_item.short_description = 'item'
 
@@ -76,6 +82,16 @@ class OrderAdmin(OurActionsOnlyMixin, admin.ModelAdmin):  # DjangoObjectActions
     def get_readonly_fields(self, request, obj=None):
         return self.get_fields(request, obj)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('purchaser').prefetch_related(
+            Prefetch(
+                'order_rows',
+                queryset=OrderRow.objects.order_by('content_type', 'object_id'),
+                to_attr='prefetched_order_rows',
+            ),
+            'prefetched_order_rows__item',
+        )
+
     def get_list_display(self, request):
 
         if request.user.is_superuser:
@@ -1,16 +1,13 @@
-import re
-
 from django.conf import settings
-from django.template.loader import get_template
 from django.urls import reverse
 
-from ironcage.emails import send_mail
+from ironcage.emails import MailTemplate, send_mail
 
 
 def send_order_confirmation_mail(order):
     assert not order.payment_required()
 
-    template = get_template('orders/emails/order-confirmation.txt')
+    template = MailTemplate('orders/emails/order-confirmation.txt')
 
     context = {
         'purchaser_name': order.purchaser.name,
@@ -21,8 +18,7 @@ def send_order_confirmation_mail(order):
         'ticket_for_self': order.ticket_for_self(),
         'receipt_url': settings.DOMAIN + reverse('orders:order_receipt', args=[order.order_id]),
     }
-    body_raw = template.render(context)
-    body = re.sub('\n\n\n+', '\n\n', body_raw)
+    body = template.render(context)
 
     send_mail(
         f'PyCon UK 2018 order confirmation ({order.order_id})',
@@ -0,0 +1,43 @@
+# Generated by Django 2.0.3 on 2026-10-18 12:34
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+class Migration(migrations.Migration):
+
+    def initialise_sequences(apps, schema_editor):
+        NumberSequence = apps.get_model('orders', 'NumberSequence')
+        Order = apps.get_model('orders', 'Order')
+        OrderRow = apps.get_model('orders', 'OrderRow')
+
+        max_invoice_number = Order.objects.aggregate(n=Max('invoice_number'))['n'] or 0
+        NumberSequence.objects.create(name='invoice_number', value=max_invoice_number)
+
+        credit_note_numbers = (
+            OrderRow.objects
+            .filter(refund__isnull=False)
+            .values('order_id')
+            .annotate(n=Max('refund__credit_note_number'))
+        )
+        for record in credit_note_numbers:
+            NumberSequence.objects.create(
+                name=f'credit_note_number:{record["order_id"]}',
+                value=record['n'],
+            )
+
+    dependencies = [
+        ('orders', '0002_order_content_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(initialise_sequences, migrations.RunPython.noop),
+    ]
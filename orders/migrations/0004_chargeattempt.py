@@ -0,0 +1,33 @@
+# Generated by Django 2.0.3 on 2026-10-18 12:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_numbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChargeAttempt',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt', models.IntegerField()),
+                ('token', models.CharField(max_length=80)),
+                ('idempotency_key', models.CharField(max_length=80, unique=True)),
+                ('status', models.CharField(choices=[('in_flight', 'In flight'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='in_flight', max_length=10)),
+                ('stripe_charge_id', models.CharField(blank=True, max_length=80)),
+                ('failure_reason', models.CharField(blank=True, max_length=400)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='charge_attempts', to='orders.Order')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='chargeattempt',
+            unique_together={('order', 'attempt')},
+        ),
+    ]
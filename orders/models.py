@@ -1,4 +1,4 @@
-from collections import Counter
+from collections import Counter, defaultdict
 from datetime import datetime, timezone
 from decimal import Decimal
 
@@ -7,11 +7,13 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.fields import JSONField
 from django.db import models
-from django.db.models import Max
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils.crypto import get_random_string
 
 from extras.models import ExtraItem
+from ironcage import content_types
 from ironcage.utils import Scrambler
 from tickets.models import Ticket
 
@@ -59,6 +61,36 @@ class SalesRecord:
         lines = [line.strip(',') for line in self.billing_addr.splitlines() if line]
         return ', '.join(lines)
 
+    def saved_order_rows(self):
+        if hasattr(self, 'prefetched_order_rows'):
+            return self.prefetched_order_rows
+        return self.order_rows.order_by('content_type', 'object_id')
+
+
+class SalesRecordManager(models.Manager):
+    '''Manager for behaviour common to Order and Refund'''
+
+    def prefetch_order_rows(self, records):
+        '''Load the order rows of each of the given records, and each row's item,
+        in a fixed number of queries.
+
+        See OrderRow.objects.prefetch_items for what is loaded with each item.
+        '''
+
+        records = list(records)
+
+        prefetch_related_objects(records, Prefetch(
+            'order_rows',
+            queryset=OrderRow.objects.order_by('content_type', 'object_id'),
+            to_attr='prefetched_order_rows',
+        ))
+
+        OrderRow.objects.prefetch_items(
+            [row for record in records for row in record.prefetched_order_rows]
+        )
+
+        return records
+
 
 class Order(models.Model, SalesRecord):
     purchaser = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='orders', on_delete=models.CASCADE)
@@ -77,7 +109,10 @@ class Order(models.Model, SalesRecord):
 
     id_scrambler = Scrambler(1000)
 
-    class Manager(models.Manager):
+    # Order rows built from unconfirmed_details, cached by all_order_rows()
+    _built_order_rows = None
+
+    class Manager(SalesRecordManager):
         def get_by_order_id_or_404(self, order_id):
             id = self.model.id_scrambler.backward(order_id)
             return get_object_or_404(self.model, pk=id)
@@ -119,19 +154,31 @@ class Order(models.Model, SalesRecord):
     def update(self, billing_details, details):
         assert self.payment_required()
 
-        if self.content_type == ContentType.objects.get(app_label="tickets", model="ticket"):
+        # An attempt to charge for the order that is in flight may be resumed,
+        # and the resumed request must match the original one, so the order
+        # can't change until the attempt's outcome is known.  Locking the
+        # order's row stops an attempt starting while the order is updated.
+        # This must be called inside a transaction.
+        Order.objects.select_for_update().get(pk=self.pk)
+        assert not self.charge_in_flight()
+
+        if self.content_type_id == content_types.ticket().id:
             assert details['days_for_self'] is not None or details['email_addrs_and_days_for_others'] is not None
 
         self.billing_name = billing_details['name']
         self.billing_addr = billing_details['addr']
         self.unconfirmed_details = details
+        self._built_order_rows = None
         self.save()
 
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._built_order_rows = None
+
     def confirm(self, charge_id, charge_created):
         assert self.payment_required()
 
-        for row in self.build_order_rows():
-            row.save()
+        self.order_rows.bulk_create_with_items(self.build_order_rows())
 
         self.stripe_charge_id = charge_id
         self.stripe_charge_created = datetime.fromtimestamp(charge_created, tz=timezone.utc)
@@ -143,8 +190,7 @@ class Order(models.Model, SalesRecord):
 
     @classmethod
     def get_next_invoice_number(cls):
-        prev_invoice_number = cls.objects.aggregate(n=Max('invoice_number'))['n'] or 0
-        return prev_invoice_number + 1
+        return NumberSequence.objects.next_value('invoice_number')
 
     @property
     def cost_pence_incl_vat(self):
@@ -173,7 +219,7 @@ class Order(models.Model, SalesRecord):
 
         rows = []
 
-        if self.content_type == ContentType.objects.get(app_label="tickets", model="ticket"):
+        if self.content_type_id == content_types.ticket().id:
 
             days_for_self = self.unconfirmed_details['days_for_self']
             if days_for_self is not None:
@@ -197,7 +243,7 @@ class Order(models.Model, SalesRecord):
 
         else:
             ticket = ExtraItem.objects.build(
-                content_type=self.content_type,
+                content_type=ContentType.objects.get_for_id(self.content_type_id),
                 owner=self.purchaser,
                 details=self.unconfirmed_details,
             )
@@ -208,9 +254,11 @@ class Order(models.Model, SalesRecord):
 
     def all_order_rows(self):
         if self.payment_required():
-            return self.build_order_rows()
+            if self._built_order_rows is None:
+                self._built_order_rows = self.build_order_rows()
+            return self._built_order_rows
         else:
-            return self.order_rows.order_by('content_type', 'object_id')
+            return self.saved_order_rows()
 
     def all_items(self):
         return [order_row.item for order_row in self.all_order_rows()]
@@ -225,8 +273,8 @@ class Order(models.Model, SalesRecord):
         return len(self.all_items())
 
     def is_ticket_order(self):
-        ticket_content_type = ContentType.objects.get(app_label="tickets", model="ticket")
-        return any([order_row.content_type == ticket_content_type for order_row in self.all_order_rows()])
+        ticket_content_type = content_types.ticket()
+        return any([order_row.content_type_id == ticket_content_type.id for order_row in self.all_order_rows()])
 
     def order_content_type(self):
         return self.all_order_rows()[0].content_type
@@ -249,6 +297,9 @@ class Order(models.Model, SalesRecord):
     def payment_required(self):
         return self.status in ['pending', 'failed']
 
+    def charge_in_flight(self):
+        return self.charge_attempts.filter(status='in_flight').exists()
+
 
 class Refund(models.Model, SalesRecord):
     reason = models.CharField(max_length=400)
@@ -261,7 +312,7 @@ class Refund(models.Model, SalesRecord):
 
     id_scrambler = Scrambler(5000)
 
-    class Manager(models.Manager):
+    class Manager(SalesRecordManager):
         def get_by_refund_id_or_404(self, refund_id):
             id = self.model.id_scrambler.backward(refund_id)
             return get_object_or_404(self.model, pk=id)
@@ -307,10 +358,10 @@ class Refund(models.Model, SalesRecord):
         return f'R-2018-{self.order.invoice_number:04d}-{self.credit_note_number:02d}'
 
     def get_next_credit_note_number(self):
-        return self.order_rows.count()
+        return NumberSequence.objects.next_value(f'credit_note_number:{self.order.id}')
 
     def all_order_rows(self):
-        return self.order_rows.order_by('content_type', 'object_id')
+        return self.saved_order_rows()
 
 
 class OrderRow(models.Model):
@@ -337,6 +388,59 @@ class OrderRow(models.Model):
                 item_descr_extra=item.descr_extra_for_order,
             )
 
+        def bulk_create_with_items(self, rows):
+            '''Save unsaved order rows and their unsaved items in a fixed
+            number of queries, however many rows there are.
+
+            This does the same as calling save() on each row.
+            '''
+
+            # See the comment in ExtraItem.objects.bulk_create_with_items.
+            items = [row.item for row in rows]
+
+            Ticket.objects.bulk_create_with_invitations(
+                [item for item in items if isinstance(item, Ticket)]
+            )
+            ExtraItem.objects.bulk_create_with_items(
+                [item for item in items if isinstance(item, ExtraItem)]
+            )
+
+            for row, item in zip(rows, items):
+                row.item = item
+
+            return self.bulk_create(rows)
+
+        def prefetch_items(self, rows):
+            '''Load the items of the given saved order rows, in a fixed number of
+            queries.
+
+            Each item is loaded with its owner.  Each ticket is also loaded with
+            its invitations, and each extra item with the item it wraps.
+            '''
+
+            querysets = {
+                Ticket: Ticket.objects.select_related('owner').prefetch_related(
+                    Prefetch('invitations', to_attr='prefetched_invitations')
+                ),
+                ExtraItem: ExtraItem.objects.select_related('owner').prefetch_related('item'),
+            }
+
+            object_ids = defaultdict(list)
+            for row in rows:
+                if row.content_type_id is not None:
+                    object_ids[row.content_type_id].append(row.object_id)
+
+            items = {}
+            for content_type_id, ids in object_ids.items():
+                model = ContentType.objects.get_for_id(content_type_id).model_class()
+                for item in querysets[model].filter(id__in=ids):
+                    items[(content_type_id, item.id)] = item
+
+            for row in rows:
+                item = items.get((row.content_type_id, row.object_id))
+                if item is not None:
+                    row.item = item
+
     objects = Manager()
 
     def save(self):
@@ -378,3 +482,110 @@ class OrderRow(models.Model):
                 return item.owner.name
             else:
                 return item.email_addr
+
+
+class NumberSequence(models.Model):
+    '''A named sequence, used for allocating invoice and credit note numbers.
+
+    Allocating a number locks just the sequence's row until the end of the
+    transaction.  If the transaction is rolled back, so is the sequence, so
+    numbers are allocated without gaps.
+    '''
+
+    name = models.CharField(max_length=100, unique=True)
+    value = models.IntegerField(default=0)
+
+    class Manager(models.Manager):
+        def next_value(self, name):
+            # This must be called inside a transaction, since
+            # select_for_update() doesn't work in autocommit mode.
+            sequence, _ = self.select_for_update().get_or_create(name=name)
+            sequence.value += 1
+            sequence.save(update_fields=['value'])
+            return sequence.value
+
+    objects = Manager()
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+
+class ChargeAttempt(models.Model):
+    '''An attempt to charge a card for an order.
+
+    An attempt is recorded before its charge is requested from Stripe, and
+    the request is made with the attempt's idempotency key.  If payment for
+    the order is retried while an attempt is still in flight (because, say,
+    the process making the original request was killed) the original request
+    is replayed with the same key, and Stripe returns the outcome of that
+    request rather than charging the card again.
+    '''
+
+    STATUS_CHOICES = (
+        ('in_flight', 'In flight'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+
+    order = models.ForeignKey(Order, related_name='charge_attempts', on_delete=models.CASCADE)
+    attempt = models.IntegerField()
+    token = models.CharField(max_length=80)
+    idempotency_key = models.CharField(max_length=80, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='in_flight')
+    stripe_charge_id = models.CharField(max_length=80, blank=True)
+    failure_reason = models.CharField(max_length=400, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('order', 'attempt')
+
+    class Manager(models.Manager):
+        def start_or_resume(self, order, token):
+            '''Return the order's attempt that is in flight, if there is one,
+            or else record a new attempt to charge the card with the given
+            token.
+
+            Returns None if the order no longer requires payment.
+            '''
+
+            # This must be called inside a transaction.  Locking the order's
+            # row means that concurrent requests to pay for the order can't
+            # both start an attempt.
+            order = Order.objects.select_for_update().get(pk=order.pk)
+            if not order.payment_required():
+                return None
+
+            attempt = self.filter(order=order, status='in_flight').first()
+            if attempt is not None:
+                return attempt
+
+            number = self.filter(order=order).count() + 1
+            # The random part stops keys clashing between databases that use
+            # the same Stripe account, such as staging and local development.
+            idempotency_key = f'order-{order.id}-attempt-{number}-{get_random_string(12)}'
+
+            return self.create(
+                order=order,
+                attempt=number,
+                token=token,
+                idempotency_key=idempotency_key,
+            )
+
+    objects = Manager()
+
+    def __str__(self):
+        return self.idempotency_key
+
+    def mark_as_succeeded(self, charge_id):
+        self.stripe_charge_id = charge_id
+        self.status = 'succeeded'
+
+        self.save()
+
+    def mark_as_failed(self, failure_reason):
+        self.failure_reason = failure_reason
+        self.status = 'failed'
+
+        self.save()
@@ -0,0 +1,25 @@
+# The functions defined in this module are run by workers, via jobs.models.Job.
+#
+# They take IDs rather than model instances, since their arguments are stored as
+# JSON.
+
+from django_slack import slack_message
+
+from ironcage import stripe_integration
+
+from . import actions
+from .models import Order
+
+
+def send_receipt(order_id):
+    order = Order.objects.get(pk=order_id)
+    actions.send_receipt(order)
+
+
+def send_order_created_slack_message(order_id):
+    order = Order.objects.get(pk=order_id)
+    slack_message('orders/order_created.slack', {'order': order})
+
+
+def refund_charge(charge_id):
+    stripe_integration.refund_charge(charge_id, idempotency_key=f'refund-{charge_id}')
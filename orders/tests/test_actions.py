@@ -1,14 +1,20 @@
 from unittest.mock import patch
 
+import stripe
+
 from django_slack.utils import get_backend as get_slack_backend
 
 from django.core import mail
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
 
 from ironcage.tests import utils
+from jobs.models import Job
+from tickets import actions as tickets_actions
 from tickets.models import Ticket
 from tickets.tests import factories
-from orders.models import Refund
+from orders.models import ChargeAttempt, Refund
 from orders import actions
 
 
@@ -173,6 +179,32 @@ class ConfirmOrderTests(TestCase):
         text = messages[0]['text']
         self.assertIn('Alice has just placed an order for 1 ticket', text)
 
+    @override_settings(RUN_JOBS_IMMEDIATELY=False)
+    def test_enqueues_jobs(self):
+        backend = get_slack_backend()
+        order = factories.create_pending_order_for_others()
+        backend.reset_messages()
+
+        actions.confirm_order(order, 'ch_abcdefghijklmnopqurstuvw', 1495355163)
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(len(backend.retrieve_messages()), 0)
+        self.assertEqual(
+            sorted(job.task for job in Job.objects.all()),
+            [
+                'orders.tasks.send_order_created_slack_message',
+                'orders.tasks.send_receipt',
+                'tickets.tasks.send_ticket_invitation',
+                'tickets.tasks.send_ticket_invitation',
+            ]
+        )
+
+        call_command('runjobs', once=True)
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(len(backend.retrieve_messages()), 1)
+        self.assertEqual(Job.objects.filter(status='succeeded').count(), 4)
+
 
 class MarkOrderAsFailed(TestCase):
     def test_mark_order_as_failed(self):
@@ -227,9 +259,8 @@ class ProcessStripeChargeTests(TestCase):
         self.assertEqual(self.order.stripe_charge_id, 'ch_abcdefghijklmnopqurstuvw')
 
     def test_process_stripe_charge_error_after_charge_2(self):
-        # This test checks that an order is marked as errored if two orders are
-        # created at exactly the same time, leading to the race condition in
-        # Order.confirm.
+        # This test checks that an order is marked as errored if it is given an
+        # invoice number that is already in use.
         order = factories.create_confirmed_order_for_others()
         token = 'tok_abcdefghijklmnopqurstuvwx'
 
@@ -241,6 +272,109 @@ class ProcessStripeChargeTests(TestCase):
         self.assertEqual(self.order.status, 'errored')
         self.assertEqual(self.order.stripe_charge_id, 'ch_abcdefghijklmnopqurstuvw')
 
+    def test_process_stripe_charge_records_attempt(self):
+        token = 'tok_abcdefghijklmnopqurstuvwx'
+        with utils.patched_charge_creation_success():
+            actions.process_stripe_charge(self.order, token)
+
+        [attempt] = self.order.charge_attempts.all()
+        self.assertEqual(attempt.attempt, 1)
+        self.assertEqual(attempt.status, 'succeeded')
+        self.assertEqual(attempt.stripe_charge_id, 'ch_abcdefghijklmnopqurstuvw')
+
+    def test_process_stripe_charge_after_failure(self):
+        with utils.patched_charge_creation_failure():
+            actions.process_stripe_charge(self.order, 'tok_abcdefghijklmnopqurstuvwx')
+        with utils.patched_charge_creation_success():
+            actions.process_stripe_charge(self.order, 'tok_bcdefghijklmnopqurstuvwxy')
+
+        [attempt1, attempt2] = self.order.charge_attempts.order_by('attempt')
+        self.assertEqual(attempt1.status, 'failed')
+        self.assertEqual(attempt1.failure_reason, 'Your card was declined.')
+        self.assertEqual(attempt2.status, 'succeeded')
+        self.assertNotEqual(attempt1.idempotency_key, attempt2.idempotency_key)
+
+    def test_process_stripe_charge_after_invalid_request(self):
+        # This test checks that an attempt that Stripe rejects is not resumed,
+        # since Stripe would replay the same error.
+        error = stripe.error.InvalidRequestError('No such token: tok_abcdefghijklmnopqurstuvwx', 'source', http_status=400)
+        with patch('stripe.Charge.create') as mock:
+            mock.side_effect = error
+            with self.assertRaises(stripe.error.InvalidRequestError):
+                actions.process_stripe_charge(self.order, 'tok_abcdefghijklmnopqurstuvwx')
+
+        with utils.patched_charge_creation_success() as mock:
+            actions.process_stripe_charge(self.order, 'tok_bcdefghijklmnopqurstuvwxy')
+
+        self.assertEqual(mock.call_args[1]['source'], 'tok_bcdefghijklmnopqurstuvwxy')
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'successful')
+        [attempt1, attempt2] = self.order.charge_attempts.order_by('attempt')
+        self.assertEqual(attempt1.status, 'failed')
+        self.assertEqual(attempt1.failure_reason, 'No such token: tok_abcdefghijklmnopqurstuvwx')
+        self.assertEqual(attempt2.status, 'succeeded')
+
+    def test_process_stripe_charge_after_connection_error(self):
+        # This test checks that an attempt whose outcome is unknown is resumed.
+        with patch('stripe.Charge.create') as mock:
+            mock.side_effect = stripe.error.APIConnectionError('Could not connect')
+            with self.assertRaises(stripe.error.APIConnectionError):
+                actions.process_stripe_charge(self.order, 'tok_abcdefghijklmnopqurstuvwx')
+
+        with utils.patched_charge_creation_success() as mock:
+            actions.process_stripe_charge(self.order, 'tok_bcdefghijklmnopqurstuvwxy')
+
+        self.assertEqual(mock.call_args[1]['source'], 'tok_abcdefghijklmnopqurstuvwx')
+
+    def test_process_stripe_charge_resumes_attempt_in_flight(self):
+        # This test checks that if an earlier attempt to charge a card was
+        # interrupted, the original request is replayed with the same
+        # idempotency key, so that the card isn't charged twice.
+        with transaction.atomic():
+            attempt = ChargeAttempt.objects.start_or_resume(self.order, 'tok_abcdefghijklmnopqurstuvwx')
+
+        with utils.patched_charge_creation_success() as mock:
+            actions.process_stripe_charge(self.order, 'tok_bcdefghijklmnopqurstuvwxy')
+
+        self.assertEqual(mock.call_args[1]['source'], 'tok_abcdefghijklmnopqurstuvwx')
+        self.assertEqual(mock.call_args[1]['idempotency_key'], attempt.idempotency_key)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'successful')
+        [attempt] = self.order.charge_attempts.all()
+        self.assertEqual(attempt.status, 'succeeded')
+
+    def test_process_stripe_charge_resumes_attempt_after_update_refused(self):
+        # This test checks that an order can't be changed while an attempt to
+        # charge for it is in flight, so that the resumed request matches the
+        # original one.
+        with transaction.atomic():
+            attempt = ChargeAttempt.objects.start_or_resume(self.order, 'tok_abcdefghijklmnopqurstuvwx')
+        amount = self.order.cost_pence_incl_vat
+
+        with self.assertRaises(AssertionError):
+            tickets_actions.update_pending_order(
+                self.order,
+                billing_details={'name': 'Alice', 'addr': ''},
+                rate='corporate',
+                days_for_self=['sat', 'sun', 'mon', 'tue', 'wed'],
+            )
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.cost_pence_incl_vat, amount)
+
+        with utils.patched_charge_creation_success() as mock:
+            actions.process_stripe_charge(self.order, 'tok_bcdefghijklmnopqurstuvwxy')
+
+        self.assertEqual(mock.call_args[1]['idempotency_key'], attempt.idempotency_key)
+        self.assertEqual(mock.call_args[1]['amount'], amount)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'successful')
+        self.assertEqual(self.order.num_tickets(), 1)
+        self.assertEqual(self.order.billing_name, 'Sirius Cybernetics Corp.')
+
 
 class RefundTicketTests(TestCase):
     def test_refund_item(self):
@@ -283,7 +417,7 @@ class RefundTicketTests(TestCase):
 
         self.assertEqual(
             credit_note_numbers,
-            ['R-2018-0001-01', 'R-2018-0002-01', 'R-2018-0001-01']
+            ['R-2018-0001-01', 'R-2018-0002-01', 'R-2018-0001-02']
         )
 
     def test_ticket_purchase_after_refund(self):
@@ -0,0 +1,93 @@
+from threading import Barrier, Thread
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from ironcage.tests.fake_stripe import FakeStripe
+from ironcage import stripe_integration
+from orders import actions
+from orders.models import ChargeAttempt, Order
+from tickets.tests import factories
+
+
+class ProcessStripeChargeWithFakeStripeTests(TestCase):
+    def setUp(self):
+        self.order = factories.create_pending_order_for_self()
+
+    def test_success(self):
+        with FakeStripe() as fake_stripe, self.settings(STRIPE_API_BASE=fake_stripe.api_base):
+            actions.process_stripe_charge(self.order, 'tok_visa')
+
+        [charge] = fake_stripe.charges.values()
+        self.assertEqual(charge['amount'], self.order.cost_pence_incl_vat)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'successful')
+        self.assertEqual(self.order.stripe_charge_id, charge['id'])
+
+    def test_failure(self):
+        with FakeStripe() as fake_stripe, self.settings(STRIPE_API_BASE=fake_stripe.api_base):
+            actions.process_stripe_charge(self.order, 'tok_chargeDeclined')
+
+        self.assertEqual(fake_stripe.charges, {})
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'failed')
+        self.assertEqual(self.order.stripe_charge_failure_reason, 'Your card was declined.')
+
+    def test_error_after_charge(self):
+        factories.create_confirmed_order_for_self(self.order.purchaser)
+
+        with FakeStripe() as fake_stripe, self.settings(STRIPE_API_BASE=fake_stripe.api_base):
+            actions.process_stripe_charge(self.order, 'tok_visa')
+
+        [charge] = fake_stripe.charges.values()
+        self.assertTrue(charge['refunded'])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'errored')
+
+    def test_charge_made_before_process_was_interrupted(self):
+        # This test checks that if a card was charged, but the process that
+        # requested the charge was interrupted before it could confirm the
+        # order, the order is confirmed with the original charge when payment
+        # is retried.
+        with FakeStripe() as fake_stripe, self.settings(STRIPE_API_BASE=fake_stripe.api_base):
+            attempt = ChargeAttempt.objects.start_or_resume(self.order, 'tok_visa')
+            original_charge = stripe_integration.create_charge_for_order(self.order, 'tok_visa', attempt.idempotency_key)
+
+            actions.process_stripe_charge(self.order, 'tok_mastercard')
+
+        self.assertEqual(list(fake_stripe.charges), [original_charge.id])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'successful')
+        self.assertEqual(self.order.stripe_charge_id, original_charge.id)
+
+
+class ConcurrentProcessStripeChargeTests(TransactionTestCase):
+    def test_concurrent_payments_for_same_order(self):
+        order = factories.create_pending_order_for_self()
+        num_requests = 5
+        barrier = Barrier(num_requests)
+        errors = []
+
+        def pay(token):
+            try:
+                # Each request loads its own copy of the order
+                request_order = Order.objects.get(pk=order.pk)
+                barrier.wait()
+                actions.process_stripe_charge(request_order, token)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        with FakeStripe(latency=0.1) as fake_stripe, self.settings(STRIPE_API_BASE=fake_stripe.api_base):
+            threads = [Thread(target=pay, args=(f'tok_visa_{ix}',)) for ix in range(num_requests)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(fake_stripe.charges), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'successful')
+        self.assertEqual(order.charge_attempts.count(), 1)
@@ -1,5 +1,13 @@
-from django.test import TestCase
+from threading import Barrier, Thread
 
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+from extras.tests import factories as extras_factories
+from ironcage.tests import utils
+from orders import actions
+from orders.models import NumberSequence, Order, Refund
+from tickets.models import TicketInvitation
 from tickets.tests import factories
 
 
@@ -63,6 +71,59 @@ class OrderTests(TestCase):
         order = factories.create_confirmed_order_for_others()
         self.assertEqual(len(order.tickets_for_others()), 2)
 
+    def test_order_rows_for_unconfirmed_order_are_cached(self):
+        order = factories.create_pending_order_for_self_and_others()
+        rows = order.all_order_rows()
+        with self.assertNumQueries(0):
+            self.assertIs(order.all_order_rows(), rows)
+            order.cost_incl_vat
+            order.order_rows_summary()
+            order.unclaimed_tickets()
+
+    def test_order_rows_for_unconfirmed_order_are_rebuilt_after_update(self):
+        order = factories.create_pending_order_for_self_and_others()
+        self.assertEqual(order.num_tickets(), 3)
+
+        order.update(
+            {'name': order.billing_name, 'addr': order.billing_addr},
+            {
+                'rate': 'individual',
+                'days_for_self': ['sat'],
+                'email_addrs_and_days_for_others': None,
+            }
+        )
+        self.assertEqual(order.num_tickets(), 1)
+
+    def test_confirm_for_self_and_others(self):
+        order = factories.create_pending_order_for_self_and_others()
+        order.confirm('ch_abcdefghijklmnopqurstuvw', 1526887563)
+
+        self.assertEqual(order.order_rows.count(), 3)
+        self.assertEqual(order.ticket_for_self().owner, order.purchaser)
+        self.assertEqual(
+            sorted(invitation.email_addr for invitation in TicketInvitation.objects.all()),
+            ['bob@example.com', 'carol@example.com']
+        )
+        for ticket in order.tickets_for_others():
+            self.assertEqual(len(ticket.invitation().token), 24)
+
+    def test_confirm_for_extra_item(self):
+        order = extras_factories.create_pending_children_ticket_order()
+        order.confirm('ch_abcdefghijklmnopqurstuvw', 1526887563)
+
+        [item] = order.all_items()
+        self.assertEqual(item.owner, order.purchaser)
+        self.assertEqual(item.item.name, 'Puff')
+
+    def test_confirm_number_of_queries_does_not_depend_on_order_size(self):
+        order = factories.create_pending_order_for_others()
+        with self.assertNumQueries(6):
+            order.confirm('ch_abcdefghijklmnopqurstuvw', 1526887563)
+
+        order = factories.create_pending_order_for_self_and_others()
+        with self.assertNumQueries(6):
+            order.confirm('ch_abcdefghijklmnopqurstuvw', 1526887563)
+
     def test_billing_addr_formatted(self):
         order = factories.create_pending_order_for_self(rate='corporate')
         order.billing_addr = '''
@@ -71,3 +132,82 @@ Cathays Park
 Cardiff
 '''.strip()
         self.assertEqual(order.billing_addr_formatted(), 'City Hall, Cathays Park, Cardiff')
+
+
+class PrefetchOrderRowsTests(TestCase):
+    def test_prefetch_order_rows(self):
+        factories.create_confirmed_order_for_self_and_others()
+        factories.create_confirmed_order_for_others()
+        extras_factories.create_confirmed_children_ticket_order()
+
+        with self.assertNumQueries(6):
+            orders = Order.objects.prefetch_order_rows(Order.objects.order_by('id'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual([order.num_tickets() for order in orders], [3, 2, 0])
+            self.assertEqual(
+                [row.owner_name for order in orders for row in order.all_order_rows()],
+                ['Alice', 'bob@example.com', 'carol@example.com', 'bob@example.com', 'carol@example.com', 'Alice'],
+            )
+            self.assertEqual(orders[2].all_items()[0].item.name, 'Puff')
+            self.assertEqual(orders[0].cost_incl_vat, 378)
+
+    def test_prefetch_order_rows_for_refund(self):
+        order = factories.create_confirmed_order_for_self_and_others()
+        ticket = order.tickets_for_others()[0]
+
+        with utils.patched_refund_creation():
+            actions.refund_item(ticket, 'Refund requested by user')
+
+        [refund] = Refund.objects.prefetch_order_rows(Refund.objects.all())
+
+        with self.assertNumQueries(0):
+            [row] = refund.all_order_rows()
+            self.assertEqual(row.owner_name, 'Refunded')
+            self.assertEqual(refund.cost_excl_vat, 95)
+
+
+class NumberSequenceTests(TestCase):
+    def test_next_value(self):
+        self.assertEqual(NumberSequence.objects.next_value('widgets'), 1)
+        self.assertEqual(NumberSequence.objects.next_value('widgets'), 2)
+        self.assertEqual(NumberSequence.objects.next_value('gadgets'), 1)
+        self.assertEqual(NumberSequence.objects.next_value('widgets'), 3)
+
+    def test_next_value_is_rolled_back_with_transaction(self):
+        NumberSequence.objects.next_value('widgets')
+
+        try:
+            with transaction.atomic():
+                NumberSequence.objects.next_value('widgets')
+                raise ValueError
+        except ValueError:
+            pass
+
+        self.assertEqual(NumberSequence.objects.next_value('widgets'), 2)
+
+
+class ConcurrentConfirmTests(TransactionTestCase):
+    def test_concurrent_confirms_get_distinct_invoice_numbers(self):
+        orders = [factories.create_pending_order_for_others() for _ in range(5)]
+        barrier = Barrier(len(orders))
+        errors = []
+
+        def confirm(order):
+            try:
+                barrier.wait()
+                with transaction.atomic():
+                    order.confirm('ch_abcdefghijklmnopqurstuvw', 1526887563)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=confirm, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(order.invoice_number for order in orders), [1, 2, 3, 4, 5])
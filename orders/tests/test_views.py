@@ -1,5 +1,8 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from ironcage import content_types
 from ironcage.tests import utils
 from tickets.tests import factories
 
@@ -7,6 +10,54 @@ from orders import actions
 
 
 class OrderTests(TestCase):
+    def test_number_of_queries_for_pending_order_does_not_depend_on_order_size(self):
+        # Warm up ContentType's cache
+        order = factories.create_pending_order_for_self()
+        self.client.force_login(order.purchaser)
+        self.client.get(f'/orders/{order.order_id}/')
+
+        num_queries = []
+
+        for order in [
+            factories.create_pending_order_for_self(),
+            factories.create_pending_order_for_self_and_others(),
+        ]:
+            self.client.force_login(order.purchaser)
+            with CaptureQueriesContext(connection) as ctx:
+                rsp = self.client.get(f'/orders/{order.order_id}/')
+            self.assertEqual(rsp.status_code, 200)
+            num_queries.append(len(ctx.captured_queries))
+
+        self.assertEqual(num_queries[0], num_queries[1])
+
+    def test_no_content_type_queries_for_pending_order(self):
+        order = factories.create_pending_order_for_self()
+        self.client.force_login(order.purchaser)
+        content_types.warm()
+
+        with CaptureQueriesContext(connection) as ctx:
+            rsp = self.client.get(f'/orders/{order.order_id}/')
+
+        self.assertEqual(rsp.status_code, 200)
+        for query in ctx.captured_queries:
+            self.assertNotIn('FROM "django_content_type"', query['sql'])
+
+    def test_number_of_queries_for_confirmed_order_does_not_depend_on_order_size(self):
+        num_queries = []
+
+        for order in [
+            factories.create_confirmed_order_for_self(),
+            factories.create_confirmed_order_for_self_and_others(),
+        ]:
+            self.client.force_login(order.purchaser)
+            content_types.warm()
+            with CaptureQueriesContext(connection) as ctx:
+                rsp = self.client.get(f'/orders/{order.order_id}/')
+            self.assertEqual(rsp.status_code, 200)
+            num_queries.append(len(ctx.captured_queries))
+
+        self.assertEqual(num_queries[0], num_queries[1])
+
     def test_for_confirmed_order_for_self(self):
         order = factories.create_confirmed_order_for_self()
         self.client.force_login(order.purchaser)
@@ -263,6 +314,22 @@ class OrderReceiptTests(TestCase):
         cls.order = factories.create_confirmed_order_for_self_and_others()
         cls.url = f'/orders/{cls.order.order_id}/receipt/'
 
+    def test_number_of_queries_does_not_depend_on_order_size(self):
+        num_queries = []
+
+        for order in [
+            factories.create_confirmed_order_for_self(),
+            self.order,
+        ]:
+            self.client.force_login(order.purchaser)
+            content_types.warm()
+            with CaptureQueriesContext(connection) as ctx:
+                rsp = self.client.get(f'/orders/{order.order_id}/receipt/')
+            self.assertEqual(rsp.status_code, 200)
+            num_queries.append(len(ctx.captured_queries))
+
+        self.assertEqual(num_queries[0], num_queries[1])
+
     def test_order_receipt(self):
         self.client.force_login(self.order.purchaser)
         rsp = self.client.get(self.url, follow=True)
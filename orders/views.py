@@ -1,12 +1,13 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.contrib.contenttypes.models import ContentType
 from django.contrib import messages
 from django.http import Http404
 from django.shortcuts import redirect, render
 from django.views.decorators.http import require_POST
 from django.utils.html import mark_safe
 
+from ironcage import content_types
+
 from . import actions
 from .models import Order, Refund
 
@@ -14,15 +15,16 @@ from .models import Order, Refund
 @login_required
 def order(request, order_id):
     order = Order.objects.get_by_order_id_or_404(order_id)
+    Order.objects.prefetch_order_rows([order])
 
-    ticket_content_type = ContentType.objects.get(app_label="tickets", model="ticket")
+    ticket_content_type = content_types.ticket()
 
     if request.user != order.purchaser:
         messages.warning(request, 'Only the purchaser of an order can view the order')
         return redirect('index')
 
     if order.payment_required():
-        if order.content_type == ticket_content_type:
+        if order.content_type_id == ticket_content_type.id:
             if request.user.get_ticket() is not None and order.unconfirmed_details['days_for_self']:
                 messages.warning(request, 'You already have a ticket.  Please amend your order.')
                 return redirect('tickets:order_edit', order.order_id)
@@ -51,7 +53,7 @@ def order(request, order_id):
 @require_POST
 def order_payment(request, order_id):
     order = Order.objects.get_by_order_id_or_404(order_id)
-    ticket_content_type = ContentType.objects.get(app_label="tickets", model="ticket")
+    ticket_content_type = content_types.ticket()
 
     if request.user != order.purchaser:
         messages.warning(request, 'Only the purchaser of an order can pay for the order')
@@ -61,7 +63,7 @@ def order_payment(request, order_id):
         messages.error(request, 'This order has already been paid')
         return redirect(order)
 
-    if order.content_type == ticket_content_type:
+    if order.content_type_id == ticket_content_type.id:
         if request.user.get_ticket() is not None and order.unconfirmed_details['days_for_self']:
             messages.warning(request, 'You already have a ticket.  Please amend your order.  Your card has not been charged.')
             return redirect('tickets:order_edit', order.order_id)
@@ -87,6 +89,8 @@ def order_receipt(request, order_id):
         messages.error(request, 'This order has not been paid')
         return redirect(order)
 
+    Order.objects.prefetch_order_rows([order])
+
     context = {
         'order': order,
         'title': f'PyCon UK 2018 receipt for order {order.order_id}',
@@ -107,6 +111,8 @@ def refund_credit_note(request, order_id, refund_id):
         messages.warning(request, 'Only the purchaser of an order can view a credit note')
         return redirect('index')
 
+    Refund.objects.prefetch_order_rows([refund])
+
     context = {
         'order': order,
         'refund': refund,
@@ -0,0 +1,30 @@
+from django.db import connection, transaction
+
+from .models import SalesCounter
+from .reports import reports
+
+import structlog
+logger = structlog.get_logger()
+
+
+def rebuild_sales_counters():
+    '''Recompute every SalesCounter from scratch.'''
+
+    logger.info('rebuild_sales_counters')
+    with transaction.atomic():
+        # Changes that would update the counters wait until they've been
+        # rebuilt, and the rebuild waits for changes that have already updated
+        # them to be committed.
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {SalesCounter._meta.db_table} IN EXCLUSIVE MODE')
+
+        SalesCounter.objects.all().delete()
+
+        counters = []
+        for report in reports:
+            if getattr(report, 'snapshot', False):
+                dimension = report.url_name()
+                for key, value in report().compute_aggregates().items():
+                    counters.append(SalesCounter(dimension=dimension, key=key, value=value))
+
+        return SalesCounter.objects.bulk_create(counters)
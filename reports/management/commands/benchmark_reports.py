@@ -0,0 +1,149 @@
+import random
+import time
+from unittest.mock import patch
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import User
+from ironcage import content_types
+from orders.models import Order, OrderRow
+from reports.actions import rebuild_sales_counters
+from reports.reports import AttendanceByDayReport, TicketSalesReport, TicketSummaryReport
+from tickets.constants import DAYS
+from tickets.models import Ticket
+from tickets.prices import cost_excl_vat
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_tickets(count):
+    '''Create count tickets, a tenth of them free, and the rest in one order.'''
+
+    purchaser = User.objects.create_user(name='Benchmark', email_addr='benchmark@example.com')
+    order = Order.objects.create(
+        purchaser=purchaser,
+        status='successful',
+        unconfirmed_details={},
+        content_type=content_types.ticket(),
+    )
+
+    tickets = []
+    for ix in range(count):
+        days = random.sample(list(DAYS), random.randint(1, len(DAYS)))
+        if ix % 10 == 0:
+            rate, free_reason = '', 'Financial assistance'
+        else:
+            rate, free_reason = random.choice(['individual', 'corporate', 'unwaged']), None
+        tickets.append(Ticket(rate=rate, free_reason=free_reason, **{day: day in days for day in DAYS}))
+
+    Ticket.objects.bulk_create(tickets)
+
+    OrderRow.objects.bulk_create([
+        OrderRow(
+            order=order,
+            cost_excl_vat=cost_excl_vat(ticket.rate, ticket.num_days()),
+            item=ticket,
+            item_descr=ticket.descr_for_order,
+        )
+        for ticket in tickets
+        if not ticket.free_reason
+    ])
+
+
+# The reports as they were written before they used aggregates, which load
+# every ticket and loop over them in Python.
+
+def ticket_summary_per_ticket():
+    tickets = Ticket.objects.all()
+    return [
+        ['Tickets', len(tickets)],
+        ['Days', sum(t.num_days() for t in tickets)],
+        ['Cost (excl. VAT)', f'£{sum(t.cost_excl_vat for t in tickets)}'],
+    ]
+
+
+def count_by_rate(tickets, predicate):
+    num_tickets = {'individual': 0, 'corporate': 0, 'unwaged': 0, '': 0}
+    for ticket in tickets:
+        if predicate(ticket) and ticket.rate in num_tickets:
+            num_tickets[ticket.rate] += 1
+    counts = [num_tickets['individual'], num_tickets['corporate'], num_tickets['unwaged'], num_tickets['']]
+    return [*counts, sum(counts)]
+
+
+def attendance_by_day_per_ticket():
+    tickets = Ticket.objects.all()
+    return [
+        [DAYS[day], *count_by_rate(tickets, lambda ticket: getattr(ticket, day))]
+        for day in DAYS
+    ]
+
+
+def ticket_sales_per_ticket():
+    tickets = Ticket.objects.all()
+    return [
+        [num_days, *count_by_rate(tickets, lambda ticket: ticket.num_days() == num_days)]
+        for num_days in range(1, len(DAYS) + 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the summary reports against a fixture of many tickets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Number of tickets to create')
+
+    def handle(self, *args, count, **kwargs):
+        try:
+            with transaction.atomic():
+                create_tickets(count)
+                with connection.cursor() as cursor:
+                    # So that the planner knows how big the tables now are
+                    cursor.execute('ANALYZE tickets_ticket, orders_orderrow')
+                self.stdout.write(f'{count} tickets')
+                self.benchmark()
+                raise Rollback
+        except Rollback:
+            pass
+
+    def benchmark(self):
+        rebuild_sales_counters()
+
+        benchmarks = [
+            (TicketSummaryReport, ticket_summary_per_ticket, 'rows'),
+            (AttendanceByDayReport, attendance_by_day_per_ticket, 'rows'),
+            (TicketSalesReport, ticket_sales_per_ticket, 'num_tickets_rows'),
+        ]
+
+        for report_class, per_ticket, rows_key in benchmarks:
+            self.stdout.write(report_class.title)
+            expected = self.time('per ticket', per_ticket)
+
+            def compute():
+                with patch.object(report_class, 'snapshot', False):
+                    return report_class().get_context_data()[rows_key]
+
+            rows = self.time('aggregates', compute)
+            assert rows == expected, (rows, expected)
+
+            rows = self.time('counters', lambda: report_class().get_context_data()[rows_key])
+            assert rows == expected, (rows, expected)
+
+    def time(self, descr, fn):
+        num_queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal num_queries
+            num_queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+
+        self.stdout.write(f'  {descr}: {elapsed:.3f}s, {num_queries} queries')
+        return result
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from reports import actions
+
+
+class Command(BaseCommand):
+    help = 'Recompute the counters that the sales reports read from scratch'
+
+    def handle(self, *args, **kwargs):
+        counters = actions.rebuild_sales_counters()
+        self.stdout.write(f'Rebuilt {len(counters)} counters')
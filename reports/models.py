@@ -0,0 +1,119 @@
+from collections import Counter
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+from tickets.constants import DAYS
+
+
+# The rates that reports break tickets down by, and the value of Ticket.rate
+# for each.  Free tickets have no rate.
+RATE_COLUMNS = [
+    ('individual', 'individual'),
+    ('corporate', 'corporate'),
+    ('unwaged', 'unwaged'),
+    ('free', ''),
+]
+
+
+class SalesCounter(models.Model):
+    '''A pre-aggregated count of tickets sold, kept up to date as tickets are
+    created, changed, claimed and refunded, so that the sales reports read a
+    handful of rows rather than aggregating over every ticket.
+
+    Counters are grouped into dimensions, one for each report that reads them.
+    The keys of a dimension are the names of the report's aggregates (see
+    reports.reports.AggregateReportView).
+
+    The counters can be rebuilt from scratch with the rebuild_sales_counters
+    management command.
+    '''
+
+    dimension = models.CharField(max_length=40)
+    key = models.CharField(max_length=40)
+    value = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['dimension', 'key']
+
+    class Manager(models.Manager):
+        def values_for(self, dimension):
+            return dict(self.filter(dimension=dimension).values_list('key', 'value'))
+
+        def apply(self, deltas):
+            '''Add each value in deltas, a dict mapping (dimension, key) to an
+            integer, to the matching counter.
+
+            This should be called in the same transaction as the change that it
+            records.
+            '''
+
+            # Counters are updated in a consistent order, so that concurrent
+            # transactions can't deadlock.
+            for (dimension, key), delta in sorted(deltas.items()):
+                if delta == 0:
+                    continue
+
+                counters = self.filter(dimension=dimension, key=key)
+                if counters.update(value=F('value') + delta):
+                    continue
+
+                try:
+                    with transaction.atomic():
+                        self.create(dimension=dimension, key=key, value=delta)
+                except IntegrityError:
+                    # Another transaction created the counter first
+                    counters.update(value=F('value') + delta)
+
+        def record_tickets_created(self, tickets_and_costs):
+            deltas = Counter()
+            for ticket, cost_excl_vat in tickets_and_costs:
+                deltas.update(ticket_deltas(ticket, cost_excl_vat))
+            self.apply(deltas)
+
+        def record_ticket_deleted(self, ticket, cost_excl_vat):
+            self.apply(ticket_deltas(ticket, cost_excl_vat, sign=-1))
+
+        def record_ticket_days_changed(self, ticket, old_days, cost_excl_vat):
+            '''Record that ticket's days have changed from old_days, a list of
+            keys of DAYS.'''
+
+            old_ticket = ticket.__class__(
+                rate=ticket.rate,
+                **{day: day in old_days for day in DAYS}
+            )
+            deltas = Counter(ticket_deltas(old_ticket, cost_excl_vat, sign=-1))
+            deltas.update(ticket_deltas(ticket, cost_excl_vat))
+            self.apply(deltas)
+
+    objects = Manager()
+
+
+def ticket_deltas(ticket, cost_excl_vat, sign=1):
+    '''Return the changes to make to the counters when ticket is created (or,
+    with sign=-1, deleted).'''
+
+    column = rate_column(ticket.rate)
+    days = [day for day in DAYS if getattr(ticket, day)]
+
+    deltas = Counter({
+        ('ticket-summary', 'num_tickets'): sign,
+        ('ticket-summary', 'num_days'): sign * len(days),
+        ('ticket-summary', 'cost_excl_vat'): sign * cost_excl_vat,
+    })
+
+    if column is not None:
+        for day in days:
+            deltas[('attendance-by-day', f'{day}_{column}')] += sign
+        deltas[('ticket-sales', f'{len(days)}_{column}')] += sign
+
+    return deltas
+
+
+def rate_column(rate):
+    for column, column_rate in RATE_COLUMNS:
+        if rate == column_rate:
+            return column
+    return None
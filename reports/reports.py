@@ -1,29 +1,173 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import csv
+from functools import reduce
+import json
+import operator
+from urllib.parse import urlencode
+
 from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, IntegerField, Prefetch, Q, Sum, prefetch_related_objects
+from django.db.models.functions import Cast
+from django.http import Http404, StreamingHttpResponse
 from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.utils.text import slugify
 from django.views.generic import TemplateView
 
 from accounts.models import User
+from ironcage.utils import Echo
 from orders.models import Order
 from tickets.constants import DAYS
 from tickets.models import Ticket
-from tickets.prices import PRICES_EXCL_VAT, cost_excl_vat
+from tickets.prices import cost_excl_vat
+
+from .models import RATE_COLUMNS, SalesCounter
 
 
 @method_decorator(staff_member_required(login_url='login'), name='dispatch')
 class ReportView(TemplateView):
+    '''A report presenting a row for each object from get_queryset().
+
+    Rows are shown a page at a time, and pages are found with a keyset cursor
+    (the values of the ordering fields of the last row of the previous page)
+    rather than an offset, so that later pages are as cheap as the first.
+
+    So that each page costs a fixed number of queries, however many rows it
+    has, list reports declare what presenter() needs loaded with each object:
+
+        * select_related, prefetch_related: lookups applied to the queryset
+        * annotations: a dict of annotations applied to the queryset
+        * prefetch(objects): a hook for anything else, called with each page
+
+    List reports may also declare:
+
+        * orderings: a dict mapping the value of the sort query parameter to
+          a list of fields to order by, the last of which must be unique
+        * filters: a dict mapping query parameters to the lookups they filter
+          on
+
+    Every report can also be downloaded with ?format=csv or ?format=jsonl.
+    Downloads are streamed, and for list reports include every row, read from
+    the database export_chunk_size rows at a time.
+    '''
+
     template_name = 'reports/report.html'
 
+    paginate_by = 100
+    export_chunk_size = 1000
+    select_related = []
+    prefetch_related = []
+    annotations = {}
+    orderings = {'id': ['id']}
+    filters = {}
+
+    def get(self, request, *args, **kwargs):
+        format = request.GET.get('format')
+        if format in EXPORT_FORMATS:
+            return self.export(format)
+        return super().get(request, *args, **kwargs)
+
     def get_context_data(self):
+        page = self.get_page()
+
         return {
             'title': self.title,
             'headings': self.headings,
-            'rows': self.get_rows(),
+            'rows': self.get_rows(page.objects),
+            'page': page,
+        }
+
+    def get_rows(self, objects):
+        return [self.presenter(item) for item in objects]
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort')
+        if sort not in self.orderings:
+            sort = next(iter(self.orderings))
+        return sort
+
+    def get_list_queryset(self, ordering):
+        params = self.request.GET
+
+        filters = {
+            lookup: params[param]
+            for param, lookup in self.filters.items()
+            if params.get(param)
         }
 
-    def get_rows(self):
-        return [self.presenter(item) for item in self.get_queryset()]
+        queryset = self.get_queryset().filter(**filters)
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.order_by(*ordering)
+
+    def load(self, objects):
+        '''Load what presenter() needs for each of objects.'''
+
+        if self.prefetch_related:
+            prefetch_related_objects(objects, *self.prefetch_related)
+        self.prefetch(objects)
+
+    def prefetch(self, objects):
+        pass
+
+    def get_page(self):
+        sort = self.get_sort()
+        ordering = self.orderings[sort]
+        queryset = self.get_list_queryset(ordering)
+
+        cursor = self.request.GET.get('after')
+        if cursor:
+            queryset = queryset.filter(keyset_filter(ordering, decode_cursor(cursor, len(ordering))))
+
+        # Load one extra object, to find whether there's a next page
+        objects = list(queryset[:self.paginate_by + 1])
+        has_next = len(objects) > self.paginate_by
+        objects = objects[:self.paginate_by]
+        self.load(objects)
+
+        if has_next:
+            next_cursor = encode_cursor([lookup_value(objects[-1], field) for field in ordering])
+        else:
+            next_cursor = None
+
+        return Page(objects, self.request.GET, sort, next_cursor, self.orderings, self.filters)
+
+    def get_export_headings(self):
+        return self.headings
+
+    def iter_export_rows(self):
+        queryset = self.get_list_queryset(self.orderings[self.get_sort()])
+
+        # QuerySet.iterator() ignores prefetch_related, so objects are loaded
+        # a chunk at a time.
+        chunk = []
+        for obj in queryset.iterator(chunk_size=self.export_chunk_size):
+            chunk.append(obj)
+            if len(chunk) == self.export_chunk_size:
+                yield from self.get_rows_for_export(chunk)
+                chunk = []
+        yield from self.get_rows_for_export(chunk)
+
+    def get_rows_for_export(self, objects):
+        self.load(objects)
+        return self.get_rows(objects)
+
+    def export(self, format):
+        headings = self.get_export_headings()
+        rows = ([export_value(item) for item in row] for row in self.iter_export_rows())
+
+        if format == 'csv':
+            lines = iter_csv_lines(headings, rows)
+        else:
+            lines = iter_jsonl_lines(headings, rows)
+
+        content_type, extension = EXPORT_FORMATS[format]
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{slugify(self.title)}.{extension}"'
+        return response
 
     @classmethod
     def path(cls):
@@ -38,16 +182,212 @@ class ReportView(TemplateView):
         return f'reports:{cls.url_name()}'
 
 
-class TicketSummaryReport(ReportView):
+class Page:
+    '''A page of a list report, with the query strings of the pages and
+    orderings that can be linked to from it.'''
+
+    def __init__(self, objects, params, sort, next_cursor, orderings, filters):
+        self.objects = objects
+        self.sort = sort
+        self.next_cursor = next_cursor
+        self.sorts = list(orderings) if len(orderings) > 1 else []
+        self.filter_params = {param: params[param] for param in filters if params.get(param)}
+
+    def query_string(self, **params):
+        return urlencode({**self.filter_params, **params})
+
+    @property
+    def first_page_query_string(self):
+        return self.query_string(sort=self.sort)
+
+    @property
+    def next_page_query_string(self):
+        if self.next_cursor is None:
+            return None
+        return self.query_string(sort=self.sort, after=self.next_cursor)
+
+    @property
+    def export_links(self):
+        return [(format, self.query_string(sort=self.sort, format=format)) for format in EXPORT_FORMATS]
+
+    @property
+    def sort_links(self):
+        return [(sort, self.query_string(sort=sort)) for sort in self.sorts]
+
+
+# The content type and file extension of each format that reports can be
+# downloaded in
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+def export_value(item):
+    # Links are exported as their text
+    if isinstance(item, dict):
+        return item['text']
+    return item
+
+
+def iter_csv_lines(headings, rows):
+    writer = csv.writer(Echo())
+    if headings:
+        yield writer.writerow(headings)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl_lines(headings, rows):
+    for row in rows:
+        if headings:
+            row = dict(zip(headings, row))
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def keyset_filter(ordering, values):
+    '''Return a Q matching the objects that come after an object whose values
+    for the fields in ordering are values.'''
+
+    q = None
+    for field, value in reversed(list(zip(ordering, values))):
+        name = field.lstrip('-')
+        comparison = 'lt' if field.startswith('-') else 'gt'
+        after = Q(**{f'{name}__{comparison}': value})
+        q = after if q is None else after | (Q(**{name: value}) & q)
+    return q
+
+
+def lookup_value(obj, field):
+    for name in field.lstrip('-').split('__'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def encode_cursor(values):
+    return urlsafe_b64encode(json.dumps(values).encode('utf8')).decode('ascii')
+
+
+def decode_cursor(cursor, num_values):
+    try:
+        values = json.loads(urlsafe_b64decode(cursor.encode('ascii')).decode('utf8'))
+    except ValueError:
+        raise Http404
+
+    if not isinstance(values, list) or len(values) != num_values:
+        raise Http404
+
+    if not all(isinstance(value, (str, int)) for value in values):
+        raise Http404
+
+    return values
+
+
+class AggregateReportView(ReportView):
+    '''A report built from aggregates that are computed by the database, so
+    that the cost of the report doesn't grow with the number of rows in the
+    table being reported on.
+
+    Subclasses declare:
+
+        * aggregates: a dict mapping names to aggregate expressions, such as
+          Count('id', filter=Q(rate='corporate'))
+        * group_by: optionally, a dict mapping names to the expressions to
+          group by
+
+    and implement get_context_data() with self.get_aggregates(), which returns
+    a dict mapping the name of each aggregate to its value.  If group_by is
+    given, names are prefixed with the group's values, as in '3_corporate'.
+
+    Reports with snapshot = True read their aggregates from SalesCounters
+    (whose dimension is the report's url_name()) rather than computing them.
+    compute_aggregates() always computes them, and is used to rebuild the
+    counters.
+    '''
+
+    group_by = {}
+    snapshot = False
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def get_aggregates(self):
+        if self.snapshot:
+            return SalesCounter.objects.values_for(self.url_name())
+        return self.compute_aggregates()
+
+    def compute_aggregates(self):
+        queryset = self.get_queryset()
+
+        if not self.group_by:
+            values = queryset.aggregate(**self.aggregates)
+            return {name: value or 0 for name, value in values.items()}
+
+        names = list(self.group_by)
+        groups = queryset.annotate(
+            **self.group_by
+        ).values(
+            *names
+        ).annotate(
+            **self.aggregates
+        ).order_by(
+            *names
+        )
+
+        values = {}
+        for group in groups:
+            prefix = '_'.join(str(group[name]) for name in names)
+            for name in self.aggregates:
+                values[f'{prefix}_{name}'] = group[name] or 0
+        return values
+
+    def get_export_headings(self):
+        return self.get_context_data()['headings']
+
+    def iter_export_rows(self):
+        return self.get_context_data()['rows']
+
+
+# The number of days a ticket is for
+NUM_DAYS = reduce(operator.add, [Cast(day, IntegerField()) for day in DAYS])
+
+RATE_HEADINGS = ['Individual rate', 'Corporate rate', 'Unwaged rate', 'Free', 'Total']
+
+
+def count_tickets_by_rate(prefix='', **filters):
+    '''Return aggregates counting tickets matching filters at each rate in
+    RATE_COLUMNS.'''
+
+    return {
+        f'{prefix}{column}': Count('id', filter=Q(rate=rate, **filters))
+        for column, rate in RATE_COLUMNS
+    }
+
+
+def num_tickets_row(label, values, prefix=''):
+    num_tickets = [values.get(f'{prefix}{column}', 0) for column, _ in RATE_COLUMNS]
+    return [label, *num_tickets, sum(num_tickets)]
+
+
+class TicketSummaryReport(AggregateReportView):
     title = 'Ticket summary'
 
+    model = Ticket
+    snapshot = True
+    aggregates = {
+        'num_tickets': Count('id'),
+        'num_days': Sum(NUM_DAYS),
+        # Free tickets have no order row
+        'cost_excl_vat': Sum('order_rows__cost_excl_vat', filter=Q(free_reason__isnull=True)),
+    }
+
     def get_context_data(self):
-        tickets = Ticket.objects.all()
+        values = self.get_aggregates()
 
         rows = [
-            ['Tickets', len(tickets)],
-            ['Days', sum(t.num_days() for t in tickets)],
-            ['Cost (excl. VAT)', f'£{sum(t.cost_excl_vat for t in tickets)}'],
+            ['Tickets', values.get('num_tickets', 0)],
+            ['Days', values.get('num_days', 0)],
+            ['Cost (excl. VAT)', f'£{values.get("cost_excl_vat", 0)}'],
         ]
 
         return {
@@ -57,110 +397,97 @@ class TicketSummaryReport(ReportView):
         }
 
 
-class AttendanceByDayReport(ReportView):
+class AttendanceByDayReport(AggregateReportView):
     title = 'Attendance by day'
 
+    model = Ticket
+    snapshot = True
+    aggregates = {
+        name: aggregate
+        for day in DAYS
+        for name, aggregate in count_tickets_by_rate(f'{day}_', **{day: True}).items()
+    }
+
     def get_context_data(self):
-        tickets = Ticket.objects.all()
-
-        rows = []
-
-        for day in DAYS:
-            num_tickets = {rate: 0 for rate in PRICES_EXCL_VAT}
-            num_tickets['free'] = 0
-
-            for ticket in tickets:
-                if getattr(ticket, day):
-                    if ticket.rate == '':
-                        num_tickets['free'] += 1
-                    else:
-                        num_tickets[ticket.rate] += 1
-
-            rows.append([
-                DAYS[day],
-                num_tickets['individual'],
-                num_tickets['corporate'],
-                num_tickets['unwaged'],
-                num_tickets['free'],
-                num_tickets['individual'] + num_tickets['corporate'] + num_tickets['unwaged'] + num_tickets['free'],
-            ])
+        values = self.get_aggregates()
 
         return {
             'title': self.title,
-            'headings': ['Day', 'Individual rate', 'Corporate rate', 'Unwaged rate', 'Free', 'Total'],
-            'rows': rows,
+            'headings': ['Day', *RATE_HEADINGS],
+            'rows': [num_tickets_row(DAYS[day], values, f'{day}_') for day in DAYS],
         }
 
 
 class UKPAReport(ReportView):
     title = 'UKPA Membership'
 
-    def get_context_data(self):
-        members = User.objects.filter(is_ukpa_member=True)
-        rows = [[member.name, member.email_addr] for member in members]
+    headings = ['Name', 'email']
+    orderings = {'name': ['name', 'id']}
 
-        return {
-            'title': self.title,
-            'headings': ['Name', 'email'],
-            'rows': rows,
-        }
+    def get_queryset(self):
+        return User.objects.filter(is_ukpa_member=True)
+
+    def presenter(self, member):
+        return [member.name, member.email_addr]
 
 
-class TicketSalesReport(ReportView):
+class TicketSalesReport(AggregateReportView):
     title = 'Ticket sales'
     template_name = 'reports/ticket_sales_report.html'
 
+    model = Ticket
+    snapshot = True
+    group_by = {'num_days': NUM_DAYS}
+    aggregates = count_tickets_by_rate()
+
     def get_context_data(self):
-        tickets = Ticket.objects.all()
+        values = self.get_aggregates()
 
         num_tickets_rows = []
         ticket_cost_rows = []
 
-        for ix in range(5):
-            num_days = ix + 1
-            individual_rate = cost_excl_vat('individual', num_days)
-            corporate_rate = cost_excl_vat('corporate', num_days)
-            unwaged_rate = cost_excl_vat('unwaged', num_days)
-
-            num_tickets = {rate: 0 for rate in PRICES_EXCL_VAT}
-            num_tickets['free'] = 0
-
-            for ticket in tickets:
-                if sum(getattr(ticket, day) for day in DAYS) == num_days:
-                    if ticket.rate == '':
-                        num_tickets['free'] += 1
-                    else:
-                        num_tickets[ticket.rate] += 1
-
-            num_tickets_rows.append([
-                num_days,
-                num_tickets['individual'],
-                num_tickets['corporate'],
-                num_tickets['unwaged'],
-                num_tickets['free'],
-                num_tickets['individual'] + num_tickets['corporate'] + num_tickets['unwaged'] + num_tickets['free'],
-            ])
-
-            ticket_cost_rows.append([
-                num_days,
-                f'£{num_tickets["individual"] * individual_rate}',
-                f'£{num_tickets["corporate"] * corporate_rate}',
-                f'£{num_tickets["unwaged"] * unwaged_rate}',
-                f'£0',
-                f'£{num_tickets["individual"] * individual_rate + num_tickets["corporate"] * corporate_rate + num_tickets["unwaged"] * unwaged_rate}',
-            ])
+        for num_days in range(1, len(DAYS) + 1):
+            prefix = f'{num_days}_'
+            num_tickets_rows.append(num_tickets_row(num_days, values, prefix))
+
+            costs = [
+                values.get(f'{prefix}{column}', 0) * cost_excl_vat(column, num_days)
+                for column, _ in RATE_COLUMNS
+            ]
+            ticket_cost_rows.append([num_days, *[f'£{cost}' for cost in costs], f'£{sum(costs)}'])
 
         return {
             'title': self.title,
-            'headings': ['Days', 'Individual rate', 'Corporate rate', 'Unwaged rate', 'Free', 'Total'],
+            'headings': ['Days', *RATE_HEADINGS],
             'num_tickets_rows': num_tickets_rows,
             'ticket_cost_rows': ticket_cost_rows,
         }
 
+    def get_export_headings(self):
+        return ['Table', *self.get_context_data()['headings']]
+
+    def iter_export_rows(self):
+        context = self.get_context_data()
+        for row in context['num_tickets_rows']:
+            yield ['Tickets sold', *row]
+        for row in context['ticket_cost_rows']:
+            yield ['Ticket income', *row]
+
 
 class OrdersMixin:
     headings = ['ID', 'Purchaser', 'Email', 'Tickets', 'Cost (incl. VAT)', 'Status']
 
+    select_related = ['purchaser']
+    orderings = {
+        'newest': ['-id'],
+        'oldest': ['id'],
+        'purchaser': ['purchaser__name', 'id'],
+    }
+    filters = {'status': 'status'}
+
+    def prefetch(self, orders):
+        Order.objects.prefetch_order_rows(orders)
+
     def presenter(self, order):
         link = {
             'href': reverse('reports:tickets_order', args=[order.order_id]),
@@ -176,14 +503,14 @@ class OrdersMixin:
         ]
 
 
-class OrdersReport(ReportView, OrdersMixin):
+class OrdersReport(OrdersMixin, ReportView):
     title = 'All orders'
 
     def get_queryset(self):
         return Order.objects.all()
 
 
-class UnpaidOrdersReport(ReportView, OrdersMixin):
+class UnpaidOrdersReport(OrdersMixin, ReportView):
     title = 'Unpaid orders'
 
     def get_queryset(self):
@@ -193,6 +520,17 @@ class UnpaidOrdersReport(ReportView, OrdersMixin):
 class TicketsMixin:
     headings = ['ID', 'Rate', 'Ticket holder', 'Days', 'Cost (incl. VAT)', 'Status']
 
+    select_related = ['owner']
+    prefetch_related = [
+        Prefetch('invitations', to_attr='prefetched_invitations'),
+        Prefetch('order_rows', to_attr='prefetched_order_rows'),
+    ]
+    orderings = {
+        'oldest': ['id'],
+        'newest': ['-id'],
+    }
+    filters = {'rate': 'rate'}
+
     def presenter(self, ticket):
         link = {
             'href': reverse('reports:tickets_ticket', args=[ticket.ticket_id]),
@@ -208,18 +546,18 @@ class TicketsMixin:
         ]
 
 
-class TicketsReport(ReportView, TicketsMixin):
+class TicketsReport(TicketsMixin, ReportView):
     title = 'All tickets'
 
     def get_queryset(self):
         return Ticket.objects.all()
 
 
-class UnclaimedTicketsReport(ReportView, TicketsMixin):
+class UnclaimedTicketsReport(TicketsMixin, ReportView):
     title = 'Unclaimed tickets'
 
     def get_queryset(self):
-        return Ticket.objects.filter(owner=None).order_by('id')
+        return Ticket.objects.filter(owner=None)
 
 
 class AttendeesWithAccessibilityReqs(ReportView):
@@ -273,6 +611,12 @@ class AttendeesWithDietaryReqs(ReportView):
 class PeopleMixin:
     headings = ['ID', 'Name', 'Email address']
 
+    orderings = {
+        'name': ['name', 'id'],
+        'email': ['email_addr', 'id'],
+    }
+    filters = {'name': 'name__icontains'}
+
     def presenter(self, user):
         link = {
             'href': reverse('reports:accounts_user', args=[user.user_id]),
@@ -286,22 +630,25 @@ class PeopleMixin:
         ]
 
 
-class PeopleReport(ReportView, PeopleMixin):
+class PeopleReport(PeopleMixin, ReportView):
     title = 'People'
 
     def get_queryset(self):
-        return User.objects.order_by('name').all()
+        return User.objects.all()
 
 
-class StaffReport(ReportView, PeopleMixin):
+class StaffReport(PeopleMixin, ReportView):
     title = 'Staff'
 
     def get_queryset(self):
-        return User.objects.filter(is_staff=True).order_by('name')
+        return User.objects.filter(is_staff=True)
 
 
 reports = [
     AttendanceByDayReport,
     TicketSummaryReport,
     TicketSalesReport,
+    OrdersReport,
+    TicketsReport,
+    PeopleReport,
 ]
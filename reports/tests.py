@@ -1,9 +1,19 @@
-from django.test import TestCase
+import json
+from unittest.mock import patch
+
+from django.http import Http404
+from django.test import RequestFactory, TestCase
 
 from accounts.tests import factories as accounts_factories
+from cfp.tests import factories as cfp_factories
+from orders import actions as orders_actions
 from tickets.tests import factories as tickets_factories
 
-from reports import reports
+from ironcage import request_metrics
+from ironcage.tests import utils
+from reports import actions, reports
+from reports.models import SalesCounter
+from tickets import actions as tickets_actions
 
 
 class ReportsTestCase(TestCase):
@@ -65,10 +75,23 @@ class TestAttendanceByDayReport(ReportsTestCase):
         }
         self.assertEqual(report.get_context_data(), expected)
 
+    def test_number_of_queries(self):
+        report = reports.AttendanceByDayReport()
+        with self.assertNumQueries(1):
+            report.get_context_data()
+
     def test_get(self):
         rsp = self.client.get('/reports/attendance-by-day/')
         self.assertEqual(rsp.status_code, 200)
 
+    def test_get_csv(self):
+        rsp = self.client.get('/reports/attendance-by-day/?format=csv')
+        self.assertEqual(rsp['Content-Type'], 'text/csv')
+        self.assertEqual(rsp['Content-Disposition'], 'attachment; filename="attendance-by-day.csv"')
+        lines = b''.join(rsp.streaming_content).decode('utf8').splitlines()
+        self.assertEqual(lines[0], 'Day,Individual rate,Corporate rate,Unwaged rate,Free,Total')
+        self.assertEqual(lines[1], 'Saturday,3,2,0,0,5')
+
     def test_get_when_not_staff(self):
         self.client.force_login(self.bob)
         rsp = self.client.get('/reports/attendance-by-day/', follow=True)
@@ -81,6 +104,38 @@ class TestAttendanceByDayReport(ReportsTestCase):
         self.assertRedirects(rsp, '/accounts/login/?next=/reports/attendance-by-day/')
 
 
+class TestTicketSummaryReport(ReportsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        tickets_factories.create_ticket(num_days=1)
+        tickets_factories.create_ticket(num_days=2, rate='corporate')
+        tickets_factories.create_free_ticket()
+
+    def test_get_context_data(self):
+        report = reports.TicketSummaryReport()
+        expected = {
+            'title': 'Ticket summary',
+            'headings': [],
+            'rows': [
+                ['Tickets', 3],
+                ['Days', 3],
+                ['Cost (excl. VAT)', '£260'],
+            ],
+        }
+        with self.assertNumQueries(1):
+            self.assertEqual(report.get_context_data(), expected)
+
+    def test_get_context_data_when_no_counters(self):
+        SalesCounter.objects.all().delete()
+        report = reports.TicketSummaryReport()
+        self.assertEqual(report.get_context_data()['rows'], [
+            ['Tickets', 0],
+            ['Days', 0],
+            ['Cost (excl. VAT)', '£0'],
+        ])
+
+
 class TestTicketSalesReport(ReportsTestCase):
     @classmethod
     def setUpTestData(cls):
@@ -113,6 +168,273 @@ class TestTicketSalesReport(ReportsTestCase):
         }
         self.assertEqual(report.get_context_data(), expected)
 
+    def test_number_of_queries(self):
+        report = reports.TicketSalesReport()
+        with self.assertNumQueries(1):
+            report.get_context_data()
+
     def test_get(self):
         rsp = self.client.get('/reports/ticket-sales/')
         self.assertEqual(rsp.status_code, 200)
+
+    def test_get_jsonl(self):
+        rsp = self.client.get('/reports/ticket-sales/?format=jsonl')
+        lines = b''.join(rsp.streaming_content).decode('utf8').splitlines()
+        self.assertEqual(len(lines), 10)
+        self.assertEqual(json.loads(lines[0]), {
+            'Table': 'Tickets sold',
+            'Days': 1,
+            'Individual rate': 1,
+            'Corporate rate': 0,
+            'Unwaged rate': 0,
+            'Free': 0,
+            'Total': 1,
+        })
+        self.assertEqual(json.loads(lines[9])['Total'], '£185')
+
+
+class TestBadgesCSV(ReportsTestCase):
+    def test_get(self):
+        tickets_factories.create_ticket(self.bob)
+
+        rsp = self.client.get('/reports/badges/csv/')
+
+        self.assertEqual(rsp.status_code, 200)
+        self.assertEqual(rsp['Content-Type'], 'text/csv')
+        lines = b''.join(rsp.streaming_content).decode('utf8').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('Bob,Bob,'))
+
+    def test_get_when_not_staff(self):
+        self.client.force_login(self.bob)
+        rsp = self.client.get('/reports/badges/csv/', follow=True)
+        self.assertRedirects(rsp, '/accounts/login/?next=/reports/badges/csv/')
+
+
+class TestOrdersReport(ReportsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for ix in range(3):
+            user = accounts_factories.create_user(f'Purchaser {ix}')
+            tickets_factories.create_confirmed_order_for_self_and_others(user)
+            tickets_factories.create_pending_order_for_others(user)
+
+    def get_context_data(self, **params):
+        report = reports.OrdersReport()
+        report.request = RequestFactory().get('/reports/all-orders/', params)
+        return report.get_context_data()
+
+    def test_number_of_queries_does_not_depend_on_number_of_orders(self):
+        # Orders, order rows, tickets, ticket invitations
+        with self.assertNumQueries(4):
+            context = self.get_context_data()
+
+        self.assertEqual(len(context['rows']), 6)
+        self.assertEqual(context['rows'][0][3], 2)
+
+    def test_pagination(self):
+        with patch.object(reports.OrdersReport, 'paginate_by', 4):
+            context = self.get_context_data(sort='purchaser')
+            page = context['page']
+            self.assertEqual(
+                [row[1] for row in context['rows']],
+                ['Purchaser 0', 'Purchaser 0', 'Purchaser 1', 'Purchaser 1'],
+            )
+            self.assertIsNotNone(page.next_cursor)
+
+            context = self.get_context_data(sort='purchaser', after=page.next_cursor)
+            self.assertEqual([row[1] for row in context['rows']], ['Purchaser 2', 'Purchaser 2'])
+            self.assertIsNone(context['page'].next_cursor)
+
+    def test_filter(self):
+        context = self.get_context_data(status='pending')
+        self.assertEqual([row[5] for row in context['rows']], ['pending'] * 3)
+
+    def test_bad_cursor(self):
+        with self.assertRaises(Http404):
+            self.get_context_data(after='not-a-cursor')
+
+    def test_get(self):
+        rsp = self.client.get('/reports/all-orders/?sort=purchaser')
+        self.assertEqual(rsp.status_code, 200)
+        self.assertContains(rsp, 'Purchaser 2')
+        self.assertContains(rsp, '<a href="?sort=purchaser&amp;format=csv">csv</a>', html=True)
+
+    def test_get_csv(self):
+        with patch.object(reports.OrdersReport, 'paginate_by', 2):
+            rsp = self.client.get('/reports/all-orders/?format=csv&sort=purchaser&status=successful')
+
+        self.assertEqual(rsp['Content-Type'], 'text/csv')
+        lines = b''.join(rsp.streaming_content).decode('utf8').splitlines()
+        self.assertEqual(lines[0], 'ID,Purchaser,Email,Tickets,Cost (incl. VAT),Status')
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(all(line.endswith(',successful') for line in lines[1:]))
+
+    def test_export_reads_a_chunk_at_a_time(self):
+        report = reports.OrdersReport()
+        report.request = RequestFactory().get('/reports/all-orders/', {'format': 'csv'})
+
+        with patch.object(reports.OrdersReport, 'export_chunk_size', 4):
+            # Declaring the server-side cursor that orders are read from, and
+            # for each of two chunks: order rows, tickets, ticket invitations
+            with self.assertNumQueries(7):
+                rows = list(report.iter_export_rows())
+
+        self.assertEqual(len(rows), 6)
+
+
+class TestTicketsReport(ReportsTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for ix in range(3):
+            tickets_factories.create_ticket(accounts_factories.create_user(f'Holder {ix}'))
+            tickets_factories.create_ticket_with_unclaimed_invitation()
+            tickets_factories.create_free_ticket(f'free-{ix}@example.com')
+
+    def get_context_data(self, **params):
+        report = reports.TicketsReport()
+        report.request = RequestFactory().get('/reports/all-tickets/', params)
+        return report.get_context_data()
+
+    def test_number_of_queries_does_not_depend_on_number_of_tickets(self):
+        # Tickets, invitations, order rows
+        with self.assertNumQueries(3):
+            context = self.get_context_data()
+
+        self.assertEqual(len(context['rows']), 12)
+
+    def test_filter(self):
+        # An empty parameter doesn't filter
+        context = self.get_context_data(rate='')
+        self.assertEqual(len(context['rows']), 12)
+
+        context = self.get_context_data(rate='individual')
+        self.assertEqual(len(context['rows']), 9)
+
+    def test_get(self):
+        rsp = self.client.get('/reports/all-tickets/')
+        self.assertEqual(rsp.status_code, 200)
+        self.assertContains(rsp, 'free-2@example.com')
+
+    def test_get_jsonl(self):
+        rsp = self.client.get('/reports/all-tickets/?format=jsonl&rate=individual')
+        self.assertEqual(rsp['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(rsp.streaming_content).decode('utf8').splitlines()]
+        self.assertEqual(len(records), 9)
+        self.assertEqual(
+            sorted(records[0]),
+            sorted(['ID', 'Rate', 'Ticket holder', 'Days', 'Cost (incl. VAT)', 'Status']),
+        )
+        self.assertEqual(records[0]['Rate'], 'individual')
+
+
+class TestPeopleReport(ReportsTestCase):
+    def get_context_data(self, **params):
+        report = reports.PeopleReport()
+        report.request = RequestFactory().get('/reports/people/', params)
+        return report.get_context_data()
+
+    def test_sort_and_filter(self):
+        accounts_factories.create_user('Carol', email_addr='aaa@example.com')
+
+        context = self.get_context_data()
+        self.assertEqual([row[1] for row in context['rows']], ['Alice', 'Bob', 'Carol'])
+
+        context = self.get_context_data(sort='email')
+        self.assertEqual([row[1] for row in context['rows']], ['Carol', 'Alice', 'Bob'])
+
+        context = self.get_context_data(name='o')
+        self.assertEqual([row[1] for row in context['rows']], ['Bob', 'Carol'])
+
+    def test_pagination_with_equal_names(self):
+        for ix in range(3):
+            accounts_factories.create_user('Bob')
+
+        names = []
+        cursor = None
+        with patch.object(reports.PeopleReport, 'paginate_by', 2):
+            while True:
+                context = self.get_context_data(after=cursor) if cursor else self.get_context_data()
+                names.extend(row[1] for row in context['rows'])
+                cursor = context['page'].next_cursor
+                if cursor is None:
+                    break
+
+        self.assertEqual(names, ['Alice', 'Bob', 'Bob', 'Bob', 'Bob'])
+
+
+class TestSalesCounters(TestCase):
+    def assertCountersMatchTickets(self):
+        for report in [reports.TicketSummaryReport, reports.AttendanceByDayReport, reports.TicketSalesReport]:
+            counters = {
+                key: value
+                for key, value in SalesCounter.objects.values_for(report.url_name()).items()
+                if value != 0
+            }
+            aggregates = {
+                key: value
+                for key, value in report().compute_aggregates().items()
+                if value != 0
+            }
+            self.assertEqual(counters, aggregates, report.title)
+
+    def test_counters_are_updated_incrementally(self):
+        tickets_factories.create_ticket(num_days=2)
+        tickets_factories.create_confirmed_order_for_self_and_others(rate='corporate')
+        self.assertCountersMatchTickets()
+
+        free_ticket = tickets_factories.create_free_ticket()
+        self.assertCountersMatchTickets()
+
+        tickets_actions.update_free_ticket(free_ticket, ['sat', 'sun', 'mon'])
+        self.assertCountersMatchTickets()
+
+        tickets_actions.claim_ticket_invitation(accounts_factories.create_user('Bob'), free_ticket.invitation())
+        self.assertCountersMatchTickets()
+
+        ticket = tickets_factories.create_ticket_with_unclaimed_invitation()
+        with utils.patched_refund_creation():
+            orders_actions.refund_item(ticket, 'Refund requested by user')
+        self.assertCountersMatchTickets()
+
+    def test_rebuild_sales_counters(self):
+        tickets_factories.create_ticket(num_days=2)
+        tickets_factories.create_free_ticket()
+        SalesCounter.objects.all().delete()
+        SalesCounter.objects.create(dimension='ticket-summary', key='num_tickets', value=100)
+
+        actions.rebuild_sales_counters()
+
+        self.assertCountersMatchTickets()
+        self.assertEqual(SalesCounter.objects.values_for('ticket-summary')['num_tickets'], 2)
+
+
+class TestSpeakersWithoutTickets(ReportsTestCase):
+    def test_get(self):
+        carol = accounts_factories.create_user('Carol')
+        cfp_factories.create_proposal(self.bob, state='accept')
+        cfp_factories.create_proposal(self.bob, state='confirm')
+        cfp_factories.create_proposal(carol, state='accept')
+        tickets_factories.create_ticket(carol)
+
+        rsp = self.client.get('/reports/speakerswithouttickets/')
+
+        self.assertEqual(list(rsp.context['confirmed_without_tickets']), [self.bob])
+        self.assertEqual(list(rsp.context['accepted_without_tickets']), [self.bob])
+        self.assertContains(rsp, 'Bob (bob@example.com)', count=2)
+
+
+class TestRequestMetrics(ReportsTestCase):
+    def setUp(self):
+        super().setUp()
+        request_metrics.clear()
+
+    def test_get(self):
+        self.client.get('/reports/')
+
+        rsp = self.client.get('/reports/request-metrics/')
+
+        self.assertContains(rsp, '<h3>reports:index</h3>', html=True)
+        self.assertContains(rsp, '<th>p95</th>', html=True)
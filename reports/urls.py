@@ -15,5 +15,7 @@ urlpatterns.extend([
     url(r'^tickets/tickets/(?P<ticket_id>\w+)/$', views.tickets_ticket, name='tickets_ticket'),
     url(r'^finaid/$', views.finaid_report, name='finaid_report'),
     url(r'^speakerswithouttickets/$', views.speakers_without_tickets, name='speakers_without_tickets'),
+    url(r'^badges/csv/$', views.badges_csv, name='badges_csv'),
+    url(r'^request-metrics/$', views.request_metrics_report, name='request_metrics'),
     url('^$', views.index, name='index'),
 ])
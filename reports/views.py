@@ -1,7 +1,10 @@
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 
+from accounts import badge_export
+from ironcage import request_metrics
 from accounts.models import User
 from cfp.models import Proposal
 from grants.models import Application
@@ -22,7 +25,7 @@ def accounts_user(request, user_id):
     context = {
         'user': user,
         'ticket': user.get_ticket(),
-        'orders': user.orders.all(),
+        'orders': Order.objects.prefetch_order_rows(user.orders.all()),
     }
     return render(request, 'reports/user.html', context)
 
@@ -30,6 +33,7 @@ def accounts_user(request, user_id):
 @staff_member_required(login_url='login')
 def tickets_order(request, order_id):
     order = Order.objects.get_by_order_id_or_404(order_id)
+    Order.objects.prefetch_order_rows([order])
     context = {
         'order': order,
     }
@@ -66,28 +70,25 @@ def finaid_report(request):
 
 @staff_member_required(login_url='login')
 def speakers_without_tickets(request):
+    context = {
+        'confirmed_without_tickets': Proposal.objects.proposers_without_tickets(['confirm']),
+        'accepted_without_tickets': Proposal.objects.proposers_without_tickets(['accept']),
+    }
+    return render(request, 'reports/speakers_without_tickets.html', context)
 
-    accepted_proposals = Proposal.objects.filter(
-        state='accept'
-    ).all()
-
-    confirmed_proposals = Proposal.objects.filter(
-        state='confirm'
-    ).all()
-
-    accepted_without_tickets = []
-    confirmed_without_tickets = []
-
-    for proposal in accepted_proposals:
-        if proposal.proposer.get_ticket() is None:
-            accepted_without_tickets.append(proposal.proposer)
-
-    for proposal in confirmed_proposals:
-        if proposal.proposer.get_ticket() is None:
-            confirmed_without_tickets.append(proposal.proposer)
 
+@staff_member_required(login_url='login')
+def request_metrics_report(request):
     context = {
-        'confirmed_without_tickets': set(confirmed_without_tickets),
-        'accepted_without_tickets': set(accepted_without_tickets),
+        'summaries': request_metrics.summarise(),
+        'percentiles': request_metrics.PERCENTILES,
     }
-    return render(request, 'reports/speakers_without_tickets.html', context)
+    return render(request, 'reports/request_metrics.html', context)
+
+
+@staff_member_required(login_url='login')
+def badges_csv(request):
+    # This doesn't assign badges or snakes; run the badgedump command first.
+    response = StreamingHttpResponse(badge_export.iter_csv_lines(), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="badges.csv"'
+    return response
@@ -1,18 +1,27 @@
 import codecs
 import csv
+import hashlib
+import json
+from collections import defaultdict, namedtuple
 from copy import copy
-from datetime import date, datetime, time, timedelta
+from datetime import datetime, time, timedelta
 from math import floor
 
-import json
 import yaml
-from django.contrib import messages
-from django.utils.text import slugify
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.text import compress_string, slugify
 from icalendar import Calendar, Event, vCalAddress, vText
 from pytz import timezone
 
 from cfp.models import Proposal
-from schedule.models import Cache, Room, Slot, SlotEvent
+from schedule import cache as schedule_cache
+from schedule.models import Room, Slot, SlotEvent
+
+
+# libyaml's loader is much faster than the pure Python one, but PyYAML can be
+# installed without it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
 
 def get_time(seconds):
@@ -22,8 +31,65 @@ def get_time(seconds):
     return time(hour=hour, minute=minute)
 
 
-def import_schedule(f, request):
-    SlotEvent.objects.all().delete()
+class ImportReport:
+    '''The problems found while importing a schedule or a timetable, or while
+    previewing the import (with dry_run=True), in which case nothing is
+    changed.
+
+    Rows with problems are skipped, and the rest are imported.
+    '''
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.num_imported = 0
+        self.missing_proposals = []
+        self.missing_rooms = []
+        self.missing_slots = []
+        self.clashes = []
+
+    @property
+    def problems(self):
+        return self.missing_proposals + self.missing_rooms + self.missing_slots + self.clashes
+
+
+def import_schedule(f, dry_run=False):
+    '''Replace the SlotEvents with those in f, a CSV file with a row for each
+    event, and return an ImportReport.
+
+    The proposals, rooms and slots are read up front, and the SlotEvents are
+    created in bulk, in one transaction.
+    '''
+
+    report = ImportReport(dry_run)
+
+    proposals_by_title = {}
+    duplicate_titles = set()
+    for proposal in Proposal.objects.all():
+        if proposal.title in proposals_by_title:
+            duplicate_titles.add(proposal.title)
+        proposals_by_title[proposal.title] = proposal
+
+    rooms_by_name = {room.name: room for room in Room.objects.all()}
+
+    slots_by_key = {}
+    slots_by_room_and_date = defaultdict(list)
+    for slot in Slot.objects.order_by('time', 'id'):
+        slots_by_key.setdefault((slot.room_id, slot.date, slot.time), slot)
+        slots_by_room_and_date[(slot.room_id, slot.date)].append(slot)
+
+    # The SlotEvent in each slot, keyed by the slot's id
+    slot_events = {}
+
+    def add_slot_event(activity, slot, ical_id):
+        '''Add a SlotEvent, returning whether there was room for it.'''
+
+        slot_event = slot_events.get(slot.id)
+        if slot_event is None:
+            slot_events[slot.id] = SlotEvent(activity=activity, slot=slot, ical_id=ical_id)
+        elif slot_event.activity != activity:
+            report.clashes.append(f'{slot_event.activity.title} and {activity.title} are both in {slot}')
+            return False
+        return True
 
     reader = csv.reader(codecs.iterdecode(f, 'utf-8'))
     for i, (event_index, event, slot_index, slot_text) in enumerate(reader):
@@ -32,55 +98,97 @@ def import_schedule(f, request):
         slot_date, slot_time, *room = slot_text.split(' ')
         room = ' '.join(room)
 
+        if event in duplicate_titles:
+            report.missing_proposals.append(f"Found more than one proposal called {event}")
+            continue
+
+        try:
+            activity = proposals_by_title[event]
+        except KeyError:
+            report.missing_proposals.append(f"Couldn't find {event}")
+            continue
+
         try:
-            activity = Proposal.objects.get(title=event)
-        except Proposal.DoesNotExist:
-            messages.add_message(request, messages.ERROR, f"Couldn't find {event}")
+            room = rooms_by_name[room]
+        except KeyError:
+            report.missing_rooms.append(f"Couldn't find room {room}")
             continue
 
-        room = Room.objects.get(name=room)
+        try:
+            slot_date = datetime.strptime(slot_date, '%Y-%m-%d').date()
+            slot_time = datetime.strptime(slot_time, '%H:%M:%S').time()
+        except ValueError:
+            report.missing_slots.append(f"Couldn't read slot {slot_text}")
+            continue
 
         try:
-            slot = Slot.objects.get(room=room, date=slot_date, time=slot_time)
-            ical_id = ('%s-%s' % (activity.proposal_id, slot.date.strftime('%a'))
-                       if activity.conference_event else activity.proposal_id).lower()
-            SlotEvent.objects.get_or_create(
-                activity=activity,
-                slot=slot,
-                ical_id=ical_id
-            )
+            slot = slots_by_key[(room.id, slot_date, slot_time)]
+        except KeyError:
+            report.missing_slots.append(f"Couldn't find {room} on {slot_date} at {slot_time}")
+            continue
+
+        ical_id = ('%s-%s' % (activity.proposal_id, slot.date.strftime('%a'))
+                   if activity.conference_event else activity.proposal_id).lower()
+        if not add_slot_event(activity, slot, ical_id):
+            continue
+
+        if activity.session_type == 'workshop' and activity.length >= timedelta(minutes=90):
+            slot_time_plus_91_mins = (datetime.combine(slot_date, slot_time) + timedelta(minutes=91)).time()
+            later_slots = [
+                later_slot for later_slot in slots_by_room_and_date[(room.id, slot_date)]
+                if later_slot.time > slot_time_plus_91_mins
+            ]
+            if later_slots:
+                add_slot_event(activity, later_slots[0], ical_id)
+            else:
+                report.missing_slots.append(f"Couldn't find {room} on {slot_date} after {slot_time_plus_91_mins}")
+
+    report.num_imported = len(slot_events)
 
-            if activity.session_type == 'workshop' and activity.length >= timedelta(minutes=90):
-                slot_time_plus_91_mins = datetime.strptime(slot_time, '%H:%M:%S') + timedelta(minutes=91)
-                slot = Slot.objects.filter(room=room, date=slot_date, time__gt=slot_time_plus_91_mins).first()
-                SlotEvent.objects.get_or_create(
-                    activity=activity,
-                    slot=slot,
-                    ical_id=ical_id
-                )
+    if not dry_run:
+        with transaction.atomic():
+            SlotEvent.objects.all().delete()
+            SlotEvent.objects.bulk_create(slot_events.values())
+            transaction.on_commit(schedule_cache.bump_version)
 
-        except Slot.DoesNotExist:
-            messages.add_message(request, messages.ERROR, f"Couldn't find {room} on {slot_date} at {slot_time}")
+    return report
 
-    try:
-        Cache.objects.all().delete()
-    except Cache.DoesNotExist:
-        pass
 
+def import_timetable(timetable_f, unbounded_f, dry_run=False):
+    '''Replace the slots that were linked to the scheduler with those in the
+    YAML files timetable_f and unbounded_f, and return an ImportReport.
 
-def import_timetable(timetable_f, unbounded_f, request):
+    timetable_f has the slots in each session in each room on each day, and
+    unbounded_f has slots (such as breaks) that are added to every room on
+    every day, unless the room already has a slot at that time.
 
-    timetable = yaml.load(timetable_f.read())
-    unbounded = yaml.load(unbounded_f.read())
+    The rooms and the slots that are kept are read up front, and the new slots
+    are created in bulk, in one transaction.
+    '''
 
-    Slot.objects.filter(scheduler_linked=True).all().delete()
+    report = ImportReport(dry_run)
+
+    timetable = yaml.load(timetable_f.read(), Loader=YAML_LOADER)
+    unbounded = yaml.load(unbounded_f.read(), Loader=YAML_LOADER)
+
+    rooms_by_name = {room.name: room for room in Room.objects.all()}
+
+    # The (room id, date, time) of every slot, starting with the slots that
+    # aren't linked to the scheduler, which aren't replaced
+    slot_keys = set(Slot.objects.filter(scheduler_linked=False).values_list('room_id', 'date', 'time'))
+
+    slots = []
 
     for room_name, dates in timetable.items():
-        room = Room.objects.get(name=room_name)
-        for day, sessions in dates.items():
-            for session_name, slots in sessions.items():
-                for slot in slots:
+        try:
+            room = rooms_by_name[room_name]
+        except KeyError:
+            report.missing_rooms.append(f"Couldn't find room {room_name}")
+            continue
 
+        for day, sessions in dates.items():
+            for session_name, session_slots in sessions.items():
+                for slot in session_slots:
                     slot = Slot(
                         room=room,
                         date=day,
@@ -92,12 +200,17 @@ def import_timetable(timetable_f, unbounded_f, request):
                         scheduler_linked=True
                     )
 
-                    slot.save()
+                    if (room.id, slot.date, slot.time) in slot_keys:
+                        report.clashes.append(f'There is already a slot in {room} on {day} at {slot.time}')
+                        continue
+
+                    slot_keys.add((room.id, slot.date, slot.time))
+                    slots.append(slot)
 
             # Add unbounded slots
             for item in unbounded:
                 for slot_name, slot in item.items():
-                    if not Slot.objects.filter(room=room, date=day, time=get_time(slot['starts_at'])).count():
+                    if (room.id, day, get_time(slot['starts_at'])) not in slot_keys:
                         slot = Slot(
                             room=room,
                             date=day,
@@ -107,79 +220,112 @@ def import_timetable(timetable_f, unbounded_f, request):
                             scheduler_linked=True
                         )
 
-                        slot.save()
+                        slot_keys.add((room.id, slot.date, slot.time))
+                        slots.append(slot)
 
+    report.num_imported = len(slots)
 
-def generate_schedule_page_data():
+    if not dry_run:
+        with transaction.atomic():
+            Slot.objects.filter(scheduler_linked=True).delete()
+            Slot.objects.bulk_create(slots)
+            transaction.on_commit(schedule_cache.bump_version)
 
-    days = [date(2018, 9, 15), date(2018, 9, 16), date(2018, 9, 17), date(2018, 9, 18), date(2018, 9, 19)]
+    return report
+
+
+# A document served to clients, encoded and gzipped in advance so that it
+# isn't compressed on every request
+Feed = namedtuple('Feed', ['body', 'gzipped_body'])
+
+
+def encode_feed(text):
+    body = text.encode('utf-8')
+    return Feed(body, compress_string(body))
+
+
+def get_schedule_page_data(version=None):
+    return schedule_cache.get_or_generate('schedule', generate_schedule_page_data, version)
+
+
+def get_schedule_json(version=None):
+    '''Return the schedule page data as a JSON Feed.'''
+
+    if version is None:
+        version = schedule_cache.get_version()
+
+    # The JSON must be generated from the same version of the schedule that
+    # it's cached under
+    return schedule_cache.get_or_generate('schedule-json', lambda: generate_schedule_json(version), version)
+
+
+def generate_schedule_json(version=None):
+    return encode_feed(json.dumps(get_schedule_page_data(version), cls=DjangoJSONEncoder))
+
+
+def generate_schedule_page_data():
+    '''Return the data for the schedule page: for each day with slots, the
+    times and rooms of the day's slots, and a matrix with a row for each time
+    and a column for each room, holding the session (if any) in that slot.
+
+    The slots and their sessions are read with one query each, however big
+    the schedule is.
+    '''
+
+    # The times and rooms of each day, from every slot, including those with
+    # no sessions
+    times_by_day = defaultdict(set)
+    rooms_by_day = defaultdict(dict)
+
+    slots = Slot.objects.values_list('date', 'time', 'room_id', 'room__name').distinct()
+    for day, time_, room_id, room_name in slots:
+        times_by_day[day].add(time_)
+        rooms_by_day[day][room_id] = room_name
+
+    slot_events = SlotEvent.objects.filter(
+        slot__isnull=False
+    ).select_related(
+        'slot__room', 'activity__proposer'
+    ).order_by(
+        'slot__date', 'slot__time', 'slot__room__name', 'id'
+    )
+
+    # The session in each slot, keyed by (date, time, room)
+    sessions_by_slot = {
+        (session.slot.date, session.slot.time, session.slot.room_id): {
+            'break_event': session.activity.break_event,
+            'title': session.activity.title,
+            'subtitle': session.activity.subtitle,
+            'conference_event': session.activity.conference_event,
+            'name': session.activity.all_presenter_names,
+            'time': session.slot.time.strftime('%H:%M'),
+            'end_time': session.end_time,
+            'id': session.activity.proposal_id,
+            'description': session.activity.description,
+            'ical_id': session.ical_id,
+            'rowspan': 1,
+            'colspan': 1,
+            'spanned': False,
+            'room': session.slot.room.name,
+            'track': session.activity.track,
+            'aimed_at_new_programmers': session.activity.aimed_at_new_programmers,
+            'aimed_at_teachers': session.activity.aimed_at_teachers,
+            'aimed_at_data_scientists': session.activity.aimed_at_data_scientists,
+        }
+        for session in slot_events
+    }
 
     all_sessions = {}
 
-    for day in days:
-
-        rooms_for_day_query = Slot.objects.filter(
-            date=day
-        ).distinct(
-            'room'
-        )
-
-        rooms_for_day = [x.room for x in rooms_for_day_query]
-        rooms_for_day = sorted(rooms_for_day, key=lambda x: x.name)
-        room_names_for_day = [x.name for x in rooms_for_day]
-
-        times_for_day_query = Slot.objects.filter(
-            date=day
-        ).distinct(
-            'time'
-        ).values(
-            'time'
-        ).order_by(
-            'time'
-        )
-        times_for_day = [x['time'] for x in times_for_day_query]
+    for day in sorted(times_by_day):
+        times_for_day = sorted(times_by_day[day])
+        rooms_for_day = sorted(rooms_by_day[day].items(), key=lambda room: (room[1], room[0]))
 
         # lists of sessions, one list per time
-        matrix = []
-
-        # Make blank matrix
-        for time_ in times_for_day:
-            slot_events_for_time = SlotEvent.objects.filter(
-                slot__date=day,
-                slot__time=time_
-            ).order_by(
-                'slot__room__name'
-            ).all()
-
-            sessions = []
-
-            for i, room in enumerate(rooms_for_day):
-                sessions.append(None)
-
-                for session in slot_events_for_time:
-                    if session.slot.room == room:
-
-                        sessions[i] = {
-                            'break_event': session.activity.break_event,
-                            'title': session.activity.title,
-                            'subtitle': session.activity.subtitle,
-                            'conference_event': session.activity.conference_event,
-                            'name': session.activity.all_presenter_names,
-                            'time': session.slot.time.strftime('%H:%M'),
-                            'end_time': session.end_time,
-                            'id': session.activity.proposal_id,
-                            'description': session.activity.description,
-                            'ical_id': session.ical_id,
-                            'rowspan': 1,
-                            'colspan': 1,
-                            'spanned': False,
-                            'room': session.slot.room.name,
-                            'track': session.activity.track,
-                            'aimed_at_new_programmers': session.activity.aimed_at_new_programmers,
-                            'aimed_at_teachers': session.activity.aimed_at_teachers,
-                            'aimed_at_data_scientists': session.activity.aimed_at_data_scientists,
-                        }
-            matrix.append(sessions)
+        matrix = [
+            [sessions_by_slot.get((day, time_, room_id)) for room_id, _ in rooms_for_day]
+            for time_ in times_for_day
+        ]
 
         for i, time_ in enumerate(times_for_day):
             for j, session in enumerate(matrix[i]):
@@ -208,65 +354,121 @@ def generate_schedule_page_data():
                     # Make the YAML more bearable
                     matrix[i][j]['end_time'] = matrix[i][j]['end_time'].strftime('%H:%M')
 
-        times_for_day = [x.strftime('%H:%M') for x in times_for_day]
-
         all_sessions[day.strftime('%Y-%m-%d')] = {
-            'times': times_for_day,
-            'rooms': room_names_for_day,
+            'times': [x.strftime('%H:%M') for x in times_for_day],
+            'rooms': [room_name for _, room_name in rooms_for_day],
             'matrix': matrix
         }
 
-    try:
-        Cache.objects.get(key='schedule').delete()
-    except Cache.DoesNotExist:
-        pass
+    return all_sessions
 
-    schedule_cache = Cache(key='schedule', value=json.dumps(all_sessions))
-    schedule_cache.save()
 
-    return all_sessions
+def ical_feed_name(items_of_interest):
+    '''Return the name of the iCal feed of the sessions with the given ical_ids.
 
+    Feeds depend only on the sessions they include, so users who are
+    interested in the same sessions share a cached feed.
+    '''
+
+    if not items_of_interest:
+        return 'ical-full'
+
+    ical_ids = ','.join(sorted(set(items_of_interest)))
+    return 'ical-' + hashlib.sha1(ical_ids.encode('utf-8')).hexdigest()
+
+
+def get_ical(items_of_interest, version=None):
+    '''Return the iCal Feed of the sessions with the given ical_ids, or of
+    every session if there are none.'''
+
+    if version is None:
+        version = schedule_cache.get_version()
+
+    return schedule_cache.get_or_generate(
+        ical_feed_name(items_of_interest),
+        lambda: encode_feed(generate_ical(items_of_interest, version)),
+        version,
+    )
+
+
+def generate_ical(items_of_interest, version=None):
+    '''Return the iCal feed of the sessions with the given ical_ids (and of
+    the breaks), or of every session if there are none.
+
+    Each session's event is rendered once for every feed (see
+    get_ical_events()), so a feed is generated by joining the events it
+    includes.
+    '''
+
+    ical_events = get_ical_events(version)
+    items_of_interest = set(items_of_interest)
+
+    events = [
+        event
+        for ical_id, break_event, event in ical_events['events']
+        if not items_of_interest or ical_id in items_of_interest or break_event
+    ]
+
+    return ''.join([ical_events['header'], *events, ical_events['footer']])
+
+
+def get_ical_events(version=None):
+    return schedule_cache.get_or_generate('ical-events', generate_ical_events, version)
+
+
+def generate_ical_events():
+    '''Return the parts of the iCal feed of every session: the calendar's
+    header and footer, and an (ical_id, break_event, event) tuple for each
+    session, where event is the session's rendered VEVENT.
+
+    Breaks are only included once, for the Assembly Room.
+    '''
 
-def generate_ical(slot_events, token):
-    london_time = timezone('Europe/London')
     cal = Calendar()
     cal['X-WR-CALNAME'] = vText('PyCon UK 2018')
+    header, end, footer = cal.to_ical().decode('utf-8').rpartition('END:VCALENDAR')
 
-    for slot_event in slot_events:
-        if (not slot_event.activity.break_event or
-                (slot_event.activity.break_event and slot_event.slot.room.name == 'Assembly Room')):
+    slot_events = SlotEvent.objects.filter(
+        slot__isnull=False
+    ).select_related(
+        'slot__room', 'activity__proposer'
+    ).order_by('id')
 
-            event = Event()
+    events = [
+        (slot_event.ical_id, slot_event.activity.break_event, render_ical_event(slot_event))
+        for slot_event in slot_events
+        if not slot_event.activity.break_event or slot_event.slot.room.name == 'Assembly Room'
+    ]
 
-            event.add('summary', slot_event.activity.title)
-            event.add('dtstart', datetime.combine(slot_event.slot.date, slot_event.slot.time, tzinfo=london_time))
-            event.add('duration', slot_event.slot.duration)
-            event.add('dtstamp', datetime.now())
+    return {
+        'header': header,
+        'footer': end + footer,
+        'events': events,
+    }
 
-            if slot_event.activity.break_event:
-                event.add('uid', f'{slot_event.ical_id}-{slot_event.slot.time.hour}')
-            else:
-                event.add('uid', f'{slot_event.ical_id}-{slot_event.slot.id}')
-                event.add('location', slot_event.slot.room.name)
 
-            if not slot_event.activity.conference_event:
-                event.add('description', slot_event.activity.description)
-                for speaker in slot_event.activity.all_presenter_names.split(', '):
-                    attendee = vCalAddress(f'http://example.com/{slugify(speaker)}')
-                    attendee.params['cn'] = vText(speaker)
-                    attendee.params['role'] = vText('REQ-PARTICIPANT')
-                    event.add('attendee', attendee, encode=0)
+def render_ical_event(slot_event):
+    london_time = timezone('Europe/London')
 
-            cal.add_component(event)
+    event = Event()
 
-    try:
-        Cache.objects.get(key=token).delete()
-    except Cache.DoesNotExist:
-        pass
+    event.add('summary', slot_event.activity.title)
+    event.add('dtstart', datetime.combine(slot_event.slot.date, slot_event.slot.time, tzinfo=london_time))
+    event.add('duration', slot_event.slot.duration)
+    event.add('dtstamp', datetime.now())
 
-    ical = cal.to_ical().decode('utf-8')
+    if slot_event.activity.break_event:
+        event.add('uid', f'{slot_event.ical_id}-{slot_event.slot.time.hour}')
+    else:
+        event.add('uid', f'{slot_event.ical_id}-{slot_event.slot.id}')
+        event.add('location', slot_event.slot.room.name)
 
-    ical_cache = Cache(key=token, value=ical)
-    ical_cache.save()
+    if not slot_event.activity.conference_event:
+        event.add('description', slot_event.activity.description)
+        for speaker in slot_event.activity.all_presenter_names.split(', '):
+            attendee = vCalAddress(f'http://example.com/{slugify(speaker)}')
+            attendee.params['cn'] = vText(speaker)
+            attendee.params['role'] = vText('REQ-PARTICIPANT')
+            event.add('attendee', attendee, encode=0)
 
-    return ical
+    return event.to_ical().decode('utf-8')
@@ -0,0 +1,159 @@
+'''A cache of data generated from the schedule, such as the data for the
+schedule page and the iCal feeds.
+
+Entries are kept in Django's cache, which is shared between processes, and are
+keyed by the version of the schedule that they were generated from.  The
+version is the time that the schedule last changed, and is bumped (by
+bump_version()) whenever the schedule or the timetable is imported, after
+which entries generated from older versions are no longer read, and expire in
+due course.
+
+When an entry is missing, one process regenerates it, while any others that
+want it wait for it to appear (see get_or_generate()).
+
+Each process also keeps the entries it has read most recently in memory, so
+that, for instance, the schedule page data is unpickled once per process for
+each version of the schedule, rather than once per request.
+'''
+
+from collections import OrderedDict
+import threading
+import time
+
+from django.core.cache import cache
+
+
+VERSION_KEY = 'schedule-version'
+
+# How long entries are kept in Django's cache, in seconds
+ENTRY_TIMEOUT = 24 * 60 * 60
+
+# How long to wait for another process to generate an entry, in seconds,
+# before giving up and generating it anyway
+LOCK_TIMEOUT = 30
+
+# How often to check whether another process has generated an entry, in seconds
+LOCK_POLL_INTERVAL = 0.05
+
+# The number of entries each process keeps in memory
+LOCAL_CACHE_SIZE = 32
+
+# Returned by cache.get() for missing entries, so that None can be cached
+MISSING = object()
+
+
+class LRUCache:
+    '''A dict-like store of at most max_size entries, which discards the
+    least recently used entry when it is full.'''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                self.entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self.entries[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local_cache = LRUCache(LOCAL_CACHE_SIZE)
+
+
+def get_version():
+    '''Return the version of the schedule, which is the time that it last
+    changed, in milliseconds since the epoch.'''
+
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # We don't know when the schedule last changed, so we assume that it
+        # was just now.  This means that if the version is ever evicted,
+        # entries from before then aren't read.
+        version = int(time.time() * 1000)
+        cache.add(VERSION_KEY, version, timeout=None)
+        version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_version():
+    '''Record that the schedule has changed.
+
+    This should be called once the change has been committed (see
+    transaction.on_commit()), so that nothing can read the old schedule and
+    cache it against the new version.
+    '''
+
+    # The version always increases, even if the clock goes backwards
+    version = max(int(time.time() * 1000), get_version() + 1)
+    cache.set(VERSION_KEY, version, timeout=None)
+
+
+def last_modified(version):
+    '''Return when the given version of the schedule was made, in whole
+    seconds since the epoch.'''
+
+    return version // 1000
+
+
+def get_or_generate(name, generate, version=None):
+    '''Return the entry called name for the given version of the schedule
+    (by default, the current version), calling generate() to generate it if
+    it isn't cached.'''
+
+    if version is None:
+        version = get_version()
+
+    value = _local_cache.get((name, version), MISSING)
+    if value is MISSING:
+        value = cache.get(name, MISSING, version=version)
+        if value is MISSING:
+            value = _generate_once(name, version, generate)
+        _local_cache.set((name, version), value)
+
+    return value
+
+
+def _generate_once(name, version, generate):
+    '''Generate and cache an entry, unless another process is already doing
+    so, in which case wait for it to be cached.'''
+
+    lock_key = f'{name}-lock'
+    deadline = time.monotonic() + LOCK_TIMEOUT
+
+    while not cache.add(lock_key, True, LOCK_TIMEOUT, version=version):
+        time.sleep(LOCK_POLL_INTERVAL)
+
+        value = cache.get(name, MISSING, version=version)
+        if value is not MISSING:
+            return value
+
+        if time.monotonic() > deadline:
+            # The other process may have died without caching the entry
+            value = generate()
+            cache.set(name, value, ENTRY_TIMEOUT, version=version)
+            return value
+
+    try:
+        value = generate()
+        cache.set(name, value, ENTRY_TIMEOUT, version=version)
+        return value
+    finally:
+        cache.delete(lock_key, version=version)
+
+
+def clear_local_cache():
+    _local_cache.clear()
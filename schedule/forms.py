@@ -3,8 +3,10 @@ from django import forms
 
 class UploadScheduleForm(forms.Form):
     schedule = forms.FileField()
+    dry_run = forms.BooleanField(required=False, label='Preview without importing')
 
 
 class UploadTimetableForm(forms.Form):
     timetable = forms.FileField()
     unbounded = forms.FileField()
+    dry_run = forms.BooleanField(required=False, label='Preview without importing')
@@ -0,0 +1,113 @@
+from datetime import date, time, timedelta
+import time as time_module
+
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import User
+from cfp.models import Proposal
+from schedule.actions import generate_schedule_page_data
+from schedule.models import Room, Slot, SlotEvent
+
+
+class Rollback(Exception):
+    pass
+
+
+ROOM_FLAGS = [
+    'has_sttr', 'has_projector', 'has_screen', 'has_vga', 'has_hdmi', 'has_lectern', 'has_mic', 'has_stage',
+    'has_fixed_seating', 'accessible_auditorium', 'accessible_stage',
+]
+
+
+def create_schedule(num_days, num_rooms, num_slots):
+    '''Create a schedule with num_slots half-hour talks in each of num_rooms
+    rooms on each of num_days days.'''
+
+    proposer = User.objects.create_user(name='Benchmark', email_addr='benchmark@example.com')
+
+    rooms = Room.objects.bulk_create([
+        Room(name=f'Benchmark room {ix}', capacity=100, **{flag: True for flag in ROOM_FLAGS})
+        for ix in range(num_rooms)
+    ])
+
+    slots = Slot.objects.bulk_create([
+        Slot(
+            room=room,
+            date=date(2018, 9, 15) + timedelta(days=day_ix),
+            time=time(9 + slot_ix // 2, 30 * (slot_ix % 2)),
+            duration=timedelta(minutes=30),
+            event_type='talk',
+            visible=True,
+            scheduler_linked=True,
+        )
+        for day_ix in range(num_days)
+        for room in rooms
+        for slot_ix in range(num_slots)
+    ])
+
+    proposals = Proposal.objects.bulk_create([
+        Proposal(
+            proposer=proposer,
+            session_type='talk',
+            state='confirm',
+            title=f'Benchmark talk {ix}',
+            description='',
+            aimed_at_new_programmers=False,
+            aimed_at_teachers=False,
+            aimed_at_data_scientists=False,
+            would_like_mentor=False,
+            would_like_longer_slot=False,
+            coc_conformity=True,
+            ticket=True,
+        )
+        for ix in range(len(slots))
+    ])
+
+    SlotEvent.objects.bulk_create([
+        SlotEvent(activity=proposal, slot=slot, ical_id=proposal.proposal_id.lower())
+        for proposal, slot in zip(proposals, slots)
+    ])
+
+
+class Command(BaseCommand):
+    help = 'Benchmark building the schedule page data for schedules of different sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=5, help='Number of days')
+        parser.add_argument('--slots', type=int, default=16, help='Number of slots per room per day')
+        parser.add_argument(
+            '--rooms',
+            type=int,
+            nargs='+',
+            default=[1, 5, 10],
+            help='Numbers of rooms to benchmark with (default: 1 5 10)',
+        )
+
+    def handle(self, *args, days, slots, rooms, **kwargs):
+        for num_rooms in rooms:
+            try:
+                with transaction.atomic():
+                    create_schedule(days, num_rooms, slots)
+                    with connection.cursor() as cursor:
+                        # So that the planner knows how big the tables now are
+                        cursor.execute('ANALYZE schedule_slot, schedule_slotevent, cfp_proposal')
+                    self.benchmark(f'{days} days, {num_rooms} rooms, {days * num_rooms * slots} sessions')
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def benchmark(self, descr):
+        num_queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal num_queries
+            num_queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            start = time_module.perf_counter()
+            generate_schedule_page_data()
+            elapsed = time_module.perf_counter() - start
+
+        self.stdout.write(f'{descr}: {elapsed:.3f}s, {num_queries} queries')
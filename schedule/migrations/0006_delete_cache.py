@@ -0,0 +1,16 @@
+# Generated by Django 2.0.3 on 2026-10-18 13:27
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0005_slotevent_ical_id'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Cache',
+        ),
+    ]
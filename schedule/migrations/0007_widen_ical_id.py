@@ -0,0 +1,18 @@
+# Generated by Django 2.0.3 on 2026-10-18 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0006_delete_cache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='slotevent',
+            name='ical_id',
+            field=models.CharField(max_length=16),
+        ),
+    ]
@@ -72,7 +72,7 @@ class SlotEvent(models.Model):
                               on_delete=models.CASCADE, blank=True, null=True)
     additional_people = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True)
 
-    ical_id = models.CharField(max_length=8, null=False, blank=False)
+    ical_id = models.CharField(max_length=16, null=False, blank=False)
 
     def __str__(self):
         return f'{self.activity.title} ({self.slot.time})'
@@ -80,8 +80,3 @@ class SlotEvent(models.Model):
     @property
     def end_time(self):
         return (datetime.combine(self.slot.date, self.slot.time) + self.slot.duration).time()
-
-
-class Cache(models.Model):
-    key = models.CharField(max_length=24, unique=True)
-    value = models.TextField(null=True)
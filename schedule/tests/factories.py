@@ -0,0 +1,51 @@
+from datetime import date, time, timedelta
+
+from cfp.tests.factories import create_proposal
+
+from schedule.models import Room, Slot, SlotEvent
+
+
+def create_room(name='Assembly Room'):
+    return Room.objects.create(
+        name=name,
+        capacity=100,
+        has_sttr=True,
+        has_projector=True,
+        has_screen=True,
+        has_vga=True,
+        has_hdmi=True,
+        has_lectern=True,
+        has_mic=True,
+        has_stage=True,
+        has_fixed_seating=True,
+        accessible_auditorium=True,
+        accessible_stage=True,
+    )
+
+
+def create_slot(room=None, date_=date(2018, 9, 15), time_=time(10, 0), duration=timedelta(minutes=30)):
+    if room is None:
+        room = create_room()
+
+    return Slot.objects.create(
+        room=room,
+        date=date_,
+        time=time_,
+        duration=duration,
+        event_type='talk',
+        visible=True,
+        scheduler_linked=True,
+    )
+
+
+def create_slot_event(slot=None, proposal=None):
+    if slot is None:
+        slot = create_slot()
+    if proposal is None:
+        proposal = create_proposal()
+
+    return SlotEvent.objects.create(
+        activity=proposal,
+        slot=slot,
+        ical_id=proposal.proposal_id.lower(),
+    )
@@ -0,0 +1,297 @@
+from datetime import date, time, timedelta
+import io
+import json
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.tests.factories import create_user
+from cfp.tests.factories import create_proposal
+
+from schedule import actions
+from schedule import cache as schedule_cache
+from schedule.models import Slot, SlotEvent
+
+from . import factories
+
+
+class GenerateSchedulePageDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room1 = factories.create_room('Room 1')
+        cls.room2 = factories.create_room('Room 2')
+        cls.alice = create_user('Alice')
+
+    def create_slot_event(self, room, date_, time_, duration=timedelta(minutes=30)):
+        slot = factories.create_slot(room, date_, time_, duration)
+        return factories.create_slot_event(slot, create_proposal(self.alice))
+
+    def test_matrix(self):
+        slot_event = self.create_slot_event(self.room2, date(2018, 9, 15), time(10, 0))
+        factories.create_slot(self.room1, date(2018, 9, 15), time(10, 30))
+
+        all_sessions = actions.generate_schedule_page_data()
+
+        self.assertEqual(list(all_sessions), ['2018-09-15'])
+        day = all_sessions['2018-09-15']
+        self.assertEqual(day['times'], ['10:00', '10:30'])
+        self.assertEqual(day['rooms'], ['Room 1', 'Room 2'])
+
+        [[empty1, session], [empty2, empty3]] = day['matrix']
+        self.assertEqual([empty1, empty2, empty3], [None, None, None])
+        self.assertEqual(session['title'], 'Python is brilliant')
+        self.assertEqual(session['name'], 'Alice')
+        self.assertEqual(session['room'], 'Room 2')
+        self.assertEqual(session['time'], '10:00')
+        self.assertEqual(session['end_time'], '10:30')
+        self.assertEqual(session['ical_id'], slot_event.ical_id)
+        self.assertEqual(session['rowspan'], 1)
+        self.assertEqual(session['colspan'], 1)
+
+    def test_long_session(self):
+        self.create_slot_event(self.room1, date(2018, 9, 15), time(10, 0), timedelta(minutes=90))
+        factories.create_slot(self.room1, date(2018, 9, 15), time(10, 30))
+        factories.create_slot(self.room1, date(2018, 9, 15), time(11, 0))
+        factories.create_slot(self.room1, date(2018, 9, 15), time(11, 30))
+
+        matrix = actions.generate_schedule_page_data()['2018-09-15']['matrix']
+
+        self.assertEqual(matrix[0][0]['rowspan'], 3)
+        self.assertFalse(matrix[0][0]['spanned'])
+        self.assertTrue(matrix[1][0]['spanned'])
+        self.assertTrue(matrix[2][0]['spanned'])
+        self.assertIsNone(matrix[3][0])
+
+    def test_days_come_from_slots(self):
+        self.create_slot_event(self.room1, date(2018, 9, 17), time(10, 0))
+        factories.create_slot(self.room1, date(2018, 9, 15), time(10, 0))
+
+        all_sessions = actions.generate_schedule_page_data()
+
+        self.assertEqual(list(all_sessions), ['2018-09-15', '2018-09-17'])
+
+    def test_number_of_queries_does_not_depend_on_size_of_schedule(self):
+        self.create_slot_event(self.room1, date(2018, 9, 15), time(10, 0))
+
+        with CaptureQueriesContext(connection) as small_queries:
+            actions.generate_schedule_page_data()
+
+        for day in range(15, 20):
+            for hour in range(9, 17):
+                self.create_slot_event(self.room2, date(2018, 9, day), time(hour, 0))
+
+        with CaptureQueriesContext(connection) as large_queries:
+            actions.generate_schedule_page_data()
+
+        self.assertEqual(len(large_queries), len(small_queries))
+
+
+class GenerateIcalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = factories.create_room('Assembly Room')
+        cls.other_room = factories.create_room('Other Room')
+
+        cls.talk1 = cls.create_slot_event(cls.room, time(10, 0), 'Talk 1')
+        cls.talk2 = cls.create_slot_event(cls.other_room, time(10, 0), 'Talk 2')
+        cls.break_ = cls.create_slot_event(cls.room, time(10, 30), 'Coffee', break_event=True)
+        cls.create_slot_event(cls.other_room, time(10, 30), 'Coffee', break_event=True)
+
+    @classmethod
+    def create_slot_event(cls, room, time_, title, break_event=False):
+        proposal = create_proposal()
+        proposal.title = title
+        proposal.break_event = break_event
+        proposal.save()
+        slot = factories.create_slot(room, date(2018, 9, 15), time_)
+        return factories.create_slot_event(slot, proposal)
+
+    def setUp(self):
+        schedule_cache.clear_local_cache()
+
+    def test_full_feed(self):
+        ical = actions.generate_ical([])
+
+        self.assertTrue(ical.startswith('BEGIN:VCALENDAR\r\nX-WR-CALNAME:PyCon UK 2018\r\n'))
+        self.assertTrue(ical.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(ical.count('BEGIN:VEVENT'), 3)
+        self.assertIn('SUMMARY:Talk 1', ical)
+        self.assertIn('SUMMARY:Talk 2', ical)
+        self.assertIn(f'UID:{self.break_.ical_id}-10', ical)
+
+    def test_feed_of_sessions_of_interest(self):
+        ical = actions.generate_ical([self.talk2.ical_id])
+
+        self.assertEqual(ical.count('BEGIN:VEVENT'), 2)
+        self.assertNotIn('SUMMARY:Talk 1', ical)
+        self.assertIn('SUMMARY:Talk 2', ical)
+        self.assertIn('SUMMARY:Coffee', ical)
+
+    def test_events_are_rendered_once(self):
+        with patch('schedule.actions.render_ical_event', wraps=actions.render_ical_event) as render_ical_event:
+            actions.get_ical([])
+            actions.get_ical([self.talk1.ical_id])
+            actions.get_ical([self.talk2.ical_id])
+
+        self.assertEqual(render_ical_event.call_count, 3)
+
+
+class ImportScheduleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = factories.create_room('Room 1')
+        cls.slot1 = factories.create_slot(cls.room, date(2018, 9, 15), time(10, 0))
+        cls.slot2 = factories.create_slot(cls.room, date(2018, 9, 15), time(11, 0))
+        cls.slot3 = factories.create_slot(cls.room, date(2018, 9, 15), time(12, 0))
+        cls.talk = create_proposal()
+        cls.workshop = create_proposal(session_type='workshop')
+        cls.workshop.title = 'Python is fun'
+        cls.workshop.length_override = timedelta(minutes=60)
+        cls.workshop.save()
+        cls.old_talk = create_proposal()
+        cls.old_talk.title = 'Python was brilliant'
+        cls.old_talk.save()
+
+    def csv_file(self, *rows):
+        lines = ['event_index,event,slot_index,slot', *(f'0,{title},0,{slot}' for title, slot in rows)]
+        return [f'{line}\n'.encode('utf-8') for line in lines]
+
+    def test_import(self):
+        old_slot_event = factories.create_slot_event(self.slot3, self.old_talk)
+        f = self.csv_file(
+            ('Python is brilliant', '2018-09-15 10:00:00 Room 1'),
+            ('Python is fun', '2018-09-15 11:00:00 Room 1'),
+        )
+
+        with self.assertNumQueries(9):
+            report = actions.import_schedule(f)
+
+        self.assertEqual(report.problems, [])
+        self.assertEqual(report.num_imported, 2)
+        self.assertFalse(SlotEvent.objects.filter(id=old_slot_event.id).exists())
+        self.assertEqual(
+            sorted(SlotEvent.objects.values_list('activity__title', 'slot__time')),
+            [('Python is brilliant', time(10, 0)), ('Python is fun', time(11, 0))],
+        )
+
+    def test_long_workshop(self):
+        self.workshop.length_override = timedelta(minutes=180)
+        self.workshop.save()
+        f = self.csv_file(('Python is fun', '2018-09-15 10:00:00 Room 1'))
+
+        report = actions.import_schedule(f)
+
+        self.assertEqual(report.problems, [])
+        self.assertEqual(
+            sorted(SlotEvent.objects.values_list('slot__time', flat=True)),
+            [time(10, 0), time(12, 0)],
+        )
+
+    def test_report(self):
+        self.workshop.length_override = timedelta(minutes=180)
+        self.workshop.save()
+        f = self.csv_file(
+            ('Python is brilliant', '2018-09-15 10:00:00 Room 1'),
+            ('Python is fun', '2018-09-15 10:00:00 Room 1'),
+            ('Python is dull', '2018-09-15 11:00:00 Room 1'),
+            ('Python is fun', '2018-09-15 11:00:00 Room 2'),
+            ('Python is fun', '2018-09-15 13:00:00 Room 1'),
+        )
+
+        report = actions.import_schedule(f)
+
+        self.assertEqual(report.missing_proposals, ["Couldn't find Python is dull"])
+        self.assertEqual(report.missing_rooms, ["Couldn't find room Room 2"])
+        self.assertEqual(report.missing_slots, ["Couldn't find Room 1 on 2018-09-15 at 13:00:00"])
+        self.assertEqual(
+            report.clashes,
+            ['Python is brilliant and Python is fun are both in Room 1 2018-09-15 10:00:00 talk'],
+        )
+        self.assertEqual(SlotEvent.objects.count(), 1)
+
+    def test_dry_run(self):
+        old_slot_event = factories.create_slot_event(self.slot3, self.old_talk)
+        f = self.csv_file(('Python is brilliant', '2018-09-15 10:00:00 Room 1'))
+
+        report = actions.import_schedule(f, dry_run=True)
+
+        self.assertEqual(report.num_imported, 1)
+        self.assertEqual(list(SlotEvent.objects.all()), [old_slot_event])
+
+
+TIMETABLE_YAML = b"""
+Room 1:
+  2018-09-15:
+    morning:
+      - {starts_at: 36000, duration: 30, event_type: talk}
+      - {starts_at: 37800, duration: 30, event_type: talk}
+Room 2:
+  2018-09-15:
+    morning:
+      - {starts_at: 36000, duration: 30, event_type: talk}
+"""
+
+UNBOUNDED_YAML = b"""
+- lunch: {starts_at: 36000, duration: 60}
+- tea: {starts_at: 54000, duration: 30}
+"""
+
+
+class ImportTimetableTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = factories.create_room('Room 1')
+
+    def test_import(self):
+        old_slot = factories.create_slot(self.room, date(2018, 9, 14), time(10, 0))
+
+        with self.assertNumQueries(8):
+            report = actions.import_timetable(io.BytesIO(TIMETABLE_YAML), io.BytesIO(UNBOUNDED_YAML))
+
+        self.assertEqual(report.missing_rooms, ["Couldn't find room Room 2"])
+        self.assertEqual(report.num_imported, 3)
+        self.assertFalse(Slot.objects.filter(id=old_slot.id).exists())
+        self.assertEqual(
+            sorted(Slot.objects.values_list('time', 'duration')),
+            [(time(10, 0), timedelta(minutes=30)),
+             (time(10, 30), timedelta(minutes=30)),
+             (time(15, 0), timedelta(minutes=30))],
+        )
+
+    def test_clash_with_slot_not_linked_to_scheduler(self):
+        slot = factories.create_slot(self.room, date(2018, 9, 15), time(10, 30))
+        slot.scheduler_linked = False
+        slot.save()
+
+        report = actions.import_timetable(io.BytesIO(TIMETABLE_YAML), io.BytesIO(UNBOUNDED_YAML))
+
+        self.assertEqual(report.clashes, ['There is already a slot in Room 1 on 2018-09-15 at 10:30:00'])
+        self.assertEqual(Slot.objects.count(), 3)
+
+    def test_dry_run(self):
+        report = actions.import_timetable(io.BytesIO(TIMETABLE_YAML), io.BytesIO(UNBOUNDED_YAML), dry_run=True)
+
+        self.assertEqual(report.num_imported, 3)
+        self.assertFalse(Slot.objects.exists())
+
+
+class GetScheduleJsonTests(TestCase):
+    def setUp(self):
+        schedule_cache.clear_local_cache()
+
+    def test_generated_from_requested_version(self):
+        factories.create_slot_event()
+        version = schedule_cache.get_version()
+        actions.get_schedule_page_data(version)
+
+        # The schedule changes after the version was read, but before the JSON
+        # is generated
+        SlotEvent.objects.all().delete()
+        schedule_cache.bump_version()
+
+        feed = actions.get_schedule_json(version)
+
+        [[session]] = json.loads(feed.body.decode('utf-8'))['2018-09-15']['matrix']
+        self.assertEqual(session['title'], 'Python is brilliant')
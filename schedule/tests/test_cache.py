@@ -0,0 +1,80 @@
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from schedule import cache as schedule_cache
+
+
+class LRUCacheTests(TestCase):
+    def test_discards_least_recently_used_entry(self):
+        lru = schedule_cache.LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('c'), 3)
+
+
+class GetOrGenerateTests(TestCase):
+    def setUp(self):
+        schedule_cache.clear_local_cache()
+
+    def test_generates_once(self):
+        generate = Mock(return_value={'sessions': []})
+
+        self.assertEqual(schedule_cache.get_or_generate('schedule', generate), {'sessions': []})
+        self.assertEqual(schedule_cache.get_or_generate('schedule', generate), {'sessions': []})
+        self.assertEqual(generate.call_count, 1)
+
+    def test_reads_from_shared_cache(self):
+        schedule_cache.get_or_generate('schedule', lambda: 'cached')
+        schedule_cache.clear_local_cache()
+
+        with self.assertNumQueries(2):
+            # One query for the version, and one for the entry
+            value = schedule_cache.get_or_generate('schedule', Mock())
+
+        self.assertEqual(value, 'cached')
+
+    def test_reads_from_local_cache(self):
+        schedule_cache.get_or_generate('schedule', lambda: 'cached')
+
+        with self.assertNumQueries(1):
+            # One query for the version
+            value = schedule_cache.get_or_generate('schedule', Mock())
+
+        self.assertEqual(value, 'cached')
+
+    def test_regenerates_after_version_is_bumped(self):
+        schedule_cache.get_or_generate('schedule', lambda: 'old')
+        schedule_cache.bump_version()
+
+        self.assertEqual(schedule_cache.get_or_generate('schedule', lambda: 'new'), 'new')
+
+    def test_waits_for_other_process_to_generate(self):
+        version = schedule_cache.get_version()
+        cache.add('schedule-lock', True, version=version)
+
+        def sleep(seconds):
+            # The other process finishes generating the entry
+            cache.set('schedule', 'generated elsewhere', version=version)
+
+        generate = Mock()
+        with patch('schedule.cache.time.sleep', sleep):
+            value = schedule_cache.get_or_generate('schedule', generate)
+
+        self.assertEqual(value, 'generated elsewhere')
+        generate.assert_not_called()
+
+    def test_generates_if_other_process_takes_too_long(self):
+        version = schedule_cache.get_version()
+        cache.add('schedule-lock', True, version=version)
+
+        with patch('schedule.cache.LOCK_TIMEOUT', 0), patch('schedule.cache.time.sleep'):
+            value = schedule_cache.get_or_generate('schedule', lambda: 'generated here')
+
+        self.assertEqual(value, 'generated here')
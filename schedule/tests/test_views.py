@@ -0,0 +1,194 @@
+from datetime import date, time
+import gzip
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+
+from accounts.tests.factories import create_staff_user, create_user
+from cfp.models import Proposal
+from cfp.tests.factories import create_proposal
+
+from schedule import cache as schedule_cache
+from schedule.actions import import_schedule
+from schedule.models import SlotEvent
+
+from . import factories
+
+
+class ScheduleViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room = factories.create_room()
+        cls.slot = factories.create_slot(cls.room, date(2018, 9, 15), time(10, 0))
+        cls.slot_event = factories.create_slot_event(cls.slot, create_proposal(create_user('Alice')))
+
+    def setUp(self):
+        schedule_cache.clear_local_cache()
+
+    def test_schedule_json(self):
+        rsp = self.client.get('/schedule/json/')
+
+        self.assertEqual(list(rsp.json()), ['2018-09-15'])
+
+    def test_schedule_json_is_cached(self):
+        self.client.get('/schedule/json/')
+
+        with self.assertNumQueries(1):
+            # One query for the schedule's version
+            self.client.get('/schedule/json/')
+
+    def test_schedule_json_after_import(self):
+        self.client.get('/schedule/json/')
+        self.slot_event.delete()
+
+        # Nothing is imported, but the version is bumped regardless.  The
+        # test's transaction is never committed, so the version is bumped
+        # straight away.
+        with patch('schedule.actions.transaction.on_commit', lambda fn: fn()):
+            import_schedule([b'event_index,event,slot_index,slot\n'])
+
+        rsp = self.client.get('/schedule/json/')
+        self.assertEqual(rsp.json()['2018-09-15']['matrix'], [[None]])
+
+    def test_full_ical(self):
+        rsp = self.client.get('/schedule/ical/full/')
+
+        self.assertEqual(rsp['Content-Type'], 'text/calendar')
+        self.assertContains(rsp, 'SUMMARY:Python is brilliant')
+
+    def test_ical_for_user(self):
+        other_room = factories.create_room('Other Room')
+        other_slot = factories.create_slot(other_room, date(2018, 9, 15), time(10, 0))
+        factories.create_slot_event(other_slot, create_proposal(create_user('Bob')))
+        user = create_user('Carol', items_of_interest=[self.slot_event.ical_id])
+
+        rsp = self.client.get(f'/schedule/ical/{user.ical_token}/')
+
+        self.assertContains(rsp, 'SUMMARY:Python is brilliant', count=1)
+        self.assertContains(rsp, 'LOCATION:Assembly Room')
+
+    def test_ical_for_unknown_token(self):
+        rsp = self.client.get('/schedule/ical/unknown/')
+
+        self.assertEqual(rsp.status_code, 404)
+
+
+class ConditionalFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.slot_event = factories.create_slot_event()
+        cls.user = create_user('Bob')
+
+    def setUp(self):
+        schedule_cache.clear_local_cache()
+
+    def test_schedule_json_not_modified(self):
+        rsp = self.client.get('/schedule/json/')
+        self.assertEqual(rsp.status_code, 200)
+
+        with self.assertNumQueries(1):
+            # One query for the schedule's version
+            rsp = self.client.get('/schedule/json/', HTTP_IF_NONE_MATCH=rsp['ETag'])
+
+        self.assertEqual(rsp.status_code, 304)
+        self.assertEqual(rsp.content, b'')
+
+    def test_schedule_json_modified(self):
+        rsp = self.client.get('/schedule/json/')
+        schedule_cache.bump_version()
+
+        rsp = self.client.get('/schedule/json/', HTTP_IF_NONE_MATCH=rsp['ETag'])
+
+        self.assertEqual(rsp.status_code, 200)
+
+    def test_ical_not_modified_since(self):
+        rsp = self.client.get('/schedule/ical/full/')
+
+        rsp = self.client.get('/schedule/ical/full/', HTTP_IF_MODIFIED_SINCE=rsp['Last-Modified'])
+
+        self.assertEqual(rsp.status_code, 304)
+
+    def test_ical_for_user_modified_when_interests_change(self):
+        url = f'/schedule/ical/{self.user.ical_token}/'
+        rsp = self.client.get(url)
+
+        self.client.force_login(self.user)
+        self.client.post(f'/schedule/interest/?id={self.slot_event.ical_id}')
+
+        rsp = self.client.get(url, HTTP_IF_NONE_MATCH=rsp['ETag'])
+
+        self.assertEqual(rsp.status_code, 200)
+
+    def test_gzipped(self):
+        rsp = self.client.get('/schedule/ical/full/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(rsp['Content-Encoding'], 'gzip')
+        self.assertEqual(rsp['Vary'], 'Accept-Encoding')
+        self.assertIn(b'SUMMARY:Python is brilliant', gzip.decompress(rsp.content))
+
+        plain_rsp = self.client.get('/schedule/ical/full/')
+
+        self.assertNotEqual(rsp['ETag'], plain_rsp['ETag'])
+
+
+class UploadScheduleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff_user = create_staff_user()
+        cls.slot_event = factories.create_slot_event()
+
+    def setUp(self):
+        self.client.force_login(self.staff_user)
+
+    def upload(self, dry_run):
+        f = SimpleUploadedFile(
+            'schedule.csv',
+            b'event_index,event,slot_index,slot\n0,Python is dull,0,2018-09-15 10:00:00 Assembly Room\n',
+        )
+        data = {'schedule': f}
+        if dry_run:
+            data['dry_run'] = 'on'
+        return self.client.post('/schedule/upload/', data, follow=True)
+
+    def test_preview(self):
+        rsp = self.upload(dry_run=True)
+
+        self.assertContains(rsp, 'This would import 0 sessions.')
+        self.assertContains(rsp, "Couldn&#39;t find Python is dull")
+        self.assertTrue(SlotEvent.objects.exists())
+
+    def test_import(self):
+        rsp = self.upload(dry_run=False)
+
+        self.assertRedirects(rsp, '/schedule/')
+        self.assertContains(rsp, 'Imported 0 sessions')
+        self.assertContains(rsp, "Couldn&#39;t find Python is dull")
+        self.assertFalse(SlotEvent.objects.exists())
+
+
+class WideProposalIdTests(TestCase):
+    def setUp(self):
+        schedule_cache.clear_local_cache()
+
+    def test_schedule_with_eight_digit_proposal_id(self):
+        proposal = create_proposal()
+        Proposal.objects.filter(pk=proposal.pk).update(id=2 ** 16)
+        proposal = Proposal.objects.get(pk=2 ** 16)
+        proposal.conference_event = True
+        proposal.save()
+        room = factories.create_room()
+        factories.create_slot(room, date(2018, 9, 15), time(10, 0))
+
+        import_schedule([
+            b'event_index,event,slot_index,slot\n',
+            b'0,Python is brilliant,0,2018-09-15 10:00:00 Assembly Room\n',
+        ])
+        [slot_event] = SlotEvent.objects.all()
+        self.assertEqual(slot_event.ical_id, f'{proposal.proposal_id}-sat'.lower())
+
+        rsp = self.client.get('/schedule/')
+        self.assertContains(rsp, f'/schedule/item/{proposal.proposal_id}/')
+
+        rsp = self.client.get(f'/schedule/item/{proposal.proposal_id}/')
+        self.assertEqual(rsp.status_code, 200)
@@ -11,6 +11,6 @@ urlpatterns = [
     url(r'^interest/$', views.interest, name='interest'),
     url(r'^ical/(?P<token>\w+)/$', views.ical, name='ical'),
     url(r'^yaml/$', views.import_timetable, name='yaml'),
-    url(r'^item/(?P<proposal_id>[\w\d]{4})/$', views.view_proposal, name='view_proposal'),
+    url(r'^item/(?P<proposal_id>\w+)/$', views.view_proposal, name='view_proposal'),
     url(r'^json/$', views.schedule_json, name='schedule_json'),
 ]
@@ -1,28 +1,29 @@
-import json
+import re
 
+from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.http import (Http404, HttpResponse, HttpResponseRedirect,
-                         JsonResponse)
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import render
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 
 from accounts.models import User
 from cfp.models import Proposal
-from schedule.models import Cache, SlotEvent
+from schedule import cache as schedule_cache
+from schedule.models import SlotEvent
 
-from .actions import (generate_ical, generate_schedule_page_data,
-                      import_schedule, import_timetable)
+from .actions import (get_ical, get_schedule_json, get_schedule_page_data,
+                      ical_feed_name, import_schedule, import_timetable)
 from .forms import UploadScheduleForm, UploadTimetableForm
 
 
+ACCEPTS_GZIP_RE = re.compile(r'\bgzip\b')
+
+
 def schedule(request):
 
-    try:
-        schedule_cache = Cache.objects.get(key='schedule')
-        all_sessions = json.loads(schedule_cache.value)
-    except Cache.DoesNotExist:
-        all_sessions = generate_schedule_page_data()
+    all_sessions = get_schedule_page_data()
 
     users_sessions = []
     if not request.user.is_anonymous:
@@ -39,37 +40,55 @@ def schedule(request):
 
 
 def schedule_json(request):
-    try:
-        schedule_cache = Cache.objects.get(key='schedule')
-        all_sessions = json.loads(schedule_cache.value)
-    except Cache.DoesNotExist:
-        all_sessions = generate_schedule_page_data()
+    version = schedule_cache.get_version()
 
-    return JsonResponse(all_sessions)
+    return feed_response(
+        request,
+        etag=f'schedule-{version}',
+        last_modified=schedule_cache.last_modified(version),
+        get_feed=lambda: get_schedule_json(version),
+        content_type='application/json',
+    )
 
 
 @staff_member_required(login_url='login')
 def upload_schedule(request):
+    report = None
     if request.method == 'POST':
         form = UploadScheduleForm(request.POST, request.FILES)
         if form.is_valid():
-            import_schedule(request.FILES['schedule'], request)
-            return HttpResponseRedirect('/schedule/')
+            report = import_schedule(request.FILES['schedule'], dry_run=form.cleaned_data['dry_run'])
+            if not report.dry_run:
+                add_import_messages(request, report, 'sessions')
+                return HttpResponseRedirect('/schedule/')
     else:
         form = UploadScheduleForm()
-    return render(request, 'schedule/upload_schedule.html', {'form': form})
+    return render(request, 'schedule/upload_schedule.html', {'form': form, 'report': report})
 
 
 @staff_member_required(login_url='login')
 def upload_timetable(request):
+    report = None
     if request.method == 'POST':
         form = UploadTimetableForm(request.POST, request.FILES)
         if form.is_valid():
-            import_timetable(request.FILES['timetable'], request.FILES['unbounded'], request)
-            return HttpResponseRedirect('/schedule/upload/')
+            report = import_timetable(
+                request.FILES['timetable'],
+                request.FILES['unbounded'],
+                dry_run=form.cleaned_data['dry_run'],
+            )
+            if not report.dry_run:
+                add_import_messages(request, report, 'slots')
+                return HttpResponseRedirect('/schedule/upload/')
     else:
         form = UploadTimetableForm()
-    return render(request, 'schedule/upload_timetable.html', {'form': form})
+    return render(request, 'schedule/upload_timetable.html', {'form': form, 'report': report})
+
+
+def add_import_messages(request, report, descr):
+    messages.success(request, f'Imported {report.num_imported} {descr}')
+    for problem in report.problems:
+        messages.error(request, problem)
 
 
 @login_required
@@ -84,35 +103,63 @@ def interest(request):
             request.user.items_of_interest.remove(proposal_id)
 
     request.user.save()
-    try:
-        Cache.objects.get(key=request.user.ical_token).delete()
-    except Cache.DoesNotExist:
-        pass
 
     return HttpResponse()
 
 
 def ical(request, token):
-    try:
-        ical = Cache.objects.get(key=token).value
-    except Cache.DoesNotExist:
-        if token == 'full':
-            slots = SlotEvent.objects.all()
+    version = schedule_cache.get_version()
+    last_modified = schedule_cache.last_modified(version)
+
+    if token == 'full':
+        items_of_interest = []
+    else:
+        try:
+            user = User.objects.get(ical_token=token)
+        except User.DoesNotExist:
+            raise Http404
+        items_of_interest = user.items_of_interest
+        # The user's sessions of interest may have changed since the schedule
+        last_modified = max(last_modified, int(user.updated_at.timestamp()))
+
+    return feed_response(
+        request,
+        etag=f'{ical_feed_name(items_of_interest)}-{version}',
+        last_modified=last_modified,
+        get_feed=lambda: get_ical(items_of_interest, version),
+        content_type='text/calendar',
+    )
+
+
+def feed_response(request, etag, last_modified, get_feed, content_type):
+    '''Return a response with the Feed returned by get_feed(), gzipped if the
+    client accepts it, or a 304 Not Modified response if the client already
+    has the feed with the given etag, or hasn't seen it since last_modified.
+
+    etag should identify the feed, so that a 304 can be returned without
+    getting the feed.
+    '''
+
+    gzipped = bool(ACCEPTS_GZIP_RE.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+    if gzipped:
+        # Each encoding of the feed needs its own strong ETag
+        etag = f'{etag}-gzip'
+    etag = quote_etag(etag)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is None:
+        feed = get_feed()
+        if gzipped:
+            response = HttpResponse(feed.gzipped_body, content_type=content_type)
+            response['Content-Encoding'] = 'gzip'
         else:
-            try:
-                user = User.objects.get(ical_token=token)
-                if len(user.items_of_interest) == 0:
-                    slots = SlotEvent.objects.all()
-                else:
-                    slots = SlotEvent.objects.filter(
-                        Q(ical_id__in=user.items_of_interest) | Q(activity__break_event=True)
-                    )
-            except User.DoesNotExist:
-                return Http404
-
-        ical = generate_ical(slots, token)
-
-    return HttpResponse(ical, content_type="text/calendar")
+            response = HttpResponse(feed.body, content_type=content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
 
 
 def view_proposal(request, proposal_id):
@@ -12,11 +12,13 @@
 #    functions in this module.  This means that test data should always be
 #    in a consistent state.
 
-from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
 
-from .mailer import send_invitation_mail
+from ironcage import content_types
+from jobs.models import Job
 from orders.models import Order
+from reports.models import SalesCounter
+from .constants import DAYS
 from .models import Ticket
 
 import structlog
@@ -33,7 +35,7 @@ def create_pending_order(purchaser, billing_details, rate, days_for_self=None, e
             'email_addrs_and_days_for_others': email_addrs_and_days_for_others,
         }
 
-        ticket_content_type = ContentType.objects.get(app_label="tickets", model="ticket")
+        ticket_content_type = content_types.ticket()
 
         return Order.objects.create_pending(
             purchaser,
@@ -57,7 +59,16 @@ def update_pending_order(order, billing_details, rate, days_for_self=None, email
 def send_ticket_invitations(order):
     logger.info('send_ticket_invitations', order=order.order_id)
     for ticket in order.unclaimed_tickets():
-        send_invitation_mail(ticket)
+        send_ticket_invitation(ticket)
+
+
+def send_ticket_invitation(ticket):
+    logger.info('send_ticket_invitation', ticket=ticket.ticket_id)
+    Job.objects.enqueue(
+        'tickets.tasks.send_ticket_invitation',
+        f'send_ticket_invitation:{ticket.id}',
+        ticket_id=ticket.id,
+    )
 
 
 def claim_ticket_invitation(owner, invitation):
@@ -74,11 +85,14 @@ def create_free_ticket(email_addr, free_reason, days=None):
             free_reason=free_reason,
             days=days
         )
-    send_invitation_mail(ticket)
+        SalesCounter.objects.record_tickets_created([(ticket, 0)])
+        send_ticket_invitation(ticket)
     return ticket
 
 
 def update_free_ticket(ticket, days):
     logger.info('update_free_ticket', ticket=ticket.ticket_id, days=days)
     with transaction.atomic():
+        old_days = [day for day in DAYS if getattr(ticket, day)]
         ticket.update_days(days)
+        SalesCounter.objects.record_ticket_days_changed(ticket, old_days, ticket.cost_excl_vat)
@@ -0,0 +1,20 @@
+import os
+
+from django.core.management import BaseCommand
+
+from tickets import qr_codes
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = 'Render and cache QR codes for all tickets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=['png', 'svg'], default='png')
+        parser.add_argument('--scale', type=int, default=5)
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Size of process pool')
+
+    def handle(self, *args, kind, scale, processes, **kwargs):
+        ticket_ids = [ticket.ticket_id for ticket in Ticket.objects.only('id')]
+        codes = qr_codes.get_many(ticket_ids, kind, scale, num_processes=processes)
+        self.stdout.write(f'{len(codes)} QR codes cached')
@@ -1,14 +1,13 @@
-import re
+from datetime import date
 
 from django.conf import settings
-from django.core.management import BaseCommand
-from django.template.loader import get_template
 
-from ironcage.emails import send_mail
+from ironcage.bulk_mail import BulkMailCommand
+from ironcage.emails import MailTemplate
 from tickets.models import TicketInvitation
 
 
-class Command(BaseCommand):
+class Command(BulkMailCommand):
 
     def handle(self, *args, **kwargs):
 
@@ -16,17 +15,22 @@ class Command(BaseCommand):
             status='unclaimed'
         ).all()
 
-        for invite in unclaimed_invites:
-            template = get_template('tickets/emails/unclaimed.txt')
+        template = MailTemplate('tickets/emails/unclaimed.txt')
+
+        def build_message(invite):
             context = {
                 'invite': invite,
                 'url': settings.DOMAIN + invite.get_absolute_url()
             }
-            body_raw = template.render(context)
-            body = re.sub('\n\n\n+', '\n\n', body_raw)
+            body = template.render(context)
 
-            send_mail(
+            return (
                 f'PyCon UK - urgent, action required to claim ticket ({invite.ticket.ticket_id})',
                 body,
                 invite.email_addr,
             )
+
+        run = self.mail_run(f'remind_unclaimed:{date.today()}', kwargs)
+        run.send(unclaimed_invites, build_message)
+
+        self.stdout.write(run.report())
@@ -0,0 +1,28 @@
+# Generated by Django 2.0.3 on 2026-10-18 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_add_free_ticket_permission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QRCode',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content', models.CharField(max_length=100)),
+                ('kind', models.CharField(max_length=3)),
+                ('scale', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='qrcode',
+            unique_together={('content', 'kind', 'scale')},
+        ),
+    ]
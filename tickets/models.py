@@ -63,6 +63,20 @@ class Ticket(models.Model):
             ticket.invitations.create(email_addr=email_addr)
             return ticket
 
+        def bulk_create_with_invitations(self, tickets):
+            '''Save unsaved tickets, and create an invitation for each ticket
+            built with an email address, in two queries.
+
+            This does the same as calling save() on each ticket.
+            '''
+            tickets = self.bulk_create(tickets)
+            TicketInvitation.objects.bulk_create([
+                TicketInvitation.objects.build(ticket=ticket, email_addr=ticket.email_addr)
+                for ticket in tickets
+                if hasattr(ticket, 'email_addr')
+            ])
+            return tickets
+
     objects = Manager()
 
     def __str__(self):
@@ -121,6 +135,9 @@ class Ticket(models.Model):
     @property
     def order_row(self):
         # We expect there to only ever be a single OrderRow, so this should never fail
+        if hasattr(self, 'prefetched_order_rows'):
+            [order_row] = self.prefetched_order_rows
+            return order_row
         return self.order_rows.get()
 
     @property
@@ -145,6 +162,9 @@ class Ticket(models.Model):
 
     def invitation(self):
         # This will raise an exception if a ticket has multiple invitations
+        if hasattr(self, 'prefetched_invitations'):
+            [invitation] = self.prefetched_invitations
+            return invitation
         return self.invitations.get()
 
     def update_days(self, days):
@@ -173,6 +193,10 @@ class TicketInvitation(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Manager(models.Manager):
+        def build(self, **kwargs):
+            token = get_random_string(length=24)
+            return self.model(token=token, **kwargs)
+
         def create(self, **kwargs):
             token = get_random_string(length=24)
             return super().create(token=token, **kwargs)
@@ -191,3 +215,21 @@ class TicketInvitation(models.Model):
         ticket.save()
         self.status = 'claimed'
         self.save()
+
+
+class QRCode(models.Model):
+    '''A rendered QR code, cached since rendering one is slow.  See
+    tickets.qr_codes.'''
+
+    content = models.CharField(max_length=100)
+    kind = models.CharField(max_length=3)
+    scale = models.IntegerField()
+    data = models.BinaryField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('content', 'kind', 'scale')
+
+    def __str__(self):
+        return f'{self.content} ({self.kind}, scale {self.scale})'
@@ -0,0 +1,91 @@
+'''QR codes encoding ticket ids, as shown on the ticket page and attached to
+emails.
+
+Rendering a QR code with pyqrcode is slow, since it is pure Python, and a
+ticket's id never changes, so rendered codes are cached in the QRCode table,
+keyed by their content, kind (png or svg), and scale.
+'''
+
+import io
+import multiprocessing
+
+import pyqrcode
+
+from django.db import IntegrityError, transaction
+
+from .models import QRCode
+
+import structlog
+logger = structlog.get_logger()
+
+
+def render(content, kind='png', scale=5):
+    code = pyqrcode.create(content)
+    buffer = io.BytesIO()
+    if kind == 'png':
+        code.png(buffer, scale=scale)
+    elif kind == 'svg':
+        code.svg(buffer, scale=scale)
+    else:
+        raise ValueError(f'Unknown kind of QR code: {kind}')
+    return buffer.getvalue()
+
+
+def _render_args(args):
+    return render(*args)
+
+
+def get(content, kind='png', scale=5):
+    '''Return the bytes of the QR code encoding content, rendering it if it
+    hasn't been rendered before.'''
+
+    return get_many([content], kind, scale)[content]
+
+
+def get_many(contents, kind='png', scale=5, num_processes=1):
+    '''Return a dict mapping each of contents to the bytes of the QR code
+    encoding it, rendering (optionally across a pool of processes) those that
+    haven't been rendered before.'''
+
+    contents = set(contents)
+
+    cached = QRCode.objects.filter(content__in=contents, kind=kind, scale=scale).values_list('content', 'data')
+    codes = {content: bytes(data) for content, data in cached}
+
+    missing = sorted(contents - set(codes))
+    if not missing:
+        return codes
+
+    logger.info('render QR codes', count=len(missing), kind=kind, scale=scale)
+
+    args = [(content, kind, scale) for content in missing]
+    if num_processes == 1:
+        rendered = [render(*a) for a in args]
+    else:
+        # The processes only render, so they don't touch the database
+        # connection that they inherit.
+        with multiprocessing.Pool(num_processes) as pool:
+            rendered = pool.map(_render_args, args, chunksize=50)
+
+    new_codes = dict(zip(missing, rendered))
+
+    qr_codes = [
+        QRCode(content=content, kind=kind, scale=scale, data=data)
+        for content, data in new_codes.items()
+    ]
+
+    try:
+        with transaction.atomic():
+            QRCode.objects.bulk_create(qr_codes, batch_size=500)
+    except IntegrityError:
+        # Some of these have been cached concurrently
+        for qr_code in qr_codes:
+            QRCode.objects.get_or_create(
+                content=qr_code.content,
+                kind=kind,
+                scale=scale,
+                defaults={'data': qr_code.data},
+            )
+
+    codes.update(new_codes)
+    return codes
@@ -0,0 +1,12 @@
+# The functions defined in this module are run by workers, via jobs.models.Job.
+#
+# They take IDs rather than model instances, since their arguments are stored as
+# JSON.
+
+from .mailer import send_invitation_mail
+from .models import Ticket
+
+
+def send_ticket_invitation(ticket_id):
+    ticket = Ticket.objects.get(pk=ticket_id)
+    send_invitation_mail(ticket)
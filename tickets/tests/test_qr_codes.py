@@ -0,0 +1,71 @@
+import io
+from unittest.mock import patch
+
+import pyqrcode
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from tickets import qr_codes
+from tickets.models import QRCode
+
+from . import factories
+
+
+class QRCodesTests(TestCase):
+    def test_render(self):
+        buffer = io.BytesIO()
+        pyqrcode.create('92AD').png(buffer, scale=5)
+
+        self.assertEqual(qr_codes.render('92AD'), buffer.getvalue())
+
+    def test_render_svg(self):
+        self.assertTrue(qr_codes.render('92AD', 'svg').startswith(b'<?xml'))
+
+    def test_get(self):
+        png = qr_codes.get('92AD')
+
+        self.assertEqual(png, qr_codes.render('92AD'))
+        self.assertEqual(bytes(QRCode.objects.get(content='92AD', kind='png', scale=5).data), png)
+
+    def test_get_cached(self):
+        png = qr_codes.get('92AD')
+
+        with patch('tickets.qr_codes.render') as mock:
+            with self.assertNumQueries(1):
+                self.assertEqual(qr_codes.get('92AD'), png)
+
+        mock.assert_not_called()
+
+    def test_get_with_different_scale(self):
+        qr_codes.get('92AD', 'png', 5)
+        qr_codes.get('92AD', 'png', 2)
+
+        self.assertEqual(QRCode.objects.count(), 2)
+
+    def test_get_many(self):
+        qr_codes.get('92AD')
+
+        with patch('tickets.qr_codes.render', wraps=qr_codes.render) as mock:
+            codes = qr_codes.get_many(['92AD', '2574', '4A2E'])
+
+        self.assertEqual(mock.call_count, 2)
+        self.assertEqual(codes, {content: qr_codes.render(content) for content in ['92AD', '2574', '4A2E']})
+
+    def test_get_many_with_processes(self):
+        codes = qr_codes.get_many(['92AD', '2574', '4A2E'], num_processes=2)
+
+        self.assertEqual(codes, {content: qr_codes.render(content) for content in ['92AD', '2574', '4A2E']})
+        self.assertEqual(QRCode.objects.count(), 3)
+
+
+class GenerateQRCodesTests(TestCase):
+    def test_generate_qr_codes(self):
+        tickets = [factories.create_ticket() for _ in range(3)]
+
+        call_command('generate_qr_codes', processes=1, stdout=io.StringIO())
+
+        self.assertEqual(
+            set(QRCode.objects.values_list('content', flat=True)),
+            {ticket.ticket_id for ticket in tickets}
+        )
@@ -1,10 +1,14 @@
+import base64
 from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
 
+from django.db import transaction
 from django.test import TestCase, override_settings
 
 from . import factories
 
-from tickets import actions
+from orders.models import ChargeAttempt
+from tickets import actions, qr_codes
 from tickets.models import TicketInvitation
 
 
@@ -418,6 +422,30 @@ class OrderEditTests(TestCase):
         self.assertRedirects(rsp, f'/orders/{self.order.order_id}/')
         self.assertContains(rsp, 'This order has already been paid')
 
+    def test_post_when_charge_in_flight(self):
+        with transaction.atomic():
+            ChargeAttempt.objects.start_or_resume(self.order, 'tok_abcdefghijklmnopqurstuvwx')
+        self.client.force_login(self.order.purchaser)
+        form_data = {
+            'who': 'self',
+            'rate': 'corporate',
+            'billing_name': 'Sirius Cybernetics Corp.',
+            'billing_addr': 'Eadrax, Sirius Tau',
+            'days': ['sun', 'mon', 'tue'],
+            # The formset gets POSTed even when order is only for self
+            'form-TOTAL_FORMS': '2',
+            'form-INITIAL_FORMS': '0',
+            'form-MIN_NUM_FORMS': '1',
+            'form-MAX_NUM_FORMS': '1000',
+            'form-0-email_addr': '',
+            'form-1-email_addr': '',
+        }
+        rsp = self.client.post(self.url, form_data, follow=True)
+        self.assertRedirects(rsp, f'/orders/{self.order.order_id}/')
+        self.assertContains(rsp, 'This order cannot be changed while a payment for it is being processed')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.unconfirmed_details['rate'], 'individual')
+
 
 class TicketTests(TestCase):
     def test_ticket(self):
@@ -430,6 +458,19 @@ class TicketTests(TestCase):
         self.assertContains(rsp, 'Update your profile')
         self.assertNotContains(rsp, 'Update your ticket')
 
+    def test_qr_code(self):
+        ticket = factories.create_ticket()
+        self.client.force_login(ticket.owner)
+        png = qr_codes.render(ticket.ticket_id)
+
+        with patch('tickets.qr_codes.render') as mock:
+            mock.return_value = png
+            self.client.get(f'/tickets/tickets/{ticket.ticket_id}/')
+            rsp = self.client.get(f'/tickets/tickets/{ticket.ticket_id}/')
+
+        mock.assert_called_once_with(ticket.ticket_id, 'png', 5)
+        self.assertContains(rsp, f'data:image/png;base64,{base64.b64encode(png).decode()}')
+
     def test_when_not_authenticated(self):
         ticket = factories.create_ticket()
         rsp = self.client.get(f'/tickets/tickets/{ticket.ticket_id}/', follow=True)
@@ -1,19 +1,18 @@
+import base64
 from datetime import datetime, timezone, timedelta, date
 
-import pyqrcode
-
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
-from django.contrib.contenttypes.models import ContentType
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.html import mark_safe
 
+from ironcage import content_types
 from orders.models import Order
 from accounts.models import Badge
-from . import actions
+from . import actions, qr_codes
 from .constants import DAYS
 from .forms import (BillingDetailsForm, EducatorTicketForm, FreeTicketForm,
                     FreeTicketUpdateForm, TicketForm,
@@ -179,12 +178,12 @@ def new_educator_order(request):
 def order_edit(request, order_id):
     order = Order.objects.get_by_order_id_or_404(order_id)
 
-    children_ticket_content_type = ContentType.objects.get(app_label="extras", model="childrenticket")
-    dinner_ticket_content_type = ContentType.objects.get(app_label="extras", model="dinnerticket")
+    children_ticket_content_type = content_types.children_ticket()
+    dinner_ticket_content_type = content_types.dinner_ticket()
 
-    if order.content_type == children_ticket_content_type:
+    if order.content_type_id == children_ticket_content_type.id:
         return redirect('extras:children_order_edit', order_id=order_id)
-    elif order.content_type == dinner_ticket_content_type:
+    elif order.content_type_id == dinner_ticket_content_type.id:
         return redirect('extras:dinner_order_edit', order_id=order_id)
 
     if request.user != order.purchaser:
@@ -195,6 +194,10 @@ def order_edit(request, order_id):
         messages.error(request, 'This order has already been paid')
         return redirect(order)
 
+    if order.charge_in_flight():
+        messages.error(request, 'This order cannot be changed while a payment for it is being processed')
+        return redirect(order)
+
     if request.method == 'POST':
         educator_order = request.POST['rate'] in ('educator-employer', 'educator-self')
 
@@ -295,8 +298,7 @@ def ticket(request, ticket_id):
             mark_safe('Your profile is incomplete. <a href="{}">Update your profile</a>'.format(reverse('accounts:edit_profile')))
         )
 
-    code = pyqrcode.create(ticket.ticket_id)
-    png_base64 = code.png_as_base64_str(scale=5)
+    png_base64 = base64.b64encode(qr_codes.get(ticket.ticket_id, 'png', 5)).decode('ascii')
 
     context = {
         'ticket': ticket,